@@ -0,0 +1,316 @@
+"""
+Synthetic-scale benchmark for collaborative filtering.
+Generates a users table with realistic libraries (Zipf-distributed game
+popularity, log-normal library sizes, heavy-tailed playtimes), serves it through
+an in-memory stand-in for the Supabase table client (including PostgREST's
+max-rows cap) and runs compute_collaborative_recommendations for random users.
+
+For every strategy it reports latency percentiles and peak memory (tracemalloc,
+measured in a separate pass so it doesn't skew the timings) and checks that the
+results match a reference implementation working directly on the rows: every
+user loaded at once, full sort of the similar users.
+
+Strategies:
+    streaming       the production code (keyset-paginated scan, bounded heap,
+                    libraries from the library cache). The first query fills the
+                    cache; the others run warm
+    single-select   the reference algorithm on one select() of the whole table,
+                    the request pattern used before the keyset scan; the row cap
+                    truncates it once the table is larger than MAX_ROWS
+    reference       the reference itself, for comparison
+
+Usage:
+    python bench_collaborative_filtering.py [--users 10000 100000] [--queries 10] [--seed 0]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import bisect
+import contextlib
+import io
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.cache.library_cache as library_cache
+import src.db.table_scan as table_scan
+import src.recommender.recommender as recommender
+from src.db.library_codec import encode_for_storage, decode_library
+
+STEAM_ID_BASE = 76561197960265728
+APP_COUNT = 20000  # Catalogue size; appids are 10, 20, ...
+ZIPF_EXPONENT = 1.05  # Popularity of the k-th most popular game ~ 1 / k^s
+LIBRARY_MEDIAN = 45  # Games per library (log-normal)
+LIBRARY_SIGMA = 1.0
+MAX_LIBRARY = 3000
+MAX_ROWS = 1000  # PostgREST's default row cap on Supabase
+
+
+# --- Synthetic data -------------------------------------------------------
+
+def generate_users(count: int, seed: int) -> List[dict]:
+    """users rows with compact-encoded libraries, as the collector writes them"""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** ZIPF_EXPONENT) for rank in range(1, APP_COUNT + 1)]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    appids = [10 * (rank + 1) for rank in rng.sample(range(APP_COUNT), APP_COUNT)]  # Popularity isn't ordered by appid
+
+    rows = []
+    for index in range(count):
+        size = min(MAX_LIBRARY, max(1, int(rng.lognormvariate(math.log(LIBRARY_MEDIAN), LIBRARY_SIGMA))))
+        owned = set()
+        while len(owned) < size:
+            owned.add(appids[bisect.bisect_left(cumulative, rng.random() * total)])
+        games = {}
+        for appid in owned:
+            # Most owned games are barely played, a few get hundreds of hours
+            playtime = 0 if rng.random() < 0.4 else int(rng.paretovariate(1.2) * 30)
+            games[str(appid)] = {"playtime_forever": playtime, "rtime_last_played": None}
+        rows.append({
+            "steam_id": STEAM_ID_BASE + index * 7 + rng.randrange(7),
+            "games": encode_for_storage(games),
+            "games_refreshed_at": "2026-01-01T00:00:00+00:00",
+        })
+    return rows
+
+
+# --- In-memory stand-in for the supabase client ----------------------------
+
+class _Response:
+    def __init__(self, data: list):
+        self.data = data
+
+
+class _Query:
+    """The select() subset the recommender and table_scan use: eq, neq, gt, in_, order, limit"""
+
+    def __init__(self, table: "InMemoryTable"):
+        self.table = table
+        self.columns: Optional[List[str]] = None
+        self.filters = []
+        self.order_key: Optional[str] = None
+        self.limit_count: Optional[int] = None
+        self.after = None
+        self.ids: Optional[list] = None
+
+    def select(self, columns: str = "*"):
+        self.columns = None if columns.strip() == "*" else [column.strip() for column in columns.split(",")]
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column: str, values):
+        if column == "steam_id":
+            self.ids = list(values)  # Served from the primary key index
+            return self
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gt(self, column: str, value):
+        if column == "steam_id":
+            self.after = value  # Served with a binary search, like an index range scan
+        else:
+            self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_key = column
+        return self
+
+    def limit(self, count: int):
+        self.limit_count = count
+        return self
+
+    def execute(self) -> _Response:
+        self.table.requests += 1
+        if self.ids is not None:
+            rows = [self.table.by_id[steam_id] for steam_id in self.ids if steam_id in self.table.by_id]
+        elif self.after is not None:
+            table_rows = self.table.rows
+            rows = (table_rows[index] for index in range(bisect.bisect_right(self.table.keys, self.after), len(table_rows)))
+        else:
+            rows = self.table.rows
+        cap = min(self.limit_count or MAX_ROWS, self.table.max_rows)
+        result = []
+        for row in rows:
+            if all(check(row) for check in self.filters):
+                result.append(row if self.columns is None else {column: row.get(column) for column in self.columns})
+                if len(result) >= cap:
+                    break
+        return _Response(result)
+
+
+class InMemoryTable:
+    """Stands in for `supabase` with one table held in memory, sorted by steam_id"""
+
+    def __init__(self, rows: List[dict], max_rows: int = MAX_ROWS):
+        self.rows = sorted(rows, key=lambda row: row["steam_id"])
+        self.keys = [row["steam_id"] for row in self.rows]
+        self.by_id = {row["steam_id"]: row for row in self.rows}
+        self.max_rows = max_rows
+        self.requests = 0
+
+    def table(self, name: str) -> _Query:
+        return _Query(self)
+
+
+# --- Reference implementation ---------------------------------------------
+
+def reference_recommendations(
+    rows: List[dict],
+    steam_id: int,
+    top_n_games: int = 5,
+    min_playtime: int = 60,
+    max_similar_users: int = 10,
+    max_recommendations: int = 20
+) -> Dict:
+    """The algorithm of compute_collaborative_recommendations on all rows at once, with a full sort"""
+    by_id = {row["steam_id"]: row for row in rows}
+    user_games = decode_library(by_id[steam_id]["games"])
+    played = sorted(
+        ((appid, playtime) for appid, playtime, _ in user_games.items() if playtime >= min_playtime),
+        key=lambda game: game[1], reverse=True
+    )
+    user_top_games = [appid for appid, _ in played[:top_n_games]]
+    if not user_top_games:
+        return {"error": "No games with sufficient playtime found"}
+    top_games = set(user_top_games)
+    owned = user_games.appid_set()
+
+    similar_users = []
+    for row in rows:
+        if row["steam_id"] == steam_id or not row["games"]:
+            continue
+        other_game_ids = decode_library(row["games"]).appid_set()
+        overlap = len(top_games & other_game_ids)
+        if overlap > 0:
+            total_overlap = len(owned & other_game_ids)
+            similar_users.append((overlap * 10 + total_overlap, row["steam_id"], other_game_ids))
+    similar_users.sort(key=lambda user: user[0], reverse=True)
+    top_similar_users = similar_users[:max_similar_users]
+    if not top_similar_users:
+        return {"error": "No similar users found"}
+
+    scores = Counter()
+    for score, _, games in top_similar_users:
+        for appid in games - owned:
+            scores[appid] += score
+    return {
+        "recommendations": [appid for appid, _ in scores.most_common(max_recommendations)],
+        "similar_users": [other_id for _, other_id, _ in top_similar_users],
+        "user_top_games": user_top_games,
+    }
+
+
+def comparable(result: Dict) -> Dict:
+    """The parts of a compute_collaborative_recommendations result the reference produces"""
+    if result.get("error"):
+        return {"error": result["error"]}
+    return {
+        "recommendations": [recommendation["appid"] for recommendation in result["recommendations"]],
+        "similar_users": [user["steam_id"] for user in result["similar_users"]],
+        "user_top_games": result["user_top_games"],
+    }
+
+
+# --- Benchmark ------------------------------------------------------------
+
+def make_strategies(table: InMemoryTable) -> Dict:
+    async def streaming(steam_id: int) -> Dict:
+        return comparable(await recommender.compute_collaborative_recommendations(steam_id))
+
+    async def single_select(steam_id: int) -> Dict:
+        user = table.table('users').select('steam_id, games').eq('steam_id', steam_id).execute().data
+        others = table.table('users').select('steam_id, games').neq('steam_id', steam_id).execute().data
+        return reference_recommendations(user + others, steam_id)
+
+    async def reference(steam_id: int) -> Dict:
+        return reference_recommendations(table.rows, steam_id)
+
+    return {"streaming": streaming, "single-select": single_select, "reference": reference}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_strategy(strategy, query_ids: List[int]) -> Dict:
+    latencies = []
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for steam_id in query_ids:
+            start = time.perf_counter()
+            results.append(await strategy(steam_id))
+            latencies.append(time.perf_counter() - start)
+
+        # Peak memory of one query, measured separately
+        tracemalloc.start()
+        await strategy(query_ids[0])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"latencies": latencies, "peak": peak, "results": results}
+
+
+async def bench(users: int, queries: int, seed: int):
+    start = time.perf_counter()
+    rows = generate_users(users, seed)
+    table = InMemoryTable(rows, MAX_ROWS)
+    recommender.supabase = table
+    table_scan.supabase = table
+    library_cache.supabase = table
+    library_cache._library_cache = None  # Each table size starts cold
+    sizes = [len(decode_library(row["games"])) for row in rows]
+    print(f"\n{users} users ({time.perf_counter() - start:.1f}s to generate), "
+          f"median library {statistics.median(sizes):.0f}, largest {max(sizes)}")
+
+    rng = random.Random(seed)
+    query_ids = [row["steam_id"] for row in rng.sample(table.rows, min(queries, users))]
+    expected = [reference_recommendations(table.rows, steam_id) for steam_id in query_ids]
+    print(f"{'strategy':<14}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'peak MiB':>10}{'requests':>10}  results")
+    for name, strategy in make_strategies(table).items():
+        requests = table.requests
+        outcome = await run_strategy(strategy, query_ids)
+        matches = sum(result == reference for result, reference in zip(outcome["results"], expected))
+        latencies = [latency * 1000 for latency in outcome["latencies"]]
+        per_query = (table.requests - requests) / (len(query_ids) + 1)
+        print(
+            f"{name:<14}{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.95):>9.1f}{max(latencies):>9.1f}"
+            f"{outcome['peak'] / 2**20:>10.1f}{per_query:>10.1f}  {matches}/{len(query_ids)} match reference"
+        )
+    cache = library_cache.get_library_cache().stats()
+    print(f"library cache after the run: {cache['size']} libraries, {cache['bytes'] / 2**20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collaborative filtering benchmark on synthetic data")
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000], help="Table sizes (e.g. 10000 100000 1000000)")
+    parser.add_argument("--queries", type=int, default=10, help="Recommendation requests per strategy and size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for users in args.users:
+        asyncio.run(bench(users, args.queries, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Crawl-policy benchmark: FIFO vs priority frontier.
+Replays the collector's crawl loop against the fake Steam API's synthetic data
+(with friend communities, so neighbours share activity levels and tastes) and
+counts the Steam calls it would make: one GetOwnedGames per candidate, one
+GetFriendList per stored user and one GetPlayerSummaries per 100 new friends.
+Both policies get the same call budget and the same seed users.
+
+Usage:
+    python bench_crawl_frontier.py [call budget, default 3000]
+"""
+
+import sys
+import os
+import math
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.db.frontier import Frontier, referrer_weight
+from src.db.collector_config import MIN_GAMES_REQUIRED, MIN_PLAYTIME_REQUIRED
+from src.steam.fake_server import (
+    FakeSteamConfig, STEAM_ID_BASE, synthetic_player, synthetic_owned_games, synthetic_friends
+)
+
+COMMUNITIES = 200
+SEED_USERS = 5
+WORLD_SEEDS = [0, 1, 2, 3]
+
+
+def friends_of(steam_id: int, config: FakeSteamConfig) -> list:
+    return [int(friend["steamid"]) for friend in synthetic_friends(steam_id, config)["friendslist"]["friends"]]
+
+
+def crawl(prioritize: bool, budget: int, config: FakeSteamConfig) -> dict:
+    frontier = Frontier(prioritize=prioritize)
+    visited = set()
+    covered_appids = set()
+    calls = attempts = stored = 0
+
+    def enqueue(friends: list, weight: float):
+        nonlocal calls
+        new_ids = []
+        for friend_id in friends:
+            if friend_id in frontier:
+                frontier.push(friend_id, weight)
+            elif friend_id not in visited:
+                new_ids.append(friend_id)
+        visited.update(new_ids)
+        calls += math.ceil(len(new_ids) / 100)
+        for friend_id in new_ids:
+            if synthetic_player(friend_id, config)["communityvisibilitystate"] == 3:
+                frontier.push(friend_id, weight)
+
+    seeds = [STEAM_ID_BASE + community for community in range(SEED_USERS)]
+    visited.update(seeds)
+    for seed_id in seeds:
+        calls += 1
+        enqueue(friends_of(seed_id, config), referrer_weight())
+
+    while calls < budget:
+        steam_id = frontier.pop_nowait()
+        if steam_id is None:
+            break
+        attempts += 1
+        calls += 1
+        games = synthetic_owned_games(steam_id, config)["response"].get("games", [])
+        if len(games) < MIN_GAMES_REQUIRED or sum(game["playtime_forever"] for game in games) < MIN_PLAYTIME_REQUIRED:
+            continue
+        stored += 1
+        appids = [game["appid"] for game in games]
+        weight = referrer_weight(appids, covered_appids)
+        covered_appids.update(appids)
+        calls += 1
+        enqueue(friends_of(steam_id, config), weight)
+
+    return {"calls": calls, "attempts": attempts, "stored": stored, "appids": len(covered_appids)}
+
+
+def main():
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    print(f"Call budget {budget}, {COMMUNITIES} communities\n")
+    print(f"{'world':>6}{'policy':>10}{'stored':>8}{'success':>9}{'users/100 calls':>17}{'apps/100 calls':>16}")
+    for seed in WORLD_SEEDS:
+        config = FakeSteamConfig(seed=seed, communities=COMMUNITIES)
+        for name, prioritize in (("fifo", False), ("priority", True)):
+            result = crawl(prioritize, budget, config)
+            success = result["stored"] / result["attempts"] if result["attempts"] else 0.0
+            print(
+                f"{seed:>6}{name:>10}{result['stored']:>8}{success:>8.1%}"
+                f"{result['stored'] / result['calls'] * 100:>17.1f}{result['appids'] / result['calls'] * 100:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for adaptive crawler pacing (src/steam/pacing.py).
+Runs crawler-priority GetOwnedGames calls from concurrent workers against the
+in-process fake Steam API limited to --capacity requests per second, once with
+the token bucket alone (rate set to the ceiling) and once with AIMD pacing under
+the same ceiling. Reports successful calls per second, 429s received and the
+pacer's final rate and state.
+
+Usage:
+    python bench_crawler_pacing.py [--capacity 40] [--ceiling 100] [--seconds 20] [--workers 16]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from src.steam.client import SteamClient, WEBAPI
+from src.steam.fake_server import create_app, FakeSteamConfig, STEAM_ID_BASE
+from src.steam.pacing import AIMDPacer
+from src.steam.ratelimit import TokenBucket, CRAWLER
+
+
+async def run(args, paced: bool) -> dict:
+    app = create_app(FakeSteamConfig(latency_ms=20, max_rps=args.capacity, retry_after=1))
+    client = SteamClient(api_key="bench")
+    client.base_urls = {WEBAPI: "http://fake"}
+    client.buckets[WEBAPI] = TokenBucket(args.ceiling, args.ceiling / 10)
+    client.pacers = {WEBAPI: AIMDPacer(args.ceiling, burst=args.ceiling / 10)} if paced else {}
+    client._http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+
+    ok = 0
+    deadline = time.monotonic() + args.seconds
+
+    async def worker(offset: int):
+        nonlocal ok
+        steam_id = STEAM_ID_BASE + offset
+        while time.monotonic() < deadline:
+            response = await client.get_owned_games(steam_id, priority=CRAWLER)
+            if response.status_code == 200:
+                ok += 1
+            steam_id += args.workers
+
+    await asyncio.gather(*(worker(offset) for offset in range(args.workers)))
+    await client.close()
+    result = {"ok_per_second": ok / args.seconds, "rate_limited": app.state.stats["rate_limited"]}
+    if paced:
+        result.update(client.pacers[WEBAPI].stats())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive crawler pacing benchmark")
+    parser.add_argument("--capacity", type=float, default=40, help="Requests per second the fake API serves")
+    parser.add_argument("--ceiling", type=float, default=100, help="Configured rate limit / pacing ceiling")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"Fake API capacity {args.capacity:g}/s, ceiling {args.ceiling:g}/s, {args.workers} workers, {args.seconds:g}s\n")
+    print(f"{'mode':<14}{'ok/s':>8}{'429s':>8}{'final rate':>12}  state")
+    for paced in (False, True):
+        result = asyncio.run(run(args, paced))
+        rate = f"{result['rate']:.1f}" if paced else "-"
+        print(f"{'AIMD pacing' if paced else 'bucket only':<14}{result['ok_per_second']:>8.1f}"
+              f"{result['rate_limited']:>8}{rate:>12}  {result.get('state', '-')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark for owned-games normalization.
+Compares the old pandas pipeline from fetch_steam_profile with the single-pass
+normalize_owned_games, checks both give identical dicts, for 10 to 20k games.
+
+Usage:
+    python bench_library_normalization.py
+"""
+
+import sys
+import os
+import random
+import datetime
+import timeit
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from src.api.steam_breakdown import normalize_owned_games
+
+LIBRARY_SIZES = [10, 100, 1000, 5000, 20000]
+
+
+def pandas_normalize(games: list) -> dict:
+    """The pre-existing pandas implementation, kept here as the reference"""
+    df = pd.json_normalize(games)
+    remove = [col for col in df.columns if col not in ["appid", "playtime_forever", "rtime_last_played"]]
+    df = df.drop(columns=remove)
+    df = df[df["playtime_forever"] > 0]
+    if "rtime_last_played" in df.columns:
+        df["rtime_last_played"] = df["rtime_last_played"].apply(lambda x: datetime.datetime.fromtimestamp(x).strftime("%Y-%m-%d") if pd.notnull(x) else None)
+    return df.set_index("appid").to_dict(orient="index")
+
+
+def make_games(num_games: int) -> list:
+    """GetOwnedGames-shaped entries, including unplayed games and extra fields"""
+    rng = random.Random(num_games)
+    games = []
+    for appid in rng.sample(range(10, 3000000), num_games):
+        games.append({
+            "appid": appid,
+            "playtime_forever": rng.choice([0, rng.randint(1, 50000)]),
+            "playtime_windows_forever": rng.randint(0, 50000),
+            "playtime_mac_forever": 0,
+            "playtime_linux_forever": 0,
+            "rtime_last_played": rng.randint(1300000000, 1760000000),
+            "playtime_disconnected": 0,
+        })
+    return games
+
+
+def time_it(func, games, number: int) -> float:
+    best = min(timeit.repeat(lambda: func(games), repeat=5, number=number))
+    return best / number * 1000
+
+
+def main():
+    print(f"{'games':>8}{'pandas ms':>12}{'direct ms':>12}{'speedup':>10}")
+    for num_games in LIBRARY_SIZES:
+        games = make_games(num_games)
+        assert normalize_owned_games(games) == pandas_normalize(games), f"Mismatch at {num_games} games"
+        number = max(1, 2000 // num_games)
+        pandas_ms = time_it(pandas_normalize, games, number)
+        direct_ms = time_it(normalize_owned_games, games, number)
+        print(f"{num_games:>8}{pandas_ms:>12.3f}{direct_ms:>12.3f}{pandas_ms / direct_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
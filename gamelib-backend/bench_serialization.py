@@ -0,0 +1,85 @@
+"""
+Benchmark for JSON serialization of large user payloads.
+Compares the default FastAPI path (UserResponse validation + jsonable_encoder + json)
+against the FastJSONResponse fast path on a synthetic 5k-game library,
+and reports the gzip-compressed size GZipMiddleware sends.
+
+Usage:
+    python bench_serialization.py [num_games]
+"""
+
+import sys
+import os
+import gzip
+import json
+import random
+import timeit
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder
+from src.schemas.user_schema import UserResponse
+from src.api.responses import FastJSONResponse, orjson, GZIP_LEVEL
+
+
+def make_user_row(num_games: int) -> dict:
+    """Build a users row shaped like the ones stored by the collector"""
+    rng = random.Random(42)
+    games = {}
+    for appid in rng.sample(range(10, 3000000), num_games):
+        games[str(appid)] = {
+            "playtime_forever": rng.randint(1, 50000),
+            "rtime_last_played": f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        }
+    return {
+        "steam_id": 76561198000000000,
+        "data": {"personaname": "Benchmark User", "profileurl": "https://steamcommunity.com/id/bench/"},
+        "games": games,
+        "login_count": 12
+    }
+
+
+def default_path(row: dict) -> bytes:
+    # What FastAPI does for `return UserResponse(**row)` with response_model=UserResponse
+    model = UserResponse(**row)
+    validated = UserResponse.model_validate(model.model_dump())
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(row: dict) -> bytes:
+    return FastJSONResponse(row).body
+
+
+def time_it(func, row, repeat: int = 5, number: int = 10) -> float:
+    best = min(timeit.repeat(lambda: func(row), repeat=repeat, number=number))
+    return best / number * 1000
+
+
+def main():
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    row = make_user_row(num_games)
+
+    print(f"Library size: {num_games} games")
+    print(f"orjson available: {orjson is not None}\n")
+
+    default_ms = time_it(default_path, row)
+    fast_ms = time_it(fast_path, row)
+    assert json.loads(default_path(row)) == json.loads(fast_path(row))
+
+    print(f"{'path':<28}{'ms/response':>12}")
+    print(f"{'default (validate+encode)':<28}{default_ms:>12.2f}")
+    print(f"{'FastJSONResponse':<28}{fast_ms:>12.2f}")
+    print(f"speedup: {default_ms / fast_ms:.1f}x\n")
+
+    body = fast_path(row)
+    print(f"{'encoding':<10}{'bytes':>12}{'ms':>10}")
+    print(f"{'identity':<10}{len(body):>12}{0:>10.2f}")
+    compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    ms = time_it(lambda b: gzip.compress(b, compresslevel=GZIP_LEVEL), body, repeat=3, number=5)
+    print(f"{'gzip':<10}{len(compressed):>12}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
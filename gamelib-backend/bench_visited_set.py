@@ -0,0 +1,77 @@
+"""
+Memory benchmark for the collector's visited set.
+Adds the same random Steam IDs to a Python set and to VisitedSet, checks both
+give the same membership answers, and compares memory (tracemalloc) and time.
+VisitedSet.memory_bytes() is printed next to the measured number as a check
+of the estimate the collector reports.
+
+IDs are drawn from the first 1.5 billion account ids, roughly the range real
+accounts occupy. The IDs are created while building each structure, as they
+are when friend lists are parsed, so the set's numbers include the int objects
+it keeps alive.
+
+Usage:
+    python bench_visited_set.py [max ids, default 5000000]
+"""
+
+import sys
+import os
+import random
+import time
+import tracemalloc
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.db.visited_set import VisitedSet, STEAM_ID_BASE
+
+ACCOUNT_ID_RANGE = 1500000000
+SIZES = [100000, 1000000, 5000000, 20000000]
+
+
+def steam_ids(account_ids: list):
+    """Fresh SteamID64 ints for the given account ids"""
+    return (STEAM_ID_BASE + account_id for account_id in account_ids)
+
+
+def measure(build, account_ids: list):
+    """Returns (structure, bytes allocated while building it)"""
+    tracemalloc.start()
+    structure = build(steam_ids(account_ids))
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return structure, allocated
+
+
+def time_build(build, account_ids: list) -> float:
+    start = time.perf_counter()
+    build(steam_ids(account_ids))
+    return time.perf_counter() - start
+
+
+def main():
+    max_ids = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    rng = random.Random(42)
+    print(f"{'ids':>10}{'set MiB':>10}{'visited MiB':>13}{'estimate':>10}{'B/id':>6}{'ratio':>8}{'set s':>8}{'visited s':>11}")
+    for size in [size for size in SIZES if size <= max_ids]:
+        account_ids = rng.sample(range(ACCOUNT_ID_RANGE), size)
+        python_set, set_bytes = measure(set, account_ids)
+        visited, visited_bytes = measure(VisitedSet, account_ids)
+
+        probes = list(steam_ids(account_ids[:1000])) + [STEAM_ID_BASE + rng.randrange(ACCOUNT_ID_RANGE) for _ in range(1000)]
+        assert all((steam_id in python_set) == (steam_id in visited) for steam_id in probes), "Membership mismatch"
+        assert len(visited) == len(python_set)
+        estimate = visited.memory_bytes()
+        del python_set, visited
+
+        set_seconds = time_build(set, account_ids)
+        visited_seconds = time_build(VisitedSet, account_ids)
+        print(
+            f"{size:>10}{set_bytes / 2**20:>10.1f}{visited_bytes / 2**20:>13.1f}{estimate / 2**20:>10.1f}"
+            f"{visited_bytes / size:>6.0f}"
+            f"{set_bytes / visited_bytes:>7.1f}x{set_seconds:>8.2f}{visited_seconds:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
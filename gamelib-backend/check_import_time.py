@@ -0,0 +1,76 @@
+"""
+Startup import-time check for the API.
+Runs `python -X importtime -c "import src.main"` a few times and fails (exit code 1)
+if the best cumulative import time is over budget, or if a heavy dependency
+that should be imported lazily is pulled in at startup.
+
+Usage:
+    python check_import_time.py [budget_ms]
+"""
+
+import sys
+import os
+import subprocess
+
+IMPORT_TIME_BUDGET_MS = 800
+RUNS = 5
+
+# Modules that must not be imported just by loading the app
+LAZY_MODULES = ["pandas", "numpy", "sklearn", "requests", "supabase"]
+
+
+def measure_import() -> tuple:
+    """Return (cumulative import time of src.main in ms, set of imported top-level modules)"""
+    env = dict(os.environ)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit("✗ Importing src.main failed")
+
+    total_us = None
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        modules.add(name.split(".")[0])
+        if name == "src.main":
+            total_us = int(cumulative)
+    return total_us / 1000, modules
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_TIME_BUDGET_MS
+
+    timings = []
+    modules = set()
+    for _ in range(RUNS):
+        elapsed_ms, modules = measure_import()
+        timings.append(elapsed_ms)
+
+    best_ms = min(timings)
+    print(f"src.main import time: best {best_ms:.0f} ms, worst {max(timings):.0f} ms (budget {budget_ms:.0f} ms)")
+
+    eager = [module for module in LAZY_MODULES if module in modules]
+    failed = False
+    if eager:
+        print(f"✗ Heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if best_ms > budget_ms:
+        print(f"✗ Import time over budget by {best_ms - budget_ms:.0f} ms")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✓ Import time within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,36 @@
 """
 Simple runner script for the Steam data collector.
 Run this to start collecting Steam user data for collaborative filtering.
+
+Several collectors can crawl together, each serving one shard of a shared frontier:
+    python run_collector.py --shard-count 4 --shard-index 0
 """
 
 import sys
 import os
+import argparse
 
 # Add parent directory to path so we can import from src
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.db.steam_data_collector import main
+from src.db.steam_data_collector import main, SHARD_INDEX, SHARD_COUNT, COORDINATION
 import asyncio
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Steam data collector")
+    parser.add_argument("--shard-index", type=int, default=SHARD_INDEX, help="Shard crawled by this collector")
+    parser.add_argument("--shard-count", type=int, default=SHARD_COUNT, help="Number of shards (1: crawl alone)")
+    parser.add_argument("--coordination", default=COORDINATION,
+                        help="Shared frontier: a SQLite file, or 'supabase' (sql/003_crawl_frontier.sql)")
+    args = parser.parse_args()
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
+    
     print("\n🎮 Starting Steam Data Collector...")
     print("Press Ctrl+C to stop at any time.\n")
     
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.shard_index, args.shard_count, args.coordination))
     except KeyboardInterrupt:
         print("\n\n👋 Collector stopped. Goodbye!")
     except Exception as e:
@@ -0,0 +1,35 @@
+"""
+Export the users table to Parquet for offline analysis and model training
+(see src/db/dataset_export.py). Only users changed since the last export are
+written unless --full is given. Requires pyarrow.
+
+Usage:
+    python run_export.py [--out export] [--full] [--page-size 1000]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.db.dataset_export import export_dataset, EXPORT_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export users and game libraries to Parquet")
+    parser.add_argument("--out", default=EXPORT_DIR, help="Output directory")
+    parser.add_argument("--full", action="store_true", help="Export every user, not just the changed ones")
+    parser.add_argument("--page-size", type=int, default=None, help="Users fetched per request")
+    args = parser.parse_args()
+
+    stats = asyncio.run(export_dataset(args.out, full=args.full, page_size=args.page_size))
+    for path in stats["files"]:
+        print(f"  {path}")
+    print(f"Next export continues after {stats['marker']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Runner for the local fake Steam API (see src/steam/fake_server.py).
+Use it to run the collector or load-test the API without touching the real Steam API key.
+
+Example:
+    python run_fake_steam.py --port 8081 --latency-ms 80 --error-rate 0.02 --rate-limit-rate 0.01
+    STEAM_API_BASE_URL=http://localhost:8081 STEAM_STORE_BASE_URL=http://localhost:8081 python test_collector.py
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import uvicorn
+from src.steam.fake_server import create_app, FakeSteamConfig
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Steam API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fixtures", default=None, help="Directory of recorded fixtures")
+    parser.add_argument("--record", action="store_true", help="Fetch missing fixtures from real Steam and save them")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--public-rate", type=float, default=0.6, help="Fraction of synthetic profiles that are public")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rps", type=float, default=0.0, help="Answer 429 above this many requests per second")
+    parser.add_argument("--communities", type=int, default=0, help="Group synthetic accounts into friend communities")
+    args = parser.parse_args()
+
+    config = FakeSteamConfig(
+        fixtures_dir=args.fixtures,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        public_rate=args.public_rate,
+        seed=args.seed,
+        record=args.record,
+        communities=args.communities,
+        max_rps=args.max_rps,
+    )
+    print(f"\n🧪 Fake Steam API on http://{args.host}:{args.port}")
+    print(f"Set STEAM_API_BASE_URL and STEAM_STORE_BASE_URL to http://{args.host}:{args.port}\n")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,38 @@
+-- Atomic login: create the user or bump login_count in one statement.
+-- Called through PostgREST as supabase.rpc('login_upsert', {...}).
+--
+-- p_data / p_games: new values, NULL keeps what is stored
+-- p_login_count:    login_count for a newly created row
+-- p_create:         false only updates an existing user (returns no row if missing)
+
+create or replace function login_upsert(
+    p_steam_id bigint,
+    p_data jsonb default null,
+    p_games jsonb default null,
+    p_login_count integer default 1,
+    p_create boolean default true
+)
+returns setof users
+language plpgsql
+as $$
+begin
+    if p_create then
+        return query
+        insert into users as u (steam_id, data, games, login_count)
+        values (p_steam_id, p_data, p_games, p_login_count)
+        on conflict (steam_id) do update set
+            data = coalesce(excluded.data, u.data),
+            games = coalesce(excluded.games, u.games),
+            login_count = coalesce(u.login_count, 0) + 1
+        returning u.*;
+    else
+        return query
+        update users as u set
+            data = coalesce(p_data, u.data),
+            games = coalesce(p_games, u.games),
+            login_count = coalesce(u.login_count, 0) + 1
+        where u.steam_id = p_steam_id
+        returning u.*;
+    end if;
+end;
+$$;
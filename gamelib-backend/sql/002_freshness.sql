@@ -0,0 +1,62 @@
+-- Per-field freshness timestamps, used to skip Steam calls for recently refreshed users
+-- and to decide which background refresh jobs a login should queue.
+
+alter table users add column if not exists data_refreshed_at timestamptz;
+alter table users add column if not exists games_refreshed_at timestamptz;
+
+-- login_upsert from 001, now stamping the refresh time of any field it writes
+create or replace function login_upsert(
+    p_steam_id bigint,
+    p_data jsonb default null,
+    p_games jsonb default null,
+    p_login_count integer default 1,
+    p_create boolean default true
+)
+returns setof users
+language plpgsql
+as $$
+begin
+    if p_create then
+        return query
+        insert into users as u (steam_id, data, games, login_count, data_refreshed_at, games_refreshed_at)
+        values (
+            p_steam_id, p_data, p_games, p_login_count,
+            case when p_data is null then null else now() end,
+            case when p_games is null then null else now() end
+        )
+        on conflict (steam_id) do update set
+            data = coalesce(excluded.data, u.data),
+            games = coalesce(excluded.games, u.games),
+            data_refreshed_at = coalesce(excluded.data_refreshed_at, u.data_refreshed_at),
+            games_refreshed_at = coalesce(excluded.games_refreshed_at, u.games_refreshed_at),
+            login_count = coalesce(u.login_count, 0) + 1
+        returning u.*;
+    else
+        return query
+        update users as u set
+            data = coalesce(p_data, u.data),
+            games = coalesce(p_games, u.games),
+            data_refreshed_at = case when p_data is null then u.data_refreshed_at else now() end,
+            games_refreshed_at = case when p_games is null then u.games_refreshed_at else now() end,
+            login_count = coalesce(u.login_count, 0) + 1
+        where u.steam_id = p_steam_id
+        returning u.*;
+    end if;
+end;
+$$;
+
+-- Apply a library diff to a legacy (plain jsonb) games column without rewriting the whole library.
+-- p_changed: {appid: entry} for added or changed games; p_removed: appids no longer owned.
+create or replace function apply_library_diff(
+    p_steam_id bigint,
+    p_changed jsonb,
+    p_removed text[] default '{}'
+)
+returns void
+language sql
+as $$
+    update users set
+        games = (coalesce(games, '{}'::jsonb) || p_changed) - p_removed,
+        games_refreshed_at = now()
+    where steam_id = p_steam_id;
+$$;
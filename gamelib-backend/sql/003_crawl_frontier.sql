@@ -0,0 +1,74 @@
+-- Shared crawl frontier for running several collector processes (run_collector.py --shard-count N).
+-- Every discovered Steam ID gets one row, assigned to a hash partition (shard). A process serving
+-- a shard claims queued rows through a lease; rows whose lease expired (crashed process) can be
+-- claimed again. Rows are never deleted, so an ID offered twice is only crawled once.
+
+create table if not exists crawl_frontier (
+    steam_id bigint primary key,
+    shard integer not null,
+    score double precision not null default 0,
+    status text not null default 'queued',  -- queued | leased | done
+    outcome text,
+    lease_owner text,
+    lease_expires_at timestamptz,
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists crawl_frontier_claim_idx on crawl_frontier (shard, status, score desc);
+
+create table if not exists crawl_meta (
+    key text primary key,
+    value text
+);
+
+-- Queue candidates for their shards. An ID already queued gets the new score added; an ID
+-- that is leased or done is left alone. p_items: [{"steam_id": ..., "shard": ..., "score": ...}]
+create or replace function offer_crawl_items(p_items jsonb)
+returns void
+language sql
+as $$
+    insert into crawl_frontier as f (steam_id, shard, score)
+    select (item->>'steam_id')::bigint, (item->>'shard')::integer, (item->>'score')::double precision
+    from jsonb_array_elements(p_items) as item
+    on conflict (steam_id) do update set
+        score = f.score + excluded.score,
+        updated_at = now()
+    where f.status = 'queued';
+$$;
+
+-- Lease up to p_limit of a shard's best queued (or expired) rows to p_owner for p_ttl seconds
+create or replace function claim_crawl_items(
+    p_shard integer,
+    p_owner text,
+    p_limit integer,
+    p_ttl double precision
+)
+returns table (steam_id bigint, score double precision)
+language sql
+as $$
+    update crawl_frontier as f set
+        status = 'leased',
+        lease_owner = p_owner,
+        lease_expires_at = now() + make_interval(secs => p_ttl),
+        updated_at = now()
+    where f.steam_id in (
+        select c.steam_id from crawl_frontier as c
+        where c.shard = p_shard
+          and (c.status = 'queued' or (c.status = 'leased' and c.lease_expires_at < now()))
+        order by c.score desc
+        limit p_limit
+        for update skip locked
+    )
+    returning f.steam_id, f.score;
+$$;
+
+-- Extend p_owner's leases on the given rows
+create or replace function renew_crawl_leases(p_owner text, p_steam_ids bigint[], p_ttl double precision)
+returns void
+language sql
+as $$
+    update crawl_frontier set
+        lease_expires_at = now() + make_interval(secs => p_ttl),
+        updated_at = now()
+    where steam_id = any(p_steam_ids) and lease_owner = p_owner and status = 'leased';
+$$;
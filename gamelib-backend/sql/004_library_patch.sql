@@ -0,0 +1,17 @@
+-- Apply a library diff to a compact games column (src/db/library_codec.py) without repacking it.
+-- The changes are merged into the envelope's "patch" object, which readers apply on top of the
+-- packed arrays. p_patch: {appid: [playtime, day]} for added or changed games, {appid: null} for
+-- removed ones. The refresh job rewrites the whole library once the patch gets large.
+
+create or replace function apply_library_patch(
+    p_steam_id bigint,
+    p_patch jsonb
+)
+returns void
+language sql
+as $$
+    update users set
+        games = jsonb_set(games, '{patch}', coalesce(games->'patch', '{}'::jsonb) || p_patch),
+        games_refreshed_at = now()
+    where steam_id = p_steam_id and games->>'codec' = 'lib1';
+$$;
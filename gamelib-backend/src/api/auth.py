@@ -2,9 +2,13 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
 from urllib.parse import urlencode
-import httpx
+import hashlib
 import re
 from src.api.users import user_login
+from src.cache.ttl_cache import TTLCache
+from src.jobs.login import get_login_queue
+from src.jobs.prefetch import queue_prefetch
+from src.steam.client import get_steam_client
 
 router = APIRouter()
 
@@ -13,6 +17,11 @@ STEAM_OPENID_URL = "https://steamcommunity.com/openid"
 # For development - replace with your ngrok URL when using ngrok
 STEAM_RETURN_URL = "http://localhost:8000/api/auth/steam/callback"  # Change this to https://YOUR_NGROK_URL.ngrok.io/api/auth/steam/callback
 
+# Assertions Steam already confirmed, so a replayed callback (reload, double submit)
+# doesn't pay for check_authentication again
+VERIFIED_ASSERTION_TTL = 300  # Seconds
+verified_assertions = TTLCache(maxsize=10000, ttl=VERIFIED_ASSERTION_TTL)
+
 def validate_steam_id(steam_id: str) -> bool:
     """Validate Steam ID format (17-digit number)"""
     return bool(re.match(r'^\d{17}$', steam_id))
@@ -25,6 +34,31 @@ def extract_steam_id_from_claimed_id(claimed_id: str) -> str:
         return match.group(1)
     return ""
 
+def assertion_key(params: dict) -> str:
+    """Fingerprint of the signed OpenID fields of a callback"""
+    fields = sorted((key, value) for key, value in params.items() if key.startswith('openid.'))
+    return hashlib.sha256(urlencode(fields).encode()).hexdigest()
+
+async def verify_assertion(params: dict) -> bool:
+    """Confirm the callback with Steam (check_authentication), or from the verified assertion cache"""
+    key = assertion_key(params)
+    if verified_assertions.get(key):
+        return True
+    verification_params = params.copy()
+    verification_params['openid.mode'] = 'check_authentication'
+    response = await get_steam_client().http.post(f"{STEAM_OPENID_URL}/login", data=verification_params)
+    if 'is_valid:true' not in response.text:
+        return False
+    verified_assertions.set(key, True)
+    return True
+
+async def provision_user(steam_id: int):
+    """Background login job; raising makes the login queue retry it"""
+    user = await user_login(steam_id)
+    if not user:
+        raise Exception(f"Login for {steam_id} returned no user")
+    return user
+
 @router.get("/auth/steam/login")
 async def steam_login():
     """Initiate Steam OpenID authentication"""
@@ -71,20 +105,14 @@ async def steam_callback(request: Request):
         return RedirectResponse(url=f"http://localhost:3000/login?error={error_msg}")
     
     # Verify the response with Steam
-    verification_params = params.copy()
-    verification_params['openid.mode'] = 'check_authentication'
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(f"{STEAM_OPENID_URL}/login", data=verification_params)
-            
-            if 'is_valid:true' not in response.text:
-                error_msg = "Steam verification failed"
-                return RedirectResponse(url=f"http://localhost:3000/login?error={error_msg}")
-                
-        except Exception as e:
-            error_msg = "Steam verification error"
+    replayed = assertion_key(params) in verified_assertions
+    try:
+        if not await verify_assertion(params):
+            error_msg = "Steam verification failed"
             return RedirectResponse(url=f"http://localhost:3000/login?error={error_msg}")
+    except Exception as e:
+        error_msg = "Steam verification error"
+        return RedirectResponse(url=f"http://localhost:3000/login?error={error_msg}")
     
     # Extract Steam ID
     claimed_id = params.get('openid.claimed_id', '')
@@ -98,8 +126,12 @@ async def steam_callback(request: Request):
         error_msg = "Invalid Steam ID"
         return RedirectResponse(url=f"http://localhost:3000/login?error={error_msg}")
     
-    # Redirect to dashboard with Steam ID
-    await user_login(int(steam_id))  # Ensure user is logged in / created in the system
+    # Log the user in / create them in the background and redirect right away.
+    # A replayed callback is the same login, so it isn't counted again.
+    if not replayed:
+        get_login_queue().submit(int(steam_id), provision_user, int(steam_id))
+        # Warm what the dashboard loads next
+        queue_prefetch(int(steam_id))
     dashboard_url = f"http://localhost:3000/dashboard?steam_id={steam_id}"
     print(f"Redirecting to dashboard: {dashboard_url}")
     return RedirectResponse(url=dashboard_url)
\ No newline at end of file
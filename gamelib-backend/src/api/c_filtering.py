@@ -1,10 +1,28 @@
 from fastapi import APIRouter, HTTPException
 from src.recommender.recommender import get_collaborative_recommendations
+from src.api.responses import FastJSONResponse
+from src.steam.client import get_steam_client
+from src.steam.negative_cache import get_negative_cache, APP, MISSING_APP
 from typing import Optional
 
 router = APIRouter()
 
-@router.get("/collaborative-recommendations/{steam_id}")
+def basic_recommendation(rec: dict) -> dict:
+    """Recommendation entry without Steam store details"""
+    appid = rec["appid"]
+    return {
+        "appid": appid,
+        "name": f"Game {appid}",
+        "header_image": "",
+        "short_description": "",
+        "genres": [],
+        "price": "N/A",
+        "recommendation_score": rec["recommendation_score"],
+        "recommended_by_count": rec["recommended_by_count"],
+        "steam_url": f"https://store.steampowered.com/app/{appid}"
+    }
+
+@router.get("/collaborative-recommendations/{steam_id}", response_class=FastJSONResponse)
 async def get_collaborative_filtering_recommendations(
     steam_id: int,
     top_n_games: Optional[int] = 5,
@@ -47,77 +65,54 @@ async def get_collaborative_filtering_recommendations(
             }
         
         # Fetch game details from Steam API for each recommendation
-        import httpx
-        import os
-        from dotenv import load_dotenv
-        
-        load_dotenv()
-        STEAM_API_KEY = os.getenv("STEAM_API_KEY")
-        
+        steam_client = get_steam_client()
+        negative_cache = get_negative_cache()
         recommendations_with_details = []
         
-        async with httpx.AsyncClient() as client:
-            for rec in result.get("recommendations", []):
-                appid = rec["appid"]
+        for rec in result.get("recommendations", []):
+            appid = rec["appid"]
+            
+            # Steam recently said this app doesn't exist, don't ask again
+            if negative_cache.get(APP, appid) == MISSING_APP:
+                recommendations_with_details.append(basic_recommendation(rec))
+                continue
+            
+            # Fetch game details from Steam API
+            try:
+                data = await steam_client.get_app_details(appid, timeout=5.0)
                 
-                # Fetch game details from Steam API
-                try:
-                    url = f"https://store.steampowered.com/api/appdetails?appids={appid}"
-                    response = await client.get(url, timeout=5.0)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
+                if data is not None:
+                    if str(appid) in data and data[str(appid)]["success"]:
+                        game_data = data[str(appid)]["data"]
                         
-                        if str(appid) in data and data[str(appid)]["success"]:
-                            game_data = data[str(appid)]["data"]
-                            
-                            recommendations_with_details.append({
-                                "appid": appid,
-                                "name": game_data.get("name", f"Game {appid}"),
-                                "header_image": game_data.get("header_image", ""),
-                                "short_description": game_data.get("short_description", ""),
-                                "genres": [g["description"] for g in game_data.get("genres", [])],
-                                "price": game_data.get("price_overview", {}).get("final_formatted", "Free"),
-                                "recommendation_score": rec["recommendation_score"],
-                                "recommended_by_count": rec["recommended_by_count"],
-                                "steam_url": f"https://store.steampowered.com/app/{appid}"
-                            })
-                        else:
-                            # Fallback if game details not available
-                            recommendations_with_details.append({
-                                "appid": appid,
-                                "name": f"Game {appid}",
-                                "header_image": "",
-                                "short_description": "",
-                                "genres": [],
-                                "price": "N/A",
-                                "recommendation_score": rec["recommendation_score"],
-                                "recommended_by_count": rec["recommended_by_count"],
-                                "steam_url": f"https://store.steampowered.com/app/{appid}"
-                            })
-                except Exception as e:
-                    print(f"Error fetching details for game {appid}: {str(e)}")
-                    # Add basic info without details
-                    recommendations_with_details.append({
-                        "appid": appid,
-                        "name": f"Game {appid}",
-                        "header_image": "",
-                        "short_description": "",
-                        "genres": [],
-                        "price": "N/A",
-                        "recommendation_score": rec["recommendation_score"],
-                        "recommended_by_count": rec["recommended_by_count"],
-                        "steam_url": f"https://store.steampowered.com/app/{appid}"
-                    })
+                        recommendations_with_details.append({
+                            "appid": appid,
+                            "name": game_data.get("name", f"Game {appid}"),
+                            "header_image": game_data.get("header_image", ""),
+                            "short_description": game_data.get("short_description", ""),
+                            "genres": [g["description"] for g in game_data.get("genres", [])],
+                            "price": game_data.get("price_overview", {}).get("final_formatted", "Free"),
+                            "recommendation_score": rec["recommendation_score"],
+                            "recommended_by_count": rec["recommended_by_count"],
+                            "steam_url": f"https://store.steampowered.com/app/{appid}"
+                        })
+                    else:
+                        # Fallback if game details not available
+                        negative_cache.mark(APP, appid, MISSING_APP)
+                        recommendations_with_details.append(basic_recommendation(rec))
+            except Exception as e:
+                print(f"Error fetching details for game {appid}: {str(e)}")
+                # Add basic info without details
+                recommendations_with_details.append(basic_recommendation(rec))
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "recommendations": recommendations_with_details,
             "similar_users": result.get("similar_users", []),
             "user_top_games": result.get("user_top_games", []),
             "total_users_analyzed": result.get("total_users_analyzed", 0),
             "similar_users_found": result.get("similar_users_found", 0)
-        }
+        })
         
     except Exception as e:
         print(f"Error in get_collaborative_filtering_recommendations: {str(e)}")
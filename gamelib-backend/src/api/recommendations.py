@@ -1,14 +1,12 @@
 from fastapi import APIRouter, HTTPException
-from src.recommender.recommender import get_game_clusters
-import os
+from src.recommender.recommender import get_game_clusters, cluster_score
+from src.api.responses import FastJSONResponse
+from src.steam.client import get_steam_client
+from src.steam.batching import get_summary_batcher
+from src.steam.negative_cache import get_negative_cache, APP, MISSING_APP, FILTERED
 import httpx
 import asyncio
 
-# Get Steam API key from environment variables (loaded in main.py)
-STEAM_API_KEY = os.getenv("STEAM_API_KEY")
-if not STEAM_API_KEY:
-    raise ValueError("STEAM_API_KEY environment variable is required")
-
 router = APIRouter()
 
 
@@ -17,45 +15,46 @@ async def get_steam_app_details(app_id: int):
     Fetch detailed game information from Steam API with content filtering
     """
     try:
-        url = f"https://store.steampowered.com/api/appdetails?appids={app_id}&format=json"
+        negative_cache = get_negative_cache()
+        if negative_cache.get(APP, app_id):
+            return None
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            
-            if response.status_code == 200:
-                data = response.json()
+        data = await get_steam_client().get_app_details(app_id)
+        
+        if data is not None:
+            # Steam API returns data with app_id as key
+            app_data = data.get(str(app_id))
+            if app_data and app_data.get('success') and 'data' in app_data:
+                game_data = app_data['data']
                 
-                # Steam API returns data with app_id as key
-                app_data = data.get(str(app_id))
-                if app_data and app_data.get('success') and 'data' in app_data:
-                    game_data = app_data['data']
-                    
-                    # Check if content is appropriate
-                    if not is_content_appropriate(game_data):
-                        print(f"DEBUG: Filtered out inappropriate content for app_id: {app_id}")
-                        return None
-                    
-                    # Extract relevant information
-                    game_info = {
-                        "app_id": app_id,
-                        "title": game_data.get('name', 'Unknown Game'),
-                        "description": game_data.get('short_description', ''),
-                        "image": game_data.get('header_image', ''),
-                        "price": game_data.get('price_overview', {}).get('final_formatted', 'Free'),
-                        "genres": [genre.get('description', '') for genre in game_data.get('genres', [])],
-                        "categories": [cat.get('description', '') for cat in game_data.get('categories', [])],
-                        "developers": game_data.get('developers', []),
-                        "publishers": game_data.get('publishers', []),
-                        "release_date": game_data.get('release_date', {}).get('date', ''),
-                        "steam_url": f"https://store.steampowered.com/app/{app_id}/"
-                    }
-                    
-                    return game_info
-                else:
+                # Check if content is appropriate
+                if not is_content_appropriate(game_data):
+                    print(f"DEBUG: Filtered out inappropriate content for app_id: {app_id}")
+                    negative_cache.mark(APP, app_id, FILTERED)
                     return None
+                
+                # Extract relevant information
+                game_info = {
+                    "app_id": app_id,
+                    "title": game_data.get('name', 'Unknown Game'),
+                    "description": game_data.get('short_description', ''),
+                    "image": game_data.get('header_image', ''),
+                    "price": game_data.get('price_overview', {}).get('final_formatted', 'Free'),
+                    "genres": [genre.get('description', '') for genre in game_data.get('genres', [])],
+                    "categories": [cat.get('description', '') for cat in game_data.get('categories', [])],
+                    "developers": game_data.get('developers', []),
+                    "publishers": game_data.get('publishers', []),
+                    "release_date": game_data.get('release_date', {}).get('date', ''),
+                    "steam_url": f"https://store.steampowered.com/app/{app_id}/"
+                }
+                
+                return game_info
             else:
+                negative_cache.mark(APP, app_id, MISSING_APP)
                 return None
-                
+        else:
+            return None
+            
     except Exception as e:
         print(f"DEBUG: Error fetching Steam app details for {app_id}: {str(e)}")
         return None
@@ -128,32 +127,32 @@ async def get_steam_app_details_basic(app_id: int):
     Fetch basic game details (just title and app_id) for source games
     """
     try:
-        url = f"https://store.steampowered.com/api/appdetails?appids={app_id}&format=json"
+        negative_cache = get_negative_cache()
+        if negative_cache.get(APP, app_id) == MISSING_APP:
+            return None
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            
-            if response.status_code == 200:
-                data = response.json()
+        data = await get_steam_client().get_app_details(app_id)
+        
+        if data is not None:
+            # Steam API returns data with app_id as key
+            app_data = data.get(str(app_id))
+            if app_data and app_data.get('success') and 'data' in app_data:
+                game_data = app_data['data']
                 
-                # Steam API returns data with app_id as key
-                app_data = data.get(str(app_id))
-                if app_data and app_data.get('success') and 'data' in app_data:
-                    game_data = app_data['data']
-                    
-                    return {
-                        "app_id": app_id,
-                        "title": game_data.get('name', 'Unknown Game')
-                    }
-            
-            return None
+                return {
+                    "app_id": app_id,
+                    "title": game_data.get('name', 'Unknown Game')
+                }
+            negative_cache.mark(APP, app_id, MISSING_APP)
+        
+        return None
             
     except Exception as e:
         print(f"DEBUG: Error fetching basic Steam app details for {app_id}: {str(e)}")
         return None
 
 
-@router.get("/clusters/{steam_id}")
+@router.get("/clusters/{steam_id}", response_class=FastJSONResponse)
 async def get_clusters(steam_id: int):
     """
     Get game recommendations/clusters for a user by Steam ID
@@ -165,7 +164,7 @@ async def get_clusters(steam_id: int):
         print(f"DEBUG: get_game_clusters returned: {type(clusters)} - {clusters}")
         if not clusters:
             raise HTTPException(status_code=404, detail="No recommendations found")
-        return clusters
+        return FastJSONResponse(clusters)
     except ValueError as e:
         print(f"DEBUG: ValueError occurred: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -176,46 +175,43 @@ async def get_clusters(steam_id: int):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@router.get("/steam/profile/{steam_id}")
+@router.get("/steam/profile/{steam_id}", response_class=FastJSONResponse)
 async def get_steam_profile(steam_id: int):
     """
     Get Steam user's owned games and play data
     """
     try:
-        url = f"http://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={STEAM_API_KEY}&steamid={steam_id}&format=json&include_appinfo=1&include_played_free_games=1"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                data = response.json()
+        response = await get_steam_client().get_owned_games(steam_id, include_appinfo=True)
+        if response.status_code == 200:
+            data = response.json()
+            
+            if "response" in data and "games" in data["response"]:
+                # Process the games data
+                games = data["response"]["games"]
                 
-                if "response" in data and "games" in data["response"]:
-                    # Process the games data
-                    games = data["response"]["games"]
-                    
-                    # Create a simplified version for the API response
-                    processed_games = []
-                    for game in games:
-                        if game.get("playtime_forever", 0) > 0:  # Only include played games
-                            processed_games.append({
-                                "appid": game.get("appid"),
-                                "name": game.get("name", "Unknown Game"),
-                                "playtime_forever": game.get("playtime_forever", 0),
-                                "playtime_2weeks": game.get("playtime_2weeks", 0),
-                                "img_icon_url": game.get("img_icon_url", ""),
-                                "rtime_last_played": game.get("rtime_last_played")
-                            })
-                    
-                    return {
-                        "steam_id": steam_id,
-                        "total_games": len(processed_games),
-                        "games": processed_games
-                    }
-                else:
-                    return {"steam_id": steam_id, "total_games": 0, "games": []}
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch Steam profile")
+                # Create a simplified version for the API response
+                processed_games = []
+                for game in games:
+                    if game.get("playtime_forever", 0) > 0:  # Only include played games
+                        processed_games.append({
+                            "appid": game.get("appid"),
+                            "name": game.get("name", "Unknown Game"),
+                            "playtime_forever": game.get("playtime_forever", 0),
+                            "playtime_2weeks": game.get("playtime_2weeks", 0),
+                            "img_icon_url": game.get("img_icon_url", ""),
+                            "rtime_last_played": game.get("rtime_last_played")
+                        })
                 
+                return FastJSONResponse({
+                    "steam_id": steam_id,
+                    "total_games": len(processed_games),
+                    "games": processed_games
+                })
+            else:
+                return {"steam_id": steam_id, "total_games": 0, "games": []}
+        else:
+            raise HTTPException(status_code=response.status_code, detail="Failed to fetch Steam profile")
+            
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching Steam profile: {str(e)}")
 
@@ -226,35 +222,24 @@ async def get_steam_player_summary(steam_id: int):
     Get Steam user's profile information (name, avatar, etc.)
     """
     try:
-        url = f"http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/"
-        params = {
-            'key': STEAM_API_KEY,
-            'steamids': str(steam_id)
-        }
+        player = await get_summary_batcher().get(steam_id)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if "response" in data and "players" in data["response"] and len(data["response"]["players"]) > 0:
-                player = data["response"]["players"][0]
-                return {
-                    "steamid": player.get("steamid"),
-                    "personaname": player.get("personaname"),
-                    "profileurl": player.get("profileurl"),
-                    "avatar": player.get("avatar"),
-                    "avatarmedium": player.get("avatarmedium"),
-                    "avatarfull": player.get("avatarfull"),
-                    "personastate": player.get("personastate"),
-                    "communityvisibilitystate": player.get("communityvisibilitystate"),
-                    "profilestate": player.get("profilestate"),
-                    "lastlogoff": player.get("lastlogoff"),
-                    "commentpermission": player.get("commentpermission")
-                }
-            else:
-                raise HTTPException(status_code=404, detail="Player not found")
+        if player:
+            return {
+                "steamid": player.get("steamid"),
+                "personaname": player.get("personaname"),
+                "profileurl": player.get("profileurl"),
+                "avatar": player.get("avatar"),
+                "avatarmedium": player.get("avatarmedium"),
+                "avatarfull": player.get("avatarfull"),
+                "personastate": player.get("personastate"),
+                "communityvisibilitystate": player.get("communityvisibilitystate"),
+                "profilestate": player.get("profilestate"),
+                "lastlogoff": player.get("lastlogoff"),
+                "commentpermission": player.get("commentpermission")
+            }
+        else:
+            raise HTTPException(status_code=404, detail="Player not found")
                 
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail="Steam API error")
@@ -305,16 +290,6 @@ async def test_recommendations(steam_id: int):
             print(f"DEBUG: Found {len(clusters_list)} clusters")
             
             if clusters_list:
-                # Sort clusters by relevance (recent playtime + total playtime + popularity)
-                def cluster_score(cluster):
-                    recent_playtime = cluster.get('playtime_2weeks', 0)
-                    total_playtime = cluster.get('playtime_forever', 0)
-                    popularity = cluster.get('similar_item_popularity_score', 0)
-                    
-                    # Weight recent activity higher, but also consider total time and popularity
-                    score = (recent_playtime * 10) + (total_playtime * 0.1) + (popularity * 1000)
-                    return score
-                
                 # Sort clusters by relevance score
                 sorted_clusters = sorted(clusters_list, key=cluster_score, reverse=True)
                 
@@ -401,13 +376,6 @@ async def test_recommendations(steam_id: int):
             clusters_list = response_data.get('clusters', [])
             
             # Sort clusters by relevance (reuse the scoring function)
-            def cluster_score(cluster):
-                recent_playtime = cluster.get('playtime_2weeks', 0)
-                total_playtime = cluster.get('playtime_forever', 0)
-                popularity = cluster.get('similar_item_popularity_score', 0)
-                score = (recent_playtime * 10) + (total_playtime * 0.1) + (popularity * 1000)
-                return score
-            
             sorted_clusters = sorted(clusters_list, key=cluster_score, reverse=True)
             
             # Try more clusters if available
@@ -0,0 +1,41 @@
+"""
+Fast-path response helpers for large JSON payloads (user libraries, recommendations).
+
+FastJSONResponse encodes with orjson when it is installed and falls back to the
+standard json encoder otherwise. Endpoints that already hold validated data
+(rows written through our own models, recommender output) can return it directly
+so FastAPI skips jsonable_encoder. Such endpoints declare
+response_class=FastJSONResponse instead of a response_model, which would not be
+applied to a returned Response anyway.
+
+Responses of at least COMPRESSION_MIN_SIZE bytes are gzipped by Starlette's
+GZipMiddleware (see main.py).
+"""
+
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that uses orjson when available (non-str dict keys allowed)"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
@@ -1,74 +1,64 @@
-import requests
-import pandas as pd
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-STEAM_API_KEY = os.getenv("STEAM_API_KEY")
-if not STEAM_API_KEY:
-    raise ValueError("STEAM_API_KEY environment variable is required")
-import json
 import datetime
+from src.steam.client import get_steam_client
+from src.steam.batching import get_summary_batcher
+from src.steam.ratelimit import INTERACTIVE
 
-async def fetch_steam_profile(steam_id: int):
-    import httpx
-    url = f"http://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={STEAM_API_KEY}&steamid={steam_id}&format=json"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        if response.status_code == 200:
-            data = response.json()
+def normalize_owned_games(games: list) -> dict:
+    """
+    Turn GetOwnedGames `games` into {appid: {"playtime_forever": ..., "rtime_last_played": "YYYY-MM-DD"}}.
+    Unplayed games are dropped. Like the old pandas pipeline, rtime_last_played is only
+    included when Steam sent it for at least one game; games that lack it get None.
+    """
+    has_last_played = any("rtime_last_played" in game for game in games)
+    library = {}
+    for game in games:
+        playtime = game.get("playtime_forever")
+        if playtime is None or playtime <= 0:
+            continue
+        entry = {"playtime_forever": playtime}
+        if has_last_played:
+            last_played = game.get("rtime_last_played")
+            entry["rtime_last_played"] = (
+                datetime.datetime.fromtimestamp(last_played).strftime("%Y-%m-%d") if last_played is not None else None
+            )
+        library[game["appid"]] = entry
+    return library
 
-            # Check if user has any games
-            if "response" not in data or "games" not in data["response"]:
-                # User has no games or empty library
-                return (data, {})
-            
-            games = data["response"]["games"]
-            if not games or len(games) == 0:
-                # Empty games list
-                return (data, {})
-            
-            #print("Fetched Steam profile data:", data)
-            df = pd.json_normalize(games)
-            remove = [col for col in df.columns if col not in ["appid", "playtime_forever", "rtime_last_played"]]
-            df = df.drop(columns=remove)
-            df = df[df["playtime_forever"] > 0]
-            if "rtime_last_played" in df.columns:
-                df["rtime_last_played"] = df["rtime_last_played"].apply(lambda x: datetime.datetime.fromtimestamp(x).strftime("%Y-%m-%d") if pd.notnull(x) else None)
-            df = df.set_index("appid").to_dict(orient="index")
+async def fetch_steam_profile(steam_id: int, priority: int = INTERACTIVE):
+    response = await get_steam_client().get_owned_games(steam_id, priority=priority)
+    if response.status_code == 200:
+        data = response.json()
 
-            return (data, df)
-        else:
-            raise ValueError(f"Failed to fetch Steam profile: {response.status_code}")
-    return None
+        # Check if user has any games
+        if "response" not in data or "games" not in data["response"]:
+            # User has no games or empty library
+            return (data, {})
+        
+        games = data["response"]["games"]
+        if not games or len(games) == 0:
+            # Empty games list
+            return (data, {})
+        
+        #print("Fetched Steam profile data:", data)
+        return (data, normalize_owned_games(games))
+    else:
+        raise ValueError(f"Failed to fetch Steam profile: {response.status_code}")
 
-async def fetch_steam_player_summary(steam_id: int):
+async def fetch_steam_player_summary(steam_id: int, priority: int = INTERACTIVE):
     """
     Fetch Steam user profile information using GetPlayerSummaries API
     This gets the user's name, avatar, profile URL, etc.
+    Concurrent lookups are coalesced into one multi-id request by the summary batcher.
     """
-    import httpx
     try:
-        async with httpx.AsyncClient() as client:
-            url = f"http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/"
-            params = {
-                'key': STEAM_API_KEY,
-                'steamids': str(steam_id)
-            }
-            
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            players = data.get('response', {}).get('players', [])
-            
-            if players:
-                player_data = players[0]
-                print(f"Fetched Steam player summary: {player_data}")
-                return player_data  # Returns player data with personaname, profileurl, avatarfull, etc.
-            else:
-                print(f"No player data found for steam_id: {steam_id}")
-                return None
+        player_data = await get_summary_batcher().get(steam_id, priority=priority)
+        
+        if player_data:
+            print(f"Fetched Steam player summary: {player_data}")
+            return player_data  # Returns player data with personaname, profileurl, avatarfull, etc.
+        else:
+            print(f"No player data found for steam_id: {steam_id}")
+            return None
                 
     except Exception as e:
         print(f"Error fetching Steam player summary: {e}")
@@ -1,66 +1,168 @@
-from typing import Optional
-from fastapi import APIRouter, HTTPException
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query
 from src.db.supabase_client import supabase
-from src.schemas.user_schema import UserCreate, UserResponse
+from src.schemas.user_schema import (
+    UserCreate, UserResponse, UserGamesPage, UserBatchRequest, UserBatchResponse, UserNamesResponse
+)
+from src.api.responses import FastJSONResponse
 from postgrest.exceptions import APIError
-from src.api.steam_breakdown import fetch_steam_profile, fetch_steam_player_summary
+from src.jobs.user_refresh import queue_refresh, queue_stale_refreshes, refresh_now, stale_fields, utc_now
+from src.steam.batching import fetch_player_summaries, get_summary_batcher
+from src.cache.user_cache import get_user_cache, invalidate_user
+from src.cache.library_cache import get_library_cache
+from src.jobs.login import get_login_queue
+from src.db.library_codec import library_to_dict, encode_for_storage, date_to_day, day_to_date, NO_DATE
 import asyncio
+import base64
+import bisect
 
 router = APIRouter()
 
+# Columns that can be requested through the `fields` query parameter
+USER_FIELDS = ("steam_id", "data", "games", "login_count")
+GAME_SORT_KEYS = ("playtime", "last_played")
+# Most ids one batch request may ask for (keeps the in_() filter URL a sane length)
+MAX_BATCH_IDS = 250
 
+def parse_fields(fields: Optional[str]) -> str:
+    """
+    Turn a comma separated `fields` value into a select clause for the users table.
+    steam_id is always included so the row can still be identified.
+    """
+    if not fields:
+        return '*'
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in USER_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = ['steam_id'] + [field for field in USER_FIELDS if field in requested and field != 'steam_id']
+    return ', '.join(columns)
+
+def user_payload(user_data: dict) -> dict:
+    """
+    Shape a users row like UserResponse without re-validating it.
+    Rows come from our own validated writes, so the large games dict is passed through as-is
+    (compact libraries are expanded back to the {appid: {...}} shape clients expect).
+    """
+    payload = {field: user_data[field] for field in USER_FIELDS if field in user_data}
+    if 'games' in payload:
+        payload['games'] = library_to_dict(payload['games'])
+    return payload
+
+def encode_games_cursor(key: int, appid: int) -> str:
+    return base64.urlsafe_b64encode(f"{key}:{appid}".encode()).decode()
+
+def decode_games_cursor(cursor: str) -> tuple:
+    try:
+        key, appid = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return (int(key), int(appid))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+
+def login_upsert(steam_id: int, data: Optional[dict] = None, games: Optional[dict] = None,
+                 login_count: int = 1, create: bool = True) -> Optional[dict]:
+    """
+    Create the user or increment login_count in a single round trip (sql/001_login_upsert.sql).
+    data/games of None keep the stored values. With create=False a missing user is not
+    created and None is returned. Returns the final row.
+    """
+    response = supabase.rpc('login_upsert', {
+        'p_steam_id': steam_id,
+        'p_data': data,
+        'p_games': encode_for_storage(games) if games else None,
+        'p_login_count': login_count,
+        'p_create': create
+    }).execute()
+    invalidate_user(steam_id)
+    if response.data:
+        # The RPC returns the whole row; keep it for the reads that usually follow a login
+        get_user_cache().set(steam_id, '*', response.data[0])
+        return response.data[0]
+    return None
 
 @router.post("/users/", response_model=UserResponse)
 async def create_user(user: UserCreate):
+    """
+    Create a user. Fails with 409 if the steam_id already exists
+    (logins go through login_upsert instead).
+    """
     try:
-        response = supabase.table("users").insert({
-            "steam_id": user.steam_id, 
-            "data": user.data, 
+        refreshed_at = utc_now().isoformat()
+        row = {
+            "steam_id": user.steam_id,
+            "data": user.data,
             "login_count": user.login_count
-        }).execute()
+        }
+        if user.data is not None:
+            row["data_refreshed_at"] = refreshed_at
+        if user.games:
+            row["games"] = encode_for_storage(user.games)
+            row["games_refreshed_at"] = refreshed_at
+        response = supabase.table("users").insert(row).execute()
+        invalidate_user(user.steam_id)
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to create user")
-        return UserResponse(**response.data[0])
+        return UserResponse(**user_payload(response.data[0]))
+    except HTTPException:
+        raise
     except APIError as e:
+        if e.code == '23505':  # unique_violation on steam_id
+            raise HTTPException(status_code=409, detail="User already exists")
         raise HTTPException(status_code=400, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def user_login(steam_id: int):
+    """
+    Log a Steam user in: increment login_count in one database round trip.
+    Steam is only called for a first login, to confirm the steam_id has a profile
+    before the user is created; otherwise profile and library refreshes are queued
+    in the background for whichever fields are stale.
+    Returns None if the user doesn't exist and Steam has no profile for the id.
+    """
     print(f"User login attempt for steam_id: {steam_id}")
-    # Check if user already exists
-    response = supabase.table('users').select('*').eq('steam_id', steam_id).execute()
-    
-    if response.data:
-        # User already exists, update Steam data and increment login_count
-        return await update_user_data(steam_id)
-    else:
-        print("Creating new user")
-        
-        # Fetch both games data and player profile
-        games_data, df = await fetch_steam_profile(steam_id)
-        player_profile = await fetch_steam_player_summary(steam_id)
-        
+    user = login_upsert(steam_id, create=False)
+    if not user:
+        # Raises on Steam errors, so an outage isn't mistaken for an unknown id
+        player_profile = await get_summary_batcher().get(steam_id)
         if not player_profile:
-            raise Exception("Could not fetch Steam player profile")
-        
-        # Store the player profile data (which includes personaname)
-        user_create = UserCreate(steam_id=steam_id, data=player_profile, login_count=1)
-        print(f"Creating user with data: {user_create}")
-        created = await create_user(user_create)
-        
-        # Fetch and return the created user
-        response = supabase.table('users').select('*').eq('steam_id', steam_id).execute()
-        if response.data:
-            print(f"Created user: {response.data[0]}")
-            return response.data[0]
+            print(f"No Steam profile for {steam_id}, not creating a user")
+            return None
+        user = login_upsert(steam_id, data=player_profile)
+    if user:
+        queued = stale_fields(user)
+        queue_stale_refreshes(user)
+        print(f"Logged in user {steam_id} (login_count: {user.get('login_count')}, refreshing: {queued or 'nothing'})")
+    return user
+
+async def wait_for_login(steam_id: int) -> Optional[dict]:
+    """
+    If a login for steam_id is still being provisioned in the background (see auth.steam_callback),
+    wait for it and return the user row. Returns None if there is none or it failed.
+    """
+    pending = get_login_queue().pending(steam_id)
+    if pending is None:
+        return None
+    try:
+        return await pending
+    except Exception as e:
+        print(f"Background login for {steam_id} failed: {e}")
         return None
 
-async def get_user_data(steam_id: int):
-    """Retrieve existing user data from database without updating"""
+async def get_user_data(steam_id: int, columns: str = '*'):
+    """
+    Retrieve existing user data without updating, through the user cache.
+    `columns` is passed straight to the select so callers only pull what they need.
+    """
+    cached = get_user_cache().get(steam_id, columns)
+    if cached is not None:
+        return cached
     try:
-        response = supabase.table('users').select('*').eq('steam_id', steam_id).execute()
+        response = supabase.table('users').select(columns).eq('steam_id', steam_id).execute()
         if response.data and len(response.data) > 0:
+            get_user_cache().set(steam_id, columns, response.data[0])
             return response.data[0]
         return None
     except Exception as e:
@@ -68,72 +170,165 @@ async def get_user_data(steam_id: int):
         return None
 
 async def update_user_data(steam_id: int):
+    """
+    Refresh an existing user's Steam data and increment login_count.
+    The player profile is only fetched from Steam if it is past its freshness window;
+    a stale library is refreshed in the background.
+    Returns the updated row, or None if the user doesn't exist or Steam has no profile.
+    """
     try:
-        # Fetch fresh Steam player profile data
-        print(f"Fetching Steam player profile for steam_id: {steam_id}")
-        player_profile = await fetch_steam_player_summary(steam_id)
-        
-        if not player_profile:
-            raise Exception("Could not fetch Steam player profile")
-        
-        print(f"Fetched Steam player profile: {player_profile}")
-        
-        # Get current user to increment login_count
-        current_user_response = supabase.table('users').select('login_count').eq('steam_id', steam_id).execute()
-        
-        current_login_count = 1  # Default for new users
-        if current_user_response.data and len(current_user_response.data) > 0:
-            existing_count = current_user_response.data[0].get('login_count', 0)
-            current_login_count = existing_count + 1
-            print(f"Found existing login_count: {existing_count}, incrementing to: {current_login_count}")
-        else:
-            print(f"No existing user found, using default login_count: {current_login_count}")
-        
-        # Update database with fresh player profile data and incremented login_count
-        update_payload = {
-            'data': player_profile,
-            'login_count': current_login_count
-        }
-        print(f"Update payload: {update_payload}")
-        
-        response = supabase.table('users').update(update_payload).eq('steam_id', steam_id).execute()
-        #print(f"Database update response: {response}")
-        print(f"Updated login_count to: {current_login_count}")
-        
-        if response.data and len(response.data) > 0:
-            print(f"Returning updated user: {response.data[0]}")
-            return response.data[0]
-        else:
-            print("No data returned from database update")
-            # If update didn't return data, fetch the user record
-            get_response = supabase.table('users').select('*').eq('steam_id', steam_id).execute()
-            if get_response.data and len(get_response.data) > 0:
-                print(f"Fetched user after update: {get_response.data[0]}")
-                return get_response.data[0]
+        user = login_upsert(steam_id, create=False)
+        if not user:
             return None
+        print(f"Updated login_count to: {user.get('login_count')}")
+        
+        stale = stale_fields(user)
+        if 'games' in stale:
+            queue_refresh(steam_id, ['games'])
+        if 'data' in stale:
+            print(f"Fetching Steam player profile for steam_id: {steam_id}")
+            user = await refresh_now(steam_id, 'data')
+            if not user:
+                raise Exception("Could not fetch Steam player profile")
+        return user
     except Exception as e:
         print(f"Error in update_user_data: {str(e)}")
         return None
 
-@router.get("/users/{steam_id}", response_model=UserResponse)
-async def get_user(steam_id: int, refresh: bool = False):
+def get_users_data(steam_ids: List[int], columns: str = '*') -> Dict[int, dict]:
+    """
+    Fetch many users rows: cached rows first, then one in_() query for the rest.
+    Returns {steam_id: row} for the ids that exist.
+    """
+    cache = get_user_cache()
+    users = cache.get_many(steam_ids, columns)
+    uncached = [steam_id for steam_id in steam_ids if steam_id not in users]
+    if uncached:
+        response = supabase.table('users').select(columns).in_('steam_id', uncached).execute()
+        fetched = {row['steam_id']: row for row in response.data or []}
+        cache.set_many(fetched, columns)
+        users.update(fetched)
+    return users
+
+async def provision_users(steam_ids: List[int]) -> Dict[int, dict]:
+    """
+    Create users for ids that aren't in the database yet, from one batched
+    GetPlayerSummaries lookup and one bulk insert. Ids Steam doesn't know are skipped.
+    """
+    try:
+        players = await fetch_player_summaries(steam_ids)
+    except Exception as e:
+        print(f"Error fetching player summaries for {len(steam_ids)} users: {e}")
+        return {}
+    if not players:
+        return {}
+
+    refreshed_at = utc_now().isoformat()
+    rows = [
+        {'steam_id': steam_id, 'data': player, 'login_count': 0, 'data_refreshed_at': refreshed_at}
+        for steam_id, player in players.items()
+    ]
+    # A concurrent login may have created some of these already; keep those rows as they are
+    supabase.table('users').upsert(rows, on_conflict='steam_id', ignore_duplicates=True).execute()
+    for row in rows:
+        invalidate_user(row['steam_id'])
+    print(f"Provisioned {len(rows)} of {len(steam_ids)} missing users")
+    return {row['steam_id']: row for row in rows}
+
+async def resolve_users(steam_ids: List[int], columns: str = '*', create_missing: bool = True) -> Tuple[Dict[int, dict], List[int]]:
+    """
+    Look up many users at once, creating the missing ones from Steam if asked.
+    Returns ({steam_id: row}, [ids that still couldn't be resolved]).
+    """
+    if len(steam_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} steam_ids per request")
+    steam_ids = list(dict.fromkeys(steam_ids))
+    users = get_users_data(steam_ids, columns)
+    missing = [steam_id for steam_id in steam_ids if steam_id not in users]
+
+    if missing and create_missing:
+        selected = None if columns == '*' else columns.split(', ')
+        for steam_id, row in (await provision_users(missing)).items():
+            users[steam_id] = row if selected is None else {key: value for key, value in row.items() if key in selected}
+        missing = [steam_id for steam_id in missing if steam_id not in users]
+    return users, missing
+
+@router.get("/users/cache/stats")
+async def get_user_cache_stats():
+    """Hit/miss statistics of the users row cache"""
+    return get_user_cache().stats()
+
+@router.post("/users/batch", response_class=FastJSONResponse, responses={200: {"model": UserBatchResponse}})
+async def get_users_batch(request: UserBatchRequest):
+    """
+    Get many users in one request (e.g. a friends list or leaderboard).
+    `fields` works like on GET /users/{steam_id}. Users that aren't in the database
+    are created from Steam unless create_missing is false; ids that can't be found are
+    listed in `missing`.
+    """
+    try:
+        columns = parse_fields(request.fields)
+        users, missing = await resolve_users(request.steam_ids, columns, request.create_missing)
+        return FastJSONResponse({
+            "users": [user_payload(users[steam_id]) for steam_id in dict.fromkeys(request.steam_ids) if steam_id in users],
+            "missing": missing
+        })
+    except HTTPException:
+        raise
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/users/names", response_class=FastJSONResponse, responses={200: {"model": UserNamesResponse}})
+async def get_user_names(request: UserBatchRequest):
+    """
+    Get the Steam names of many users in one request - bulk version of /users/{steam_id}/name.
+    Missing users are created from one batched Steam lookup unless create_missing is false.
+    """
+    try:
+        users, missing = await resolve_users(request.steam_ids, 'steam_id, data', request.create_missing)
+        names = {
+            steam_id: (user.get('data') or {}).get('personaname', 'Unknown Player')
+            for steam_id, user in users.items()
+        }
+        return FastJSONResponse({"names": names, "missing": missing})
+    except HTTPException:
+        raise
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/users/{steam_id}", response_class=FastJSONResponse, responses={200: {"model": UserResponse}})
+async def get_user(steam_id: int, refresh: bool = False, fields: Optional[str] = None):
     """
     Get user data by steam_id.
     If refresh=True, fetches fresh data from Steam API and updates database.
     If refresh=False (default), returns existing data from database.
+    `fields` is a comma separated list of columns (e.g. fields=data,login_count);
+    only those columns are selected from the database and returned.
     """
     try:
+        columns = parse_fields(fields)
         if refresh:
             # Fetch fresh Steam data and update database
             user_data = await update_user_data(steam_id)
+            if user_data and columns != '*':
+                user_data = {key: value for key, value in user_data.items() if key in columns.split(', ')}
         else:
             # Just get existing data from database
-            user_data = await get_user_data(steam_id)
+            user_data = await get_user_data(steam_id, columns)
+            if not user_data and await wait_for_login(steam_id):
+                # The user just logged in and is still being created
+                user_data = await get_user_data(steam_id, columns)
         
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return UserResponse(**user_data)
+        return FastJSONResponse(user_payload(user_data))
+    except HTTPException:
+        raise
     except APIError as e:
         raise HTTPException(status_code=400, detail=e.message)
     except Exception as e:
@@ -142,6 +337,81 @@ async def get_user(steam_id: int, refresh: bool = False):
 
 
 
+@router.get("/users/{steam_id}/games", response_class=FastJSONResponse, responses={200: {"model": UserGamesPage}})
+async def get_user_games(
+    steam_id: int,
+    sort: str = "playtime",
+    order: str = "desc",
+    min_playtime: int = 0,
+    played_since: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """
+    Get a page of the user's game library.
+    Games can be sorted by "playtime" or "last_played" (order "asc" or "desc"),
+    filtered by min_playtime (minutes) and played_since (YYYY-MM-DD).
+    Pass the returned next_cursor to fetch the following page.
+    """
+    if sort not in GAME_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(GAME_SORT_KEYS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    try:
+        since_day = date_to_day(played_since) if played_since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="played_since must be YYYY-MM-DD")
+    after = decode_games_cursor(cursor) if cursor else None
+
+    try:
+        user_data = await get_user_data(steam_id, 'steam_id, games, games_refreshed_at')
+        if not user_data:
+            raise HTTPException(status_code=404, detail="User not found")
+        # Decoded once per library version, not on every page request
+        library = get_library_cache().decode(user_data)
+
+        # Build (sort key, appid) pairs; desc order is ascending on the negated key.
+        # Unplayed games sort as -1 on last_played.
+        sign = -1 if order == "desc" else 1
+        entries = []
+        for appid, playtime, day in library.items():
+            last_played = -1 if day == NO_DATE else day
+            if playtime < min_playtime:
+                continue
+            if since_day is not None and last_played < since_day:
+                continue
+            key = playtime if sort == "playtime" else last_played
+            entries.append((sign * key, appid, (playtime, day)))
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+
+        start = bisect.bisect_right(entries, after, key=lambda entry: (entry[0], entry[1])) if after else 0
+        page = entries[start:start + limit]
+        next_cursor = None
+        if start + limit < len(entries):
+            last_key, last_appid, _ = page[-1]
+            next_cursor = encode_games_cursor(last_key, last_appid)
+
+        return FastJSONResponse({
+            "steam_id": steam_id,
+            "total_games": len(entries),
+            "games": [
+                {
+                    "appid": appid,
+                    "playtime_forever": playtime,
+                    "rtime_last_played": day_to_date(day)
+                }
+                for _, appid, (playtime, day) in page
+            ],
+            "next_cursor": next_cursor
+        })
+    except HTTPException:
+        raise
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.put("/users/{steam_id}", response_model=UserResponse)
 async def update_user(steam_id: int, user: Optional[UserCreate] = None, refresh_steam: bool = False):
     """
@@ -158,15 +428,16 @@ async def update_user(steam_id: int, user: Optional[UserCreate] = None, refresh_
                 update_data["login_count"] = user.login_count
             
             response = supabase.table("users").update(update_data).eq("steam_id", steam_id).execute()
+            invalidate_user(steam_id)
             if not response.data:
                 raise HTTPException(status_code=400, detail="Failed to update user")
-            return UserResponse(**response.data[0])
+            return UserResponse(**user_payload(response.data[0]))
         elif refresh_steam:
             # Fetch fresh Steam data and update (this will increment login_count)
             user_data = await update_user_data(steam_id)
             if not user_data:
                 raise HTTPException(status_code=400, detail="Failed to update user with Steam data")
-            return UserResponse(**user_data)
+            return UserResponse(**user_payload(user_data))
         else:
             raise HTTPException(status_code=400, detail="Either provide user data or set refresh_steam=True")
     except APIError as e:
@@ -186,7 +457,7 @@ async def refresh_user_steam_data(steam_id: int):
         user_data = await update_user_data(steam_id)
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found or failed to refresh Steam data")
-        return UserResponse(**user_data)
+        return UserResponse(**user_payload(user_data))
     except APIError as e:
         raise HTTPException(status_code=400, detail=e.message)
     except Exception as e:
@@ -197,6 +468,7 @@ async def refresh_user_steam_data(steam_id: int):
 async def delete_user(steam_id: int):
     try:
         response = supabase.table("users").delete().eq("steam_id", steam_id).execute()
+        invalidate_user(steam_id)
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to delete user")
         return {"detail": "User deleted successfully"}
@@ -214,13 +486,13 @@ async def get_user_name(steam_id: int):
     try:
         print(f"get_user_name called for steam_id: {steam_id}")
         
-        # First try to get from database
-        user_data = await get_user_data(steam_id)
+        # First try to get from database (only the profile column is needed)
+        user_data = await get_user_data(steam_id, 'steam_id, data')
         print(f"User data from database: {user_data}")
         
         if user_data:
             # User exists in database, get name from stored data
-            steam_data = user_data.get('data', {})
+            steam_data = user_data.get('data') or {}
             player_name = steam_data.get('personaname', 'Unknown Player')
             print(f"Found user in database, player_name: {player_name}")
             return {"name": player_name}
@@ -229,19 +501,22 @@ async def get_user_name(steam_id: int):
             print(f"User {steam_id} not found in database, creating user via login process")
             
             try:
-                login_result = await user_login(steam_id)
+                # Reuse the login started by the OpenID callback rather than logging in twice
+                login_result = await wait_for_login(steam_id) or await user_login(steam_id)
                 print(f"Login result: {login_result}")
                 
                 if login_result:
                     # User was successfully created/updated, get name from database result
-                    steam_data = login_result.get('data', {})
+                    steam_data = login_result.get('data') or {}
                     player_name = steam_data.get('personaname', 'Unknown Player')
                     print(f"Created user successfully, player_name: {player_name}")
                     return {"name": player_name}
                 else:
-                    print("Login result was None")
-                    raise HTTPException(status_code=500, detail="Failed to create user - login returned None")
+                    # Steam has no profile for this id, so no user was created
+                    raise HTTPException(status_code=404, detail="Steam user not found")
                     
+            except HTTPException:
+                raise
             except Exception as login_error:
                 print(f"Error during user_login: {login_error}")
                 raise HTTPException(status_code=500, detail=f"Failed to create user: {str(login_error)}")
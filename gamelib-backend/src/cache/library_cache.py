@@ -0,0 +1,95 @@
+"""
+Decoded game libraries, cached by steam_id and games_refreshed_at.
+
+Every write of a `games` column also sets games_refreshed_at, so a cached
+library is valid for as long as the row's timestamp matches. Full-table
+consumers (collaborative filtering) scan only steam_id and games_refreshed_at
+and fetch and decode `games` just for the users whose library isn't cached,
+so warm requests neither transfer nor parse libraries. Libraries are kept as
+their compact arrays (12 bytes per game), so the default 256 MiB holds a few
+hundred thousand typical libraries; set.intersection() works on the appid
+array directly, without building a set per user.
+
+Rows without games_refreshed_at (written before sql/002_freshness.sql) can't be
+validated and are decoded every time.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+from src.cache.ttl_cache import TTLCache
+from src.db.library_codec import CompactLibrary, decode_library
+from src.db.supabase_client import supabase
+
+LIBRARY_CACHE_BYTES = int(os.getenv("LIBRARY_CACHE_BYTES", 256 * 2**20))  # 0 disables the cache
+LIBRARY_CACHE_TTL = 24 * 3600  # Seconds; entries are versioned, this only ages out idle users
+LIBRARY_CACHE_ENTRIES = 1000000
+FETCH_CHUNK_SIZE = 200  # steam_ids per in_() select (keeps the request URL short)
+
+
+def library_size(library: CompactLibrary) -> int:
+    """Approximate memory of a cached library: three 4-byte arrays plus object headers"""
+    return 12 * len(library) + 256
+
+
+class LibraryCache:
+    def __init__(self, maxbytes: int = LIBRARY_CACHE_BYTES):
+        self.entries = TTLCache(
+            maxsize=LIBRARY_CACHE_ENTRIES, ttl=LIBRARY_CACHE_TTL,
+            maxbytes=maxbytes, sizeof=library_size
+        )
+        self.enabled = maxbytes > 0
+        self.decoded = 0
+
+    def get(self, steam_id: int, refreshed_at: Optional[str]) -> Optional[CompactLibrary]:
+        if refreshed_at is None or not self.enabled:
+            return None
+        return self.entries.get((steam_id, refreshed_at))
+
+    def decode(self, row: dict) -> CompactLibrary:
+        """The library of a row with `games` (and games_refreshed_at, to cache it)"""
+        steam_id, refreshed_at = row.get('steam_id'), row.get('games_refreshed_at')
+        cached = self.get(steam_id, refreshed_at)
+        if cached is not None:
+            return cached
+        library = decode_library(row.get('games'))
+        self.decoded += 1
+        if refreshed_at is not None and self.enabled:
+            self.entries.set((steam_id, refreshed_at), library)
+        return library
+
+    def load(self, rows: List[dict]) -> Dict[int, CompactLibrary]:
+        """
+        Libraries for rows with steam_id and games_refreshed_at (e.g. a scan page).
+        The ones not cached are fetched with one in_() select per FETCH_CHUNK_SIZE ids.
+        Users without a stored library are left out.
+        """
+        libraries = {}
+        missing = []
+        for row in rows:
+            cached = self.get(row['steam_id'], row.get('games_refreshed_at'))
+            if cached is not None:
+                libraries[row['steam_id']] = cached
+            else:
+                missing.append(row['steam_id'])
+        for start in range(0, len(missing), FETCH_CHUNK_SIZE):
+            chunk = missing[start:start + FETCH_CHUNK_SIZE]
+            response = supabase.table('users').select('steam_id, games, games_refreshed_at').in_('steam_id', chunk).execute()
+            for row in response.data or []:
+                if row.get('games'):
+                    libraries[row['steam_id']] = self.decode(row)
+        return libraries
+
+    def stats(self) -> dict:
+        return dict(self.entries.stats(), decoded=self.decoded)
+
+
+_library_cache: Optional[LibraryCache] = None
+
+
+def get_library_cache() -> LibraryCache:
+    """Process-wide library cache (created on first use)"""
+    global _library_cache
+    if _library_cache is None:
+        _library_cache = LibraryCache()
+    return _library_cache
@@ -0,0 +1,32 @@
+"""
+Request coalescing for async calls.
+
+Concurrent callers asking for the same key share one in-flight call instead of
+each starting their own (e.g. a login prefetch and the dashboard request that
+follows it a moment later).
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def run(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs):
+        """Await func(*args, **kwargs), or the call already running for `key`"""
+        future = self._calls.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+        # Shielded so one caller being cancelled doesn't cancel the call for everyone
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,93 @@
+"""
+Small in-process LRU cache with per-entry expiry.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        maxbytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        """
+        Args:
+            maxsize: Maximum number of entries (least recently used are evicted first)
+            ttl: Default time-to-live in seconds
+            maxbytes: Optional bound on the total size of the values, as measured by `sizeof`
+            sizeof: Size of a value in bytes (required with maxbytes)
+        """
+        if maxbytes is not None and sizeof is None:
+            raise ValueError("maxbytes needs a sizeof function")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None, allow_expired: bool = False) -> Any:
+        """
+        Return the cached value, or `default` if missing or expired.
+        allow_expired=True returns stale values (used as a fallback when the origin is down).
+        """
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at < time.monotonic() and not allow_expired:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        self.pop(key)
+        if self.maxbytes is not None and size > self.maxbytes:
+            return  # Would evict everything else and still not fit
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        self.bytes -= entry[2]
+        return entry[0]
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and entry[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            **({"bytes": self.bytes, "maxbytes": self.maxbytes} if self.maxbytes is not None else {}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,200 @@
+"""
+Read-through cache of users rows.
+
+Rows are cached per steam_id and select clause. Every write path (login_upsert,
+PUT/DELETE /users/{steam_id}, background refreshes, bulk provisioning and
+collector inserts) invalidates the steam_id, so the TTL only bounds how long a
+row can be served if a write happens outside this code. Full rows carry the
+library, so the local cache is also bounded by the rows' JSON size (USER_CACHE_BYTES).
+
+By default the cache is an in-process LRU. With USER_CACHE_REDIS_URL set (and the
+redis package installed) rows are kept in Redis instead, so all API workers and
+the collector share one cache and see each other's invalidations.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Optional, Set
+
+from src.cache.ttl_cache import TTLCache
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))  # Rows; 0 disables the cache
+USER_CACHE_BYTES = int(os.getenv("USER_CACHE_BYTES", 64 * 2**20))  # Total JSON size of the cached rows
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 300))  # Seconds
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+REDIS_KEY_PREFIX = "gamelib:user:"
+
+
+def row_size(row: dict) -> int:
+    """Approximate memory taken by a cached row: its JSON size (dominated by `games` in full rows)"""
+    return len(json.dumps(row, separators=(',', ':'), default=str))
+
+
+class LocalUserCache:
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL, maxbytes: int = USER_CACHE_BYTES):
+        self.rows = TTLCache(maxsize=maxsize, ttl=ttl, maxbytes=maxbytes, sizeof=row_size)
+        # steam_id -> select clauses cached for it, so invalidation can drop them all
+        self._columns: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, steam_id: int, columns: str = '*') -> Optional[dict]:
+        row = self.rows.get((steam_id, columns))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(row)
+
+    def get_many(self, steam_ids: Iterable[int], columns: str = '*') -> Dict[int, dict]:
+        found = {}
+        for steam_id in steam_ids:
+            row = self.get(steam_id, columns)
+            if row is not None:
+                found[steam_id] = row
+        return found
+
+    def set(self, steam_id: int, columns: str, row: dict):
+        if self.rows.maxsize <= 0:
+            return
+        self.rows.set((steam_id, columns), dict(row))
+        self._columns.setdefault(steam_id, set()).add(columns)
+        if len(self._columns) > 2 * self.rows.maxsize:
+            self._prune()
+
+    def set_many(self, rows: Dict[int, dict], columns: str):
+        for steam_id, row in rows.items():
+            self.set(steam_id, columns, row)
+
+    def invalidate(self, steam_id: int):
+        self.invalidations += 1
+        for columns in self._columns.pop(steam_id, ()):
+            self.rows.pop((steam_id, columns))
+
+    def _prune(self):
+        """Forget index entries whose rows were evicted"""
+        self._columns = {
+            steam_id: {columns for columns in cached if (steam_id, columns) in self.rows}
+            for steam_id, cached in self._columns.items()
+        }
+        self._columns = {steam_id: cached for steam_id, cached in self._columns.items() if cached}
+
+    def clear(self):
+        self.rows.clear()
+        self._columns.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "local",
+            "size": len(self.rows),
+            "maxsize": self.rows.maxsize,
+            "bytes": self.rows.bytes,
+            "maxbytes": self.rows.maxbytes,
+            "ttl": self.rows.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class RedisUserCache:
+    """
+    Shared cache: one Redis hash per user ({select clause: row JSON}) with a TTL.
+    Redis errors are treated as misses so the API keeps working without it.
+    """
+
+    def __init__(self, url: str, ttl: float = USER_CACHE_TTL):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(steam_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}{steam_id}"
+
+    def get(self, steam_id: int, columns: str = '*') -> Optional[dict]:
+        return self.get_many([steam_id], columns).get(steam_id)
+
+    def get_many(self, steam_ids: Iterable[int], columns: str = '*') -> Dict[int, dict]:
+        steam_ids = list(steam_ids)
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for steam_id in steam_ids:
+                pipeline.hget(self._key(steam_id), columns)
+            values = pipeline.execute()
+        except Exception as e:
+            self.errors += 1
+            self.misses += len(steam_ids)
+            print(f"User cache read failed: {e}")
+            return {}
+        found = {steam_id: json.loads(value) for steam_id, value in zip(steam_ids, values) if value is not None}
+        self.hits += len(found)
+        self.misses += len(steam_ids) - len(found)
+        return found
+
+    def set(self, steam_id: int, columns: str, row: dict):
+        self.set_many({steam_id: row}, columns)
+
+    def set_many(self, rows: Dict[int, dict], columns: str):
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for steam_id, row in rows.items():
+                pipeline.hset(self._key(steam_id), columns, json.dumps(row))
+                pipeline.expire(self._key(steam_id), self.ttl)
+            pipeline.execute()
+        except Exception as e:
+            self.errors += 1
+            print(f"User cache write failed: {e}")
+
+    def invalidate(self, steam_id: int):
+        self.invalidations += 1
+        try:
+            self.client.delete(self._key(steam_id))
+        except Exception as e:
+            self.errors += 1
+            print(f"User cache invalidation failed for {steam_id}: {e}")
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{REDIS_KEY_PREFIX}*"):
+            self.client.delete(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    """Process-wide users row cache (Redis-backed if USER_CACHE_REDIS_URL is set)"""
+    global _user_cache
+    if _user_cache is None:
+        if USER_CACHE_REDIS_URL:
+            try:
+                _user_cache = RedisUserCache(USER_CACHE_REDIS_URL)
+            except ImportError:
+                print("USER_CACHE_REDIS_URL is set but the redis package is not installed; using a local cache")
+        if _user_cache is None:
+            _user_cache = LocalUserCache()
+    return _user_cache
+
+
+def invalidate_user(steam_id: int):
+    get_user_cache().invalidate(steam_id)
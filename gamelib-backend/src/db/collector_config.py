@@ -11,10 +11,14 @@ MAX_ATTEMPTS = 5000  # Maximum attempts before stopping
 MIN_GAMES_REQUIRED = 5  # Minimum games a user must have
 MIN_PLAYTIME_REQUIRED = 60  # Minimum total playtime in minutes
 
-# Rate Limiting
-DELAY_BETWEEN_USERS = 1  # Seconds to wait between processing users
-BATCH_SIZE = 15  # Number of users to process before a longer pause
-BATCH_DELAY = 30  # Seconds to wait after processing a batch
+# Steam Quota
+# Share of the Steam API key's quota used by all collectors together (split evenly across shards).
+# The API server's own share is STEAM_QUOTA_SHARE (default 0.3); the shares should add up to at most 1
+COLLECTOR_QUOTA_SHARE = 0.7
+
+# Concurrency (request rate is limited by the shared Steam client's token buckets)
+COLLECTOR_WORKERS = 8  # Candidates processed concurrently
+FRONTIER_WAIT = 5  # Seconds a worker waits on an empty frontier before trying a random Steam ID
 
 # Steam ID Generation
 STEAM_ID_BASE = 76561197960265728  # Minimum Steam ID
@@ -23,3 +27,24 @@ STEAM_ID_MAX_OFFSET = 300000000  # Maximum offset from base
 # Retry Configuration
 MAX_RETRIES = 10  # Maximum retries for failed requests
 REQUEST_TIMEOUT = 10  # Timeout for HTTP requests in seconds
+
+# Negative Cache
+NEGATIVE_CACHE_FILE = "collector_negative_cache.json"  # Private/empty profiles skipped on later runs
+
+# Crawl State
+CRAWL_STATE_FILE = "collector_state.db"  # Frontier and visited set; delete it to start a fresh crawl
+CHECKPOINT_INTERVAL = 30  # Seconds between crawl state checkpoints
+
+# Database Writes
+WRITE_BATCH_SIZE = 25  # Collected users written per bulk upsert
+WRITE_FLUSH_INTERVAL = 10  # Seconds a collected user may wait before its batch is written
+
+# Frontier
+FRONTIER_PRIORITY = False  # Crawl the best-scored candidates first (False: first in, first out; see frontier.py)
+
+# Sharding (several collectors crawling together, see crawl_leases.py)
+SHARD_COUNT = 1  # Number of shards; 1 runs a single collector on its own
+SHARD_INDEX = 0  # Shard crawled by this collector
+COORDINATION = "collector_coordination.db"  # Shared frontier: a SQLite file, or "supabase" (sql/003_crawl_frontier.sql)
+LEASE_TTL = 120  # Seconds before IDs claimed by a stopped collector can be claimed again
+CLAIM_BATCH = 50  # IDs claimed from the shared frontier at a time
@@ -0,0 +1,206 @@
+"""
+Lease-based coordination for running several collector processes.
+
+Steam IDs are split into SHARD_COUNT hash partitions. Discovered friends are
+offered to a shared frontier table (one row per ID, so an ID is only ever
+crawled once), and a process serving shard i claims that shard's best queued
+IDs through leases that expire after LEASE_TTL seconds. A process that crashes
+simply stops renewing its leases, and once they expire its IDs are claimed
+again by whichever process serves the shard next. Several processes can serve
+the same shard; leases keep them from taking the same IDs.
+
+Two stores implement the same methods:
+- SQLiteLeaseStore: a local file shared by processes on one machine
+- SupabaseLeaseStore: the crawl_frontier table from sql/003_crawl_frontier.sql,
+  for processes on several machines
+
+Both block (SQLite waits up to 30 s for another process's write lock, Supabase
+makes an HTTP request), so the collector calls them through asyncio.to_thread.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+LEASE_TTL = 120.0  # Seconds a claimed ID stays leased without a renewal
+CLAIM_BATCH = 50  # IDs claimed at a time
+
+# Frontier row statuses
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15  # 2^64 / golden ratio, spreads sequential ids evenly
+
+
+def shard_of(steam_id: int, shard_count: int) -> int:
+    """Hash partition of a Steam ID"""
+    return (((steam_id * _HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> 32) % shard_count
+
+
+SCHEMA = """
+create table if not exists crawl_frontier (
+    steam_id integer primary key,
+    shard integer not null,
+    score real not null default 0,
+    status text not null default 'queued',
+    outcome text,
+    lease_owner text,
+    lease_expires_at real,
+    updated_at real
+);
+create index if not exists crawl_frontier_claim_idx on crawl_frontier (shard, status, score desc);
+create table if not exists crawl_meta (
+    key text primary key,
+    value text
+);
+"""
+
+
+class SQLiteLeaseStore:
+    def __init__(self, path: str):
+        self.path = path
+        # Called from worker threads (asyncio.to_thread), one call at a time
+        self.lock = threading.Lock()
+        # Autocommit; claims take the write lock up front so two processes can't claim the same rows
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.executescript(SCHEMA)
+
+    def offer(self, items: Dict[int, float], shard_count: int):
+        """Queue {steam_id: score}; IDs already queued get the score added, leased or done IDs are left alone"""
+        with self.lock:
+            now = time.time()
+            self.conn.executemany(
+                "insert into crawl_frontier (steam_id, shard, score, updated_at) values (?, ?, ?, ?) "
+                "on conflict(steam_id) do update set score = score + excluded.score, updated_at = excluded.updated_at "
+                "where status = 'queued'",
+                [(steam_id, shard_of(steam_id, shard_count), score, now) for steam_id, score in items.items()]
+            )
+
+    def claim(self, shard: int, owner: str, limit: int = CLAIM_BATCH, ttl: float = LEASE_TTL) -> List[Tuple[int, float]]:
+        """Lease up to `limit` of the shard's best queued (or expired) IDs. Returns [(steam_id, score)]."""
+        with self.lock:
+            now = time.time()
+            self.conn.execute("begin immediate")
+            try:
+                rows = self.conn.execute(
+                    "select steam_id, score from crawl_frontier where shard = ? "
+                    "and (status = 'queued' or (status = 'leased' and lease_expires_at < ?)) "
+                    "order by score desc limit ?",
+                    (shard, now, limit)
+                ).fetchall()
+                self.conn.executemany(
+                    "update crawl_frontier set status = 'leased', lease_owner = ?, lease_expires_at = ?, updated_at = ? "
+                    "where steam_id = ?",
+                    [(owner, now + ttl, now, steam_id) for steam_id, _ in rows]
+                )
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+            return rows
+
+    def renew(self, owner: str, steam_ids: Iterable[int], ttl: float = LEASE_TTL):
+        with self.lock:
+            now = time.time()
+            self.conn.executemany(
+                "update crawl_frontier set lease_expires_at = ?, updated_at = ? "
+                "where steam_id = ? and lease_owner = ? and status = 'leased'",
+                [(now + ttl, now, steam_id, owner) for steam_id in steam_ids]
+            )
+
+    def complete(self, owner: str, steam_id: int, outcome: str):
+        with self.lock:
+            self.conn.execute(
+                "update crawl_frontier set status = 'done', outcome = ?, lease_owner = null, lease_expires_at = null, "
+                "updated_at = ? where steam_id = ? and lease_owner = ?",
+                (outcome, time.time(), steam_id, owner)
+            )
+
+    def release(self, owner: str):
+        """Hand the owner's unfinished IDs back to the queue (clean shutdown)"""
+        with self.lock:
+            self.conn.execute(
+                "update crawl_frontier set status = 'queued', lease_owner = null, lease_expires_at = null, updated_at = ? "
+                "where lease_owner = ? and status = 'leased'",
+                (time.time(), owner)
+            )
+
+    def claim_once(self, key: str) -> bool:
+        """True for the first process to ask for `key` (e.g. who seeds the crawl), False afterwards"""
+        with self.lock:
+            cursor = self.conn.execute("insert or ignore into crawl_meta (key, value) values (?, ?)", (key, str(time.time())))
+            return cursor.rowcount == 1
+
+    def stats(self, shard: int) -> Dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "select status, count(*) from crawl_frontier where shard = ? group by status", (shard,)
+            ).fetchall()
+            return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SupabaseLeaseStore:
+    def __init__(self):
+        from src.db.supabase_client import supabase
+
+        self.supabase = supabase
+
+    def offer(self, items: Dict[int, float], shard_count: int):
+        self.supabase.rpc('offer_crawl_items', {
+            'p_items': [
+                {'steam_id': steam_id, 'shard': shard_of(steam_id, shard_count), 'score': score}
+                for steam_id, score in items.items()
+            ]
+        }).execute()
+
+    def claim(self, shard: int, owner: str, limit: int = CLAIM_BATCH, ttl: float = LEASE_TTL) -> List[Tuple[int, float]]:
+        response = self.supabase.rpc('claim_crawl_items', {
+            'p_shard': shard, 'p_owner': owner, 'p_limit': limit, 'p_ttl': ttl
+        }).execute()
+        return [(row['steam_id'], row['score']) for row in response.data or []]
+
+    def renew(self, owner: str, steam_ids: Iterable[int], ttl: float = LEASE_TTL):
+        self.supabase.rpc('renew_crawl_leases', {
+            'p_owner': owner, 'p_steam_ids': list(steam_ids), 'p_ttl': ttl
+        }).execute()
+
+    def complete(self, owner: str, steam_id: int, outcome: str):
+        self.supabase.table('crawl_frontier').update({
+            'status': DONE, 'outcome': outcome, 'lease_owner': None, 'lease_expires_at': None
+        }).eq('steam_id', steam_id).eq('lease_owner', owner).execute()
+
+    def release(self, owner: str):
+        self.supabase.table('crawl_frontier').update({
+            'status': QUEUED, 'lease_owner': None, 'lease_expires_at': None
+        }).eq('lease_owner', owner).eq('status', LEASED).execute()
+
+    def claim_once(self, key: str) -> bool:
+        response = self.supabase.table('crawl_meta').upsert(
+            {'key': key, 'value': str(time.time())}, on_conflict='key', ignore_duplicates=True
+        ).execute()
+        return bool(response.data)
+
+    def stats(self, shard: int) -> Dict[str, int]:
+        counts = {}
+        for status in (QUEUED, LEASED, DONE):
+            response = self.supabase.table('crawl_frontier').select('steam_id', count='exact') \
+                .eq('shard', shard).eq('status', status).limit(1).execute()
+            counts[status] = response.count or 0
+        return counts
+
+    def close(self):
+        pass
+
+
+def get_lease_store(coordination: str):
+    """'supabase' for the shared crawl_frontier table, otherwise a path to a local SQLite file"""
+    if coordination == "supabase":
+        return SupabaseLeaseStore()
+    return SQLiteLeaseStore(coordination)
@@ -0,0 +1,136 @@
+"""
+Durable crawl state for the Steam data collector.
+
+A local SQLite file holds the frontier (Steam IDs waiting to be processed, with
+the player summary already fetched for them), the visited set with each ID's
+outcome, and the run counters. Writes go to an open transaction that is
+committed by checkpoint(), which the collector calls every CHECKPOINT_INTERVAL
+seconds and on shutdown, so a restart resumes from the last checkpoint.
+
+An ID stays in the frontier until its outcome is recorded. IDs a worker was
+processing when the collector stopped are therefore picked up again on resume,
+and an added user whose friends were not queued yet keeps the 'expand' stage so
+only the friend-list step is repeated.
+"""
+
+import json
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Frontier stages
+PENDING = "pending"  # Not processed yet
+EXPAND = "expand"  # Stored; its friends still need to be queued
+
+# Outcomes
+ADDED = "added"
+REJECTED = "rejected"
+
+SCHEMA = """
+create table if not exists frontier (
+    seq integer primary key autoincrement,
+    steam_id integer not null unique,
+    profile text,
+    stage text not null default 'pending',
+    score real not null default 0
+);
+create table if not exists visited (
+    steam_id integer primary key,
+    outcome text,
+    updated_at real
+);
+create table if not exists meta (
+    key text primary key,
+    value text
+);
+"""
+
+
+class CrawlState:
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute("pragma synchronous=normal")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("pragma table_info(frontier)")}
+        if "score" not in columns:
+            # State files from before frontier scores
+            self.conn.execute("alter table frontier add column score real not null default 0")
+        self.conn.commit()
+        self.last_checkpoint = time.monotonic()
+
+    def get_meta(self, key: str, default=None):
+        row = self.conn.execute("select value from meta where key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value):
+        self.conn.execute(
+            "insert into meta (key, value) values (?, ?) on conflict(key) do update set value = excluded.value",
+            (key, json.dumps(value))
+        )
+
+    def visited_ids(self) -> Iterator[int]:
+        return (row[0] for row in self.conn.execute("select steam_id from visited"))
+
+    def mark_visited(self, steam_ids: List[int]):
+        """Record IDs as seen (outcome stays NULL until they are processed)"""
+        self.conn.executemany(
+            "insert or ignore into visited (steam_id, updated_at) values (?, ?)",
+            [(steam_id, time.time()) for steam_id in steam_ids]
+        )
+
+    def push(self, steam_id: int, profile: Optional[dict] = None, score: float = 0.0):
+        self.conn.execute(
+            "insert or ignore into frontier (steam_id, profile, score) values (?, ?, ?)",
+            (steam_id, json.dumps(profile) if profile is not None else None, score)
+        )
+
+    def set_score(self, steam_id: int, score: float):
+        self.conn.execute("update frontier set score = ? where steam_id = ?", (score, steam_id))
+
+    def frontier(self) -> List[Tuple[int, Optional[dict], str, float]]:
+        """Saved frontier, best score first: (steam_id, profile, stage, score)"""
+        rows = self.conn.execute(
+            "select steam_id, profile, stage, score from frontier order by score desc, seq"
+        ).fetchall()
+        return [
+            (steam_id, json.loads(profile) if profile else None, stage, score)
+            for steam_id, profile, stage, score in rows
+        ]
+
+    def frontier_size(self) -> int:
+        return self.conn.execute("select count(*) from frontier").fetchone()[0]
+
+    def stage(self, steam_id: int) -> Optional[str]:
+        row = self.conn.execute("select stage from frontier where steam_id = ?", (steam_id,)).fetchone()
+        return row[0] if row else None
+
+    def mark_stored(self, steam_id: int):
+        """The user is in the database; only its friend list is left to do"""
+        self.conn.execute(
+            "update frontier set stage = ?, profile = null where steam_id = ?", (EXPAND, steam_id)
+        )
+
+    def record_outcome(self, steam_id: int, outcome: str):
+        """Take an ID off the frontier and store how processing it ended"""
+        self.conn.execute("delete from frontier where steam_id = ?", (steam_id,))
+        self.conn.execute(
+            "insert into visited (steam_id, outcome, updated_at) values (?, ?, ?) "
+            "on conflict(steam_id) do update set outcome = excluded.outcome, updated_at = excluded.updated_at",
+            (steam_id, outcome, time.time())
+        )
+
+    def outcomes(self) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "select outcome, count(*) from visited where outcome is not null group by outcome"
+        ).fetchall()
+        return dict(rows)
+
+    def checkpoint(self):
+        self.conn.commit()
+        self.last_checkpoint = time.monotonic()
+
+    def close(self):
+        """Close the file; anything written since the last checkpoint() is discarded"""
+        self.conn.close()
@@ -0,0 +1,226 @@
+"""
+Columnar export of the users table for offline analysis and model training.
+
+Writes two Parquet datasets (zstd-compressed, hive-partitioned by export date):
+    {out}/users/export_date=YYYY-MM-DD/part-{run}.parquet
+        one row per user: steam_id, persona_name, country, time_created,
+        login_count, game_count, total_playtime, data_refreshed_at,
+        games_refreshed_at, profile (the raw `data` JSON), exported_at
+    {out}/libraries/export_date=YYYY-MM-DD/part-{run}.parquet
+        one row per owned game: steam_id, appid, playtime, last_played, exported_at
+
+Exports are incremental. Before scanning, a run takes a snapshot time,
+EXPORT_SETTLE_SECONDS before its start. It exports the users whose
+data_refreshed_at / games_refreshed_at falls after the previous run's snapshot
+(kept in {out}/_export_state.json) and at or before its own, then saves its
+snapshot. A user written during the scan gets a later timestamp, so the next
+run exports it, even if this scan had already passed it. The timestamps come
+from several clocks (utc_now() on the API servers and collectors, now() in the
+database functions), so the settle time is how far those clocks may run behind
+the exporting machine's without a write being missed. A user exported again
+appears in several parts; readers keep the rows with the latest exported_at per
+steam_id. Pass full=True (or delete the state file) to export everything again.
+
+Requires pyarrow (`pip install pyarrow`).
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from src.db.library_codec import decode_library, NO_DATE
+from src.db.table_scan import scan_pages
+
+if TYPE_CHECKING:
+    import pyarrow
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "export")
+EXPORT_ROW_GROUP_USERS = 10000  # Users buffered per Parquet row group
+EXPORT_ROW_GROUP_GAMES = 500000  # Library rows buffered per Parquet row group
+STATE_FILE = "_export_state.json"
+EXPORT_SETTLE_SECONDS = float(os.getenv("EXPORT_SETTLE_SECONDS", 60))  # Clock skew tolerated between writers
+TIMESTAMP_COLUMNS = ("data_refreshed_at", "games_refreshed_at")
+
+COLUMNS = "steam_id, data, games, login_count, data_refreshed_at, games_refreshed_at"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("pyarrow is required to export the dataset (pip install pyarrow)")
+    return pyarrow
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _schemas(pa):
+    timestamp = pa.timestamp("us", tz="UTC")
+    users = pa.schema([
+        ("steam_id", pa.int64()),
+        ("persona_name", pa.string()),
+        ("country", pa.string()),
+        ("time_created", timestamp),
+        ("login_count", pa.int32()),
+        ("game_count", pa.int32()),
+        ("total_playtime", pa.int64()),
+        ("data_refreshed_at", timestamp),
+        ("games_refreshed_at", timestamp),
+        ("profile", pa.string()),
+        ("exported_at", timestamp),
+    ])
+    libraries = pa.schema([
+        ("steam_id", pa.int64()),
+        ("appid", pa.int32()),
+        ("playtime", pa.int32()),
+        ("last_played", pa.date32()),
+        ("exported_at", timestamp),
+    ])
+    return users, libraries
+
+
+class _PartWriter:
+    """Streams row groups into one Parquet part, renamed into place when closed"""
+
+    def __init__(self, pa, schema, path: Path):
+        self.pa = pa
+        self.schema = schema
+        self.path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+        self.columns = {name: [] for name in schema.names}
+        self.rows = 0
+        self._writer = None
+
+    def __len__(self) -> int:
+        return len(self.columns["steam_id"])
+
+    def flush(self):
+        if not len(self):
+            return
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = self.pa.parquet.ParquetWriter(str(self.tmp_path), self.schema, compression="zstd")
+        self._writer.write_table(self.pa.table(self.columns, schema=self.schema))
+        self.rows += len(self)
+        self.columns = {name: [] for name in self.schema.names}
+
+    def close(self) -> int:
+        """Finish the file; returns the rows written (no file is created for 0 rows)"""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self.tmp_path, self.path)
+        return self.rows
+
+
+def load_marker(out_dir: str) -> Optional[str]:
+    path = Path(out_dir) / STATE_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f).get("marker")
+
+
+def save_marker(out_dir: str, marker: Optional[str], stats: dict):
+    path = Path(out_dir) / STATE_FILE
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"marker": marker, "last_export": stats}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def export_dataset(out_dir: str = EXPORT_DIR, full: bool = False, page_size: Optional[int] = None) -> dict:
+    """
+    Export users changed since the last export (all users with full=True).
+    Returns {"users": n, "library_rows": n, "marker": ..., "files": [...]}.
+    """
+    pa = _pyarrow()
+    users_schema, libraries_schema = _schemas(pa)
+    marker = None if full else load_marker(out_dir)
+
+    exported_at = datetime.now(timezone.utc)
+    run = exported_at.strftime("%Y%m%dT%H%M%S%fZ")
+    partition = f"export_date={exported_at.date().isoformat()}"
+    users_part = _PartWriter(pa, users_schema, Path(out_dir) / "users" / partition / f"part-{run}.parquet")
+    libraries_part = _PartWriter(pa, libraries_schema, Path(out_dir) / "libraries" / partition / f"part-{run}.parquet")
+
+    snapshot = (exported_at - timedelta(seconds=EXPORT_SETTLE_SECONDS)).isoformat()
+    where = None
+    if marker:
+        # Rows changed after the last snapshot and up to this one; later changes go to the next run
+        where = lambda query: query.or_(','.join(
+            f'and({column}.gt."{marker}",{column}.lte."{snapshot}")' for column in TIMESTAMP_COLUMNS
+        ))
+    scan_kwargs = {"page_size": page_size} if page_size else {}
+
+    print(f"→ Exporting {'all users' if not marker else f'users changed after {marker}'} to {out_dir}")
+    async for page in scan_pages('users', COLUMNS, where=where, **scan_kwargs):
+        for row in page:
+            steam_id = row['steam_id']
+            data = row.get('data') or {}
+            library = decode_library(row.get('games'))
+
+            for appid, playtime, day in library.items():
+                libraries_part.columns["steam_id"].append(steam_id)
+                libraries_part.columns["appid"].append(appid)
+                libraries_part.columns["playtime"].append(playtime)
+                libraries_part.columns["last_played"].append(None if day == NO_DATE else day)
+                libraries_part.columns["exported_at"].append(exported_at)
+
+            time_created = data.get('timecreated')
+            values = {
+                "steam_id": steam_id,
+                "persona_name": data.get('personaname'),
+                "country": data.get('loccountrycode'),
+                "time_created": datetime.fromtimestamp(time_created, timezone.utc) if time_created else None,
+                "login_count": row.get('login_count') or 0,
+                "game_count": len(library),
+                "total_playtime": sum(library.playtimes),
+                "data_refreshed_at": _parse_timestamp(row.get('data_refreshed_at')),
+                "games_refreshed_at": _parse_timestamp(row.get('games_refreshed_at')),
+                "profile": json.dumps(data) if data else None,
+                "exported_at": exported_at,
+            }
+            for name, value in values.items():
+                users_part.columns[name].append(value)
+
+        if len(users_part) >= EXPORT_ROW_GROUP_USERS:
+            users_part.flush()
+        if len(libraries_part) >= EXPORT_ROW_GROUP_GAMES:
+            libraries_part.flush()
+
+    stats = {
+        "users": users_part.close(),
+        "library_rows": libraries_part.close(),
+        "exported_at": exported_at.isoformat(),
+    }
+    stats["files"] = [str(part.path) for part in (users_part, libraries_part) if part.rows]
+    # Only move the marker once both files are in place; a failed run is simply repeated
+    save_marker(out_dir, snapshot, stats)
+    stats["marker"] = snapshot
+    print(f"✓ Exported {stats['users']} users and {stats['library_rows']} library rows")
+    return stats
+
+
+def read_latest(out_dir: str = EXPORT_DIR, dataset: str = "users") -> "pyarrow.Table":
+    """
+    Read a dataset with only the latest export of every user
+    (handy for analysis; training jobs can read the files directly).
+    """
+    _pyarrow()
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    table = ds.dataset(str(Path(out_dir) / dataset), format="parquet", partitioning="hive").to_table()
+    if table.num_rows == 0:
+        return table
+    latest = table.group_by("steam_id").aggregate([("exported_at", "max")])
+    joined = table.join(latest, keys="steam_id")
+    return joined.filter(pc.equal(joined["exported_at"], joined["exported_at_max"])).drop_columns(["exported_at_max"])
@@ -0,0 +1,96 @@
+"""
+Priority frontier for the Steam data collector.
+
+Candidates are scored by the users that list them as a friend: every stored user
+that references a candidate adds its referrer_weight() to the candidate's score.
+The weight grows with the number of the referrer's games the crawl had not
+covered yet, which rewards both a large library and little overlap with the
+users stored so far: friends of active players tend to be active too, and
+friends of players with unusual libraries bring new appids. A candidate listed
+by several crawled users therefore comes before one seen once, and the
+highest-scoring candidate is always crawled next.
+
+The collector uses FIFO order unless FRONTIER_PRIORITY is set; the pop order
+is the only difference between the two.
+
+Scores can grow while a candidate is queued. The heap keeps one entry per
+score update and skips entries whose score is out of date when popping, so
+push and pop are both O(log n).
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BASE_WEIGHT = 0.25  # Weight of a referrer with nothing known about its library
+NOVELTY_WEIGHT = 3.0  # Extra weight for a referrer bringing NEW_APPS_CAP or more new appids
+NEW_APPS_CAP = 20
+
+
+def referrer_weight(appids: Optional[Iterable[int]] = None, covered_appids: Optional[Set[int]] = None) -> float:
+    """
+    How much a stored user adds to the score of each friend it lists.
+    appids: the user's library (None when unknown, e.g. seed users)
+    covered_appids: appids of the users stored so far, before adding this one's
+    """
+    if appids is None:
+        return BASE_WEIGHT
+    new_appids = set(appids) - (covered_appids or set())
+    return BASE_WEIGHT + NOVELTY_WEIGHT * min(len(new_appids), NEW_APPS_CAP) / NEW_APPS_CAP
+
+
+class Frontier:
+    def __init__(self, prioritize: bool = True):
+        """
+        Args:
+            prioritize: Pop the highest score first; False keeps plain FIFO order
+                        (scores are still tracked, e.g. to persist them)
+        """
+        self.prioritize = prioritize
+        self._heap: List[Tuple[float, int, int]] = []  # (-score, insertion order, steam_id)
+        self._scores: Dict[int, float] = {}
+        self._order = itertools.count()
+        self._added = asyncio.Event()
+
+    def push(self, steam_id: int, weight: float = BASE_WEIGHT) -> float:
+        """Add a candidate, or raise its score if it's already queued. Returns the new score."""
+        is_new = steam_id not in self._scores
+        score = self._scores.get(steam_id, 0.0) + weight
+        self._scores[steam_id] = score
+        if is_new or self.prioritize:
+            heapq.heappush(self._heap, (-score if self.prioritize else 0.0, next(self._order), steam_id))
+        self._added.set()
+        return score
+
+    def pop_nowait(self) -> Optional[int]:
+        """Remove and return the best candidate (None if the frontier is empty)"""
+        while self._heap:
+            negative_score, _, steam_id = heapq.heappop(self._heap)
+            score = self._scores.get(steam_id)
+            if score is None or (self.prioritize and score != -negative_score):
+                continue  # Already popped, or superseded by a later score update
+            del self._scores[steam_id]
+            return steam_id
+        return None
+
+    async def pop(self, timeout: Optional[float] = None) -> int:
+        """Wait for a candidate; raises asyncio.TimeoutError if none arrives within timeout"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            steam_id = self.pop_nowait()
+            if steam_id is not None:
+                return steam_id
+            self._added.clear()
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            await asyncio.wait_for(self._added.wait(), remaining)
+
+    def score(self, steam_id: int) -> Optional[float]:
+        return self._scores.get(steam_id)
+
+    def __contains__(self, steam_id: int) -> bool:
+        return steam_id in self._scores
+
+    def __len__(self) -> int:
+        return len(self._scores)
@@ -0,0 +1,206 @@
+"""
+Compact columnar encoding for the `games` column of the users table.
+
+Legacy rows store a library as JSON:
+    {"730": {"playtime_forever": 1234, "rtime_last_played": "2024-05-01"}, ...}
+
+Compact rows store three little-endian arrays sorted by appid (int32 appid,
+int32 playtime in minutes, uint32 days since 1970-01-01, NO_DATE when unknown),
+packed back to back, optionally zstd-compressed and base64-encoded into a
+small JSON envelope:
+    {"codec": "lib1", "n": 147, "z": "zstd", "data": "..."}
+
+Library refreshes that change only a few games don't repack the arrays: the
+changes go into a "patch" object in the envelope ({appid: [playtime, day]} for
+added or changed games, {appid: null} for removed ones), which decode_library()
+applies on top of the arrays. The next full rewrite folds the patch back in.
+
+decode_library() accepts either form, so readers never need to care which one a
+row uses. Writes use the compact form unless COMPACT_LIBRARIES=0.
+"""
+
+import base64
+import datetime
+import os
+import sys
+from array import array
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_NAME = "lib1"
+NO_DATE = 0xFFFFFFFF  # uint32 sentinel for "never played / unknown"
+ZSTD_LEVEL = 3
+COMPACT_LIBRARIES = os.getenv("COMPACT_LIBRARIES", "1") != "0"
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_BIG_ENDIAN = sys.byteorder == "big"
+# The on-disk format is 4-byte ints; array's 'i'/'I' are 4 bytes on all supported platforms
+assert array("i").itemsize == 4 and array("I").itemsize == 4
+
+
+def date_to_day(value: Optional[str]) -> int:
+    """
+    'YYYY-MM-DD' -> days since epoch (NO_DATE for None/empty).
+    Dates before 1970 are NO_DATE too: Steam's rtime_last_played=0 ("never")
+    formatted in a timezone west of UTC comes out as 1969-12-31.
+    """
+    if not value:
+        return NO_DATE
+    day = datetime.date.fromisoformat(value).toordinal() - _EPOCH_ORDINAL
+    return day if day >= 0 else NO_DATE
+
+
+def day_to_date(day: int) -> Optional[str]:
+    if day == NO_DATE:
+        return None
+    return datetime.date.fromordinal(day + _EPOCH_ORDINAL).isoformat()
+
+
+class CompactLibrary:
+    """A decoded game library: parallel arrays sorted by appid"""
+
+    __slots__ = ("appids", "playtimes", "last_played_days")
+
+    def __init__(self, appids: array, playtimes: array, last_played_days: array):
+        self.appids = appids
+        self.playtimes = playtimes
+        self.last_played_days = last_played_days
+
+    @classmethod
+    def from_dict(cls, games: dict) -> "CompactLibrary":
+        """Build from the legacy {appid: {playtime_forever, rtime_last_played}} dict"""
+        rows = sorted(
+            (int(appid), int(game.get("playtime_forever", 0) or 0), date_to_day(game.get("rtime_last_played")))
+            for appid, game in (games or {}).items()
+        )
+        return cls(
+            array("i", (row[0] for row in rows)),
+            array("i", (row[1] for row in rows)),
+            array("I", (row[2] for row in rows)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.appids)
+
+    def appid_set(self) -> set:
+        return set(self.appids)
+
+    def items(self):
+        """Yield (appid, playtime_forever, last_played_day) tuples"""
+        return zip(self.appids, self.playtimes, self.last_played_days)
+
+    def patched(self, patch: dict) -> "CompactLibrary":
+        """A copy with a patch ({appid: [playtime, day] or None to remove}) applied"""
+        entries = {appid: (playtime, day) for appid, playtime, day in self.items()}
+        for appid, entry in patch.items():
+            if entry is None:
+                entries.pop(int(appid), None)
+            else:
+                entries[int(appid)] = (int(entry[0]), int(entry[1]))
+        appids = sorted(entries)
+        return CompactLibrary(
+            array("i", appids),
+            array("i", (entries[appid][0] for appid in appids)),
+            array("I", (entries[appid][1] for appid in appids)),
+        )
+
+    def to_dict(self) -> dict:
+        """Legacy JSON shape (string appid keys, as they come back from the database)"""
+        return {
+            str(appid): {"playtime_forever": playtime, "rtime_last_played": day_to_date(day)}
+            for appid, playtime, day in self.items()
+        }
+
+
+def _to_le_bytes(values: array) -> bytes:
+    if _BIG_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le_bytes(typecode: str, raw: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(raw)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def encode_library(games, compress: bool = True) -> dict:
+    """Encode a legacy games dict (or a CompactLibrary) into the compact JSON envelope"""
+    library = games if isinstance(games, CompactLibrary) else CompactLibrary.from_dict(games)
+    payload = b"".join(
+        _to_le_bytes(values) for values in (library.appids, library.playtimes, library.last_played_days)
+    )
+    envelope = {"codec": CODEC_NAME, "n": len(library)}
+    if compress and zstandard is not None:
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+        envelope["z"] = "zstd"
+    envelope["data"] = base64.b64encode(payload).decode("ascii")
+    return envelope
+
+
+def is_compact(value) -> bool:
+    return isinstance(value, dict) and value.get("codec") == CODEC_NAME
+
+
+def decode_library(value) -> CompactLibrary:
+    """Decode a `games` column value, compact or legacy JSON (None/empty gives an empty library)"""
+    if not is_compact(value):
+        return CompactLibrary.from_dict(value or {})
+
+    payload = base64.b64decode(value["data"])
+    if value.get("z") == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed game libraries")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    count = value["n"]
+    width = count * 4
+    library = CompactLibrary(
+        _from_le_bytes("i", payload[:width]),
+        _from_le_bytes("i", payload[width:2 * width]),
+        _from_le_bytes("I", payload[2 * width:3 * width]),
+    )
+    if value.get("patch"):
+        library = library.patched(value["patch"])
+    return library
+
+
+def encode_patch(changed: dict, removed: list) -> dict:
+    """
+    Patch for a compact row from a library diff (legacy-shaped changed entries,
+    removed appids), in the form stored under the envelope's "patch" key
+    """
+    patch = {
+        str(appid): [int(game.get("playtime_forever", 0) or 0), date_to_day(game.get("rtime_last_played"))]
+        for appid, game in changed.items()
+    }
+    for appid in removed:
+        patch[str(appid)] = None
+    return patch
+
+
+def patch_size(value) -> int:
+    """Entries in a compact row's pending patch (0 for legacy rows)"""
+    if not is_compact(value):
+        return 0
+    return len(value.get("patch") or {})
+
+
+def library_to_dict(value) -> dict:
+    """Return a `games` column value in the legacy dict shape for API responses"""
+    if not is_compact(value):
+        return value or {}
+    return decode_library(value).to_dict()
+
+
+def encode_for_storage(games: dict):
+    """Value to write to the `games` column (compact unless COMPACT_LIBRARIES=0)"""
+    if not COMPACT_LIBRARIES:
+        return games
+    return encode_library(games)
@@ -7,20 +7,36 @@ Uses a friend-based crawling approach starting from existing users.
 import asyncio
 import random
 import os
+import socket
+import uuid
 from dotenv import load_dotenv
 from pathlib import Path
-import httpx
-from datetime import datetime
-from typing import List, Set
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
 from src.db.supabase_client import supabase
-from src.api.steam_breakdown import fetch_steam_profile, fetch_steam_player_summary
+from src.db.library_codec import encode_for_storage
+from src.cache.user_cache import invalidate_user
+from src.api.steam_breakdown import fetch_steam_profile
+from src.steam.client import get_steam_client, WEBAPI
+from src.steam.batching import fetch_player_summaries, chunked, MAX_SUMMARY_IDS
+from src.db.crawl_state import CrawlState, EXPAND, ADDED, REJECTED
+from src.db.visited_set import VisitedSet
+from src.db.frontier import Frontier, referrer_weight, BASE_WEIGHT
+from src.db.user_writer import UserWriter, ExistenceChecker
+from src.db.crawl_leases import get_lease_store, shard_of
+from src.db.table_scan import scan_pages
+from src.steam.negative_cache import get_negative_cache, PROFILE, PRIVATE, NO_GAMES
+from src.steam.ratelimit import CRAWLER
 
 # Import configuration
 try:
     from src.db.collector_config import (
         TARGET_USERS, MAX_ATTEMPTS, MIN_GAMES_REQUIRED, MIN_PLAYTIME_REQUIRED,
-        DELAY_BETWEEN_USERS, BATCH_SIZE, BATCH_DELAY, STEAM_ID_BASE, 
-        STEAM_ID_MAX_OFFSET, MAX_RETRIES, REQUEST_TIMEOUT
+        COLLECTOR_WORKERS, FRONTIER_WAIT, STEAM_ID_BASE,
+        STEAM_ID_MAX_OFFSET, MAX_RETRIES, REQUEST_TIMEOUT, NEGATIVE_CACHE_FILE,
+        CRAWL_STATE_FILE, CHECKPOINT_INTERVAL, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL,
+        FRONTIER_PRIORITY, SHARD_COUNT, SHARD_INDEX, COORDINATION, LEASE_TTL, CLAIM_BATCH,
+        COLLECTOR_QUOTA_SHARE
     )
 except ImportError:
     # Fallback to default values if config not found
@@ -28,13 +44,24 @@ except ImportError:
     MAX_ATTEMPTS = 500
     MIN_GAMES_REQUIRED = 5
     MIN_PLAYTIME_REQUIRED = 60
-    DELAY_BETWEEN_USERS = 2
-    BATCH_SIZE = 10
-    BATCH_DELAY = 30
+    COLLECTOR_WORKERS = 8
+    FRONTIER_WAIT = 5
     STEAM_ID_BASE = 76561197960265728
     STEAM_ID_MAX_OFFSET = 300000000
     MAX_RETRIES = 3
     REQUEST_TIMEOUT = 10
+    NEGATIVE_CACHE_FILE = "collector_negative_cache.json"
+    CRAWL_STATE_FILE = "collector_state.db"
+    CHECKPOINT_INTERVAL = 30
+    WRITE_BATCH_SIZE = 25
+    WRITE_FLUSH_INTERVAL = 10
+    FRONTIER_PRIORITY = False
+    SHARD_COUNT = 1
+    SHARD_INDEX = 0
+    COORDINATION = "collector_coordination.db"
+    LEASE_TTL = 120
+    CLAIM_BATCH = 50
+    COLLECTOR_QUOTA_SHARE = 0.7
 
 # Load environment variables
 current_dir = Path(__file__).resolve().parent
@@ -47,8 +74,9 @@ STEAM_API_KEY = os.getenv("STEAM_API_KEY")
 async def get_all_existing_steam_ids() -> List[int]:
     """Get all Steam IDs currently in the database"""
     try:
-        response = supabase.table('users').select('steam_id').execute()
-        steam_ids = [user['steam_id'] for user in response.data]
+        steam_ids = []
+        async for page in scan_pages('users', 'steam_id'):
+            steam_ids.extend(user['steam_id'] for user in page)
         print(f"Found {len(steam_ids)} existing users in database")
         return steam_ids
     except Exception as e:
@@ -62,44 +90,38 @@ async def get_friend_list(steam_id: int) -> List[int]:
     Returns a list of Steam IDs of the user's friends.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            url = f"https://api.steampowered.com/ISteamUser/GetFriendList/v1/"
-            params = {
-                'key': STEAM_API_KEY,
-                'steamid': str(steam_id),
-                'relationship': 'friend'
-            }
-            
-            response = await client.get(url, params=params, timeout=REQUEST_TIMEOUT)
-            
-            if response.status_code == 401:
-                print(f"Friend list for {steam_id} is private")
-                return []
-            
-            if response.status_code != 200:
-                print(f"Failed to fetch friend list for {steam_id}: {response.status_code}")
-                return []
-            
-            data = response.json()
-            friends = data.get('friendslist', {}).get('friends', [])
-            
-            friend_ids = [int(friend['steamid']) for friend in friends]
-            print(f"Found {len(friend_ids)} friends for Steam ID {steam_id}")
-            
-            return friend_ids
-            
+        response = await get_steam_client().get_friend_list(steam_id, priority=CRAWLER)
+        
+        if response.status_code == 401:
+            print(f"Friend list for {steam_id} is private")
+            return []
+        
+        if response.status_code != 200:
+            print(f"Failed to fetch friend list for {steam_id}: {response.status_code}")
+            return []
+        
+        data = response.json()
+        friends = data.get('friendslist', {}).get('friends', [])
+        
+        friend_ids = [int(friend['steamid']) for friend in friends]
+        print(f"Found {len(friend_ids)} friends for Steam ID {steam_id}")
+        
+        return friend_ids
+        
     except Exception as e:
         print(f"Error fetching friend list for {steam_id}: {e}")
         return []
 
 
-def generate_random_steam_id() -> int:
+def generate_random_steam_id(shard_index: int = 0, shard_count: int = 1) -> int:
     """
-    Generate a random Steam ID within the valid range.
+    Generate a random Steam ID within the valid range (and within the given shard).
     Used as fallback if no seed users exist.
     """
-    random_id = STEAM_ID_BASE + random.randint(0, STEAM_ID_MAX_OFFSET)
-    return random_id
+    while True:
+        random_id = STEAM_ID_BASE + random.randint(0, STEAM_ID_MAX_OFFSET)
+        if shard_count <= 1 or shard_of(random_id, shard_count) == shard_index:
+            return random_id
 
 
 async def check_if_user_exists(steam_id: int) -> bool:
@@ -112,49 +134,56 @@ async def check_if_user_exists(steam_id: int) -> bool:
         return False
 
 
+async def validate_steam_profiles(steam_ids: List[int]) -> Dict[int, dict]:
+    """
+    Validate many Steam profiles at once (GetPlayerSummaries takes 100 ids per call).
+    Returns {steam_id: player_summary} for the profiles that exist and are public.
+    Profiles recently found private or empty (negative cache) are not requested again.
+    """
+    negative_cache = get_negative_cache()
+    to_check = [steam_id for steam_id in steam_ids if not negative_cache.get(PROFILE, steam_id)]
+    
+    public_profiles = {}
+    for chunk in chunked(to_check, MAX_SUMMARY_IDS):
+        try:
+            players = await fetch_player_summaries(chunk, priority=CRAWLER)
+        except Exception as e:
+            print(f"Error validating Steam profiles {chunk[0]}..{chunk[-1]}: {e}")
+            continue
+        
+        for steam_id in chunk:
+            player = players.get(steam_id)
+            # Check if profile is public (communityvisibilitystate == 3)
+            if player and player.get('communityvisibilitystate', 0) == 3:
+                public_profiles[steam_id] = player
+            else:
+                negative_cache.mark(PROFILE, steam_id, PRIVATE)
+    
+    print(f"{len(public_profiles)} of {len(steam_ids)} profiles are public")
+    return public_profiles
+
+
 async def validate_steam_profile(steam_id: int) -> bool:
     """
     Validate that a Steam profile exists and is public.
     Returns True if profile is valid and accessible.
     """
-    try:
-        async with httpx.AsyncClient() as client:
-            url = f"http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/"
-            params = {
-                'key': STEAM_API_KEY,
-                'steamids': str(steam_id)
-            }
-            
-            response = await client.get(url, params=params, timeout=REQUEST_TIMEOUT)
-            
-            if response.status_code != 200:
-                return False
-            
-            data = response.json()
-            players = data.get('response', {}).get('players', [])
-            
-            if not players:
-                return False
-            
-            player = players[0]
-            
-            # Check if profile is public (communityvisibilitystate == 3)
-            visibility = player.get('communityvisibilitystate', 0)
-            if visibility != 3:
-                print(f"Profile {steam_id} is private or not fully public")
-                return False
-            
-            return True
-            
-    except Exception as e:
-        print(f"Error validating Steam profile {steam_id}: {e}")
-        return False
+    return steam_id in await validate_steam_profiles([steam_id])
 
 
-async def fetch_and_store_steam_user(steam_id: int) -> bool:
+async def fetch_and_store_steam_user(
+    steam_id: int,
+    player_profile: dict = None,
+    writer: UserWriter = None,
+    check_exists: bool = True
+) -> Optional[dict]:
     """
     Fetch Steam user data and store in database.
-    Returns True if successful, False otherwise.
+    If the player summary was already fetched by validate_steam_profiles, pass it as
+    player_profile and no further summary calls are made.
+    With a writer the row is buffered and written in a batch with other users; pass
+    check_exists=False for ids already checked against the database in bulk.
+    Returns the stored games dict if successful, None otherwise.
     """
     try:
         print(f"\n{'='*60}")
@@ -162,36 +191,31 @@ async def fetch_and_store_steam_user(steam_id: int) -> bool:
         print(f"{'='*60}")
         
         # Check if user already exists
-        if await check_if_user_exists(steam_id):
+        if check_exists and await check_if_user_exists(steam_id):
             print(f"✓ User {steam_id} already exists in database, skipping...")
-            return False
+            return None
         
-        # Validate profile exists and is public
-        print(f"→ Validating profile...")
-        if not await validate_steam_profile(steam_id):
-            print(f"✗ Profile {steam_id} is invalid or private, skipping...")
-            return False
+        # Validate profile exists and is public (one summary call also gives us the profile)
+        if player_profile is None:
+            print(f"→ Validating profile...")
+            player_profile = (await validate_steam_profiles([steam_id])).get(steam_id)
+            if not player_profile:
+                print(f"✗ Profile {steam_id} is invalid or private, skipping...")
+                return None
         
         print(f"✓ Profile is valid and public")
         
-        # Fetch player summary
-        print(f"→ Fetching player summary...")
-        player_profile = await fetch_steam_player_summary(steam_id)
-        
-        if not player_profile:
-            print(f"✗ Could not fetch player profile for {steam_id}")
-            return False
-        
         persona_name = player_profile.get('personaname', 'Unknown')
         print(f"✓ Found user: {persona_name}")
         
         # Fetch games data
         print(f"→ Fetching games library...")
-        games_data, games_dict = await fetch_steam_profile(steam_id)
+        games_data, games_dict = await fetch_steam_profile(steam_id, priority=CRAWLER)
         
         if not games_dict or len(games_dict) < MIN_GAMES_REQUIRED:
             print(f"✗ User {steam_id} has insufficient games ({len(games_dict) if games_dict else 0} games)")
-            return False
+            get_negative_cache().mark(PROFILE, steam_id, NO_GAMES)
+            return None
         
         print(f"✓ Found {len(games_dict)} games")
         
@@ -203,132 +227,399 @@ async def fetch_and_store_steam_user(steam_id: int) -> bool:
         
         if total_playtime < MIN_PLAYTIME_REQUIRED:
             print(f"✗ User {steam_id} has insufficient playtime ({total_playtime} minutes)")
-            return False
+            get_negative_cache().mark(PROFILE, steam_id, NO_GAMES)
+            return None
         
         print(f"✓ Total playtime: {total_playtime} minutes ({total_playtime/60:.1f} hours)")
         
         # Store in database
-        print(f"→ Storing user in database...")
-        response = supabase.table("users").insert({
+        refreshed_at = datetime.now(timezone.utc).isoformat()
+        row = {
             "steam_id": steam_id,
             "data": player_profile,
-            "games": games_dict,
-            "login_count": 0  # Set to 0 for auto-collected users
-        }).execute()
-        
-        if not response.data:
-            print(f"✗ Failed to store user {steam_id} in database")
-            return False
+            "games": encode_for_storage(games_dict),
+            "login_count": 0,  # Set to 0 for auto-collected users
+            "data_refreshed_at": refreshed_at,
+            "games_refreshed_at": refreshed_at
+        }
+        if writer is not None:
+            print(f"→ Queued user for the next database write ({len(writer) + 1} waiting)")
+            writer.add(row)
+        else:
+            print(f"→ Storing user in database...")
+            response = supabase.table("users").insert(row).execute()
+            invalidate_user(steam_id)
+            
+            if not response.data:
+                print(f"✗ Failed to store user {steam_id} in database")
+                return None
         
         print(f"✓ Successfully added {persona_name} (Steam ID: {steam_id}) to database!")
         print(f"  - Games: {len(games_dict)}")
         print(f"  - Total playtime: {total_playtime/60:.1f} hours")
         
-        return True
+        return games_dict
         
     except Exception as e:
         print(f"✗ Error processing Steam ID {steam_id}: {str(e)}")
         import traceback
         traceback.print_exc()
-        return False
+        return None
 
 
 async def run_continuous_collector(
     target_users: int = 100,
-    max_attempts: int = 1000
+    max_attempts: int = 1000,
+    workers: int = COLLECTOR_WORKERS,
+    state_file: str = CRAWL_STATE_FILE,
+    shard_index: int = SHARD_INDEX,
+    shard_count: int = SHARD_COUNT,
+    coordination: str = COORDINATION
 ):
     """
     Continuously collect Steam user data using friend-based crawling.
     Starts from existing users in the database and crawls their friends.
     
+    Candidates are processed by `workers` concurrent tasks sharing one frontier (see
+    frontier.py), first in, first out unless FRONTIER_PRIORITY is set. There are no fixed sleeps: every Steam call waits on the shared client's token
+    bucket (at crawler priority), so throughput follows the API quota instead of latency.
+    
+    The frontier, visited set and counters are checkpointed to `state_file` (see
+    crawl_state.py), so an interrupted run resumes where it stopped. Pass ":memory:"
+    for a throwaway run.
+    
+    With shard_count > 1 several collectors crawl together (see crawl_leases.py). Friends
+    are offered to the shared frontier in `coordination` (a SQLite file, or "supabase" for
+    the crawl_frontier table), and this collector only crawls the IDs of shard `shard_index`,
+    which it claims through leases. The shared frontier replaces `state_file`.
+    
     Args:
         target_users: Number of users to collect
         max_attempts: Maximum attempts before stopping
+        workers: Number of candidates processed concurrently
+        state_file: SQLite file holding the crawl state
+        shard_index: Shard crawled by this collector (0 <= shard_index < shard_count)
+        shard_count: Number of shards; 1 crawls alone
+        coordination: Shared frontier used when shard_count > 1
     """
     print("\n" + "="*70)
     print("STEAM DATA COLLECTOR - FRIEND-BASED CRAWLING")
     print("="*70)
     print(f"Target users: {target_users}")
     print(f"Max attempts: {max_attempts}")
+    print(f"Workers: {workers}")
+    sharded = shard_count > 1
+    if sharded:
+        print(f"Shard: {shard_index + 1}/{shard_count} (coordinated through {coordination})")
     print(f"Min games required: {MIN_GAMES_REQUIRED}")
     print(f"Min playtime required: {MIN_PLAYTIME_REQUIRED} minutes")
     print("="*70 + "\n")
     
-    users_added = 0
-    attempts = 0
-    batch_count = 0
+    if sharded:
+        # The shared frontier holds the progress; leases of a crashed collector expire and are claimed again
+        state_file = ":memory:"
+        leases = get_lease_store(coordination)
+        lease_owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # IDs leased by this collector that haven't been finished yet
+        leased: Set[int] = set()
+    state = CrawlState(state_file)
+    # Counters of an interrupted run carry over; a finished run starts from zero
+    run = state.get_meta("run") or {"users_added": 0, "attempts": 0}
+    users_added = run["users_added"]
+    attempts = run["attempts"]
+    finished = False
     
     start_time = datetime.now()
     
+    # Profiles found private/empty on earlier runs are skipped until their TTL expires
+    negative_cache = get_negative_cache()
+    cached_negatives = negative_cache.load(NEGATIVE_CACHE_FILE)
+    if cached_negatives:
+        print(f"→ Loaded {cached_negatives} cached private/empty profiles to skip")
+    
     # Get existing users from database to use as seeds
     print("→ Fetching existing users from database as seed users...")
     existing_steam_ids = await get_all_existing_steam_ids()
-    processed_ids: Set[int] = set(existing_steam_ids)  # Track all IDs we've seen
+    # Track all IDs we've seen (a bitmap, so long crawls don't run out of memory)
+    visited_file = None if state_file == ":memory:" else f"{state_file}.visited"
+    if visited_file and os.path.exists(visited_file):
+        processed_ids = VisitedSet.load(visited_file)
+    else:
+        processed_ids = VisitedSet(state.visited_ids())
+    processed_ids.update(existing_steam_ids)
     
-    # Queue of Steam IDs to process (friends to check)
-    candidate_queue: List[int] = []
+    # Frontier of Steam IDs to process (friends to check), best candidates first
+    frontier = Frontier(prioritize=FRONTIER_PRIORITY)
+    # Appids of the users stored this run, to score how novel a new user's library is
+    covered_appids: Set[int] = set()
+    # Public profiles already fetched while validating friend lists
+    candidate_profiles: Dict[int, dict] = {}
+    # Accepted users are written in batches
+    writer = UserWriter(WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL)
+    existence_checker = ExistenceChecker()
+    done = asyncio.Event()
     
-    # If we have existing users, get their friends as initial candidates
-    if existing_steam_ids:
-        print(f"→ Fetching friend lists from {len(existing_steam_ids)} existing users...")
-        for seed_id in existing_steam_ids[:5]:  # Start with first 5 users' friends
-            friends = await get_friend_list(seed_id)
-            for friend_id in friends:
-                if friend_id not in processed_ids:
-                    candidate_queue.append(friend_id)
-                    processed_ids.add(friend_id)
-            await asyncio.sleep(1)  # Rate limit between friend list fetches
-        
-        print(f"✓ Found {len(candidate_queue)} potential new users from friend lists\n")
-    else:
-        print("⚠️  No existing users in database. Will use random Steam IDs as fallback.\n")
+    saved_frontier = state.frontier()
+    for steam_id, profile, stage, score in saved_frontier:
+        if profile is not None:
+            candidate_profiles[steam_id] = profile
+        # Users stored before the stop only need their friends queued; do that first
+        frontier.push(steam_id, float("inf") if stage == EXPAND else score)
+    if saved_frontier or users_added or attempts:
+        print(f"→ Resuming from {state_file}: {len(saved_frontier)} queued candidates, "
+              f"{users_added} users added in {attempts} attempts so far")
     
-    try:
-        while users_added < target_users and attempts < max_attempts:
-            attempts += 1
+    # IDs some worker is checking right now; they only become visited once they're queued,
+    # so a checkpoint taken meanwhile can't contain IDs that are neither visited nor queued
+    checking: Set[int] = set()
+    
+    async def enqueue_friends(friends: List[int], weight: float = BASE_WEIGHT) -> int:
+        """
+        Drop friends already in the database, validate the rest in chunks of 100 and queue the
+        public ones with `weight` as their score. Friends already queued get `weight` added.
+        """
+        friends = list(dict.fromkeys(friends))
+        if sharded:
+            # Validated by whichever collector claims them; the shared frontier adds up the scores
+            offered = {friend_id: weight for friend_id in friends if friend_id not in processed_ids}
+            if offered:
+                try:
+                    await asyncio.to_thread(leases.offer, offered, shard_count)
+                except Exception as e:
+                    print(f"Error offering {len(offered)} friends to the shared frontier: {e}")
+            return len(offered)
+        for friend_id in friends:
+            if friend_id in frontier:
+                state.set_score(friend_id, frontier.push(friend_id, weight))
+        new_ids = [
+            friend_id for friend_id in friends
+            if friend_id not in processed_ids and friend_id not in checking
+        ]
+        checking.update(new_ids)
+        try:
+            try:
+                existing = await existence_checker.existing(new_ids)
+            except Exception as e:
+                print(f"Error checking {len(new_ids)} friends against the database: {e}")
+                existing = set()
+            profiles = await validate_steam_profiles([friend_id for friend_id in new_ids if friend_id not in existing])
             
-            # Get next Steam ID to process
-            if candidate_queue:
-                steam_id = candidate_queue.pop(0)
-            else:
-                # Fallback: use random Steam ID if queue is empty
-                print("⚠️  Candidate queue empty, generating random Steam ID...")
-                steam_id = generate_random_steam_id()
-                processed_ids.add(steam_id)
+            processed_ids.update(new_ids)
+            state.mark_visited(new_ids)
+            for friend_id, profile in profiles.items():
+                candidate_profiles[friend_id] = profile
+                state.push(friend_id, profile, frontier.push(friend_id, weight))
+            return len(profiles)
+        finally:
+            checking.difference_update(new_ids)
+    
+    async def next_candidate() -> Tuple[int, bool]:
+        """
+        Next Steam ID from the frontier, or a random one if it stays empty for FRONTIER_WAIT seconds.
+        Returns (steam_id, whether it came from the frontier and so was already checked against the database).
+        When sharded, the random ID is offered to the shared frontier instead and comes back
+        through a lease like any other, so no two collectors crawl it.
+        """
+        while True:
+            try:
+                return await frontier.pop(FRONTIER_WAIT), True
+            except asyncio.TimeoutError:
+                steam_id = generate_random_steam_id(shard_index, shard_count)
+                if not sharded:
+                    print("⚠️  Candidate queue empty, generating random Steam ID...")
+                    processed_ids.add(steam_id)
+                    return steam_id, False
+                print("⚠️  Candidate queue empty, offering a random Steam ID to the shared frontier...")
+                try:
+                    await asyncio.to_thread(leases.offer, {steam_id: BASE_WEIGHT}, shard_count)
+                except Exception as e:
+                    print(f"Error offering {steam_id} to the shared frontier: {e}")
+    
+    async def expand(steam_id: int, weight: float = BASE_WEIGHT):
+        """Queue the friends of a stored user and close its frontier entry"""
+        print(f"→ Fetching friends of newly added user...")
+        friends = await get_friend_list(steam_id)
+        new_friends = await enqueue_friends(friends, weight)
+        await record_outcome(steam_id, ADDED)
+        print(f"✓ Added {new_friends} new public friends to candidate queue (total: {len(frontier)})")
+    
+    async def record_outcome(steam_id: int, outcome: str):
+        state.record_outcome(steam_id, outcome)
+        if sharded and steam_id in leased:
+            leased.discard(steam_id)
+            try:
+                await asyncio.to_thread(leases.complete, lease_owner, steam_id, outcome)
+            except Exception as e:
+                print(f"Error completing lease of {steam_id}: {e}")
+    
+    async def claim_candidates():
+        """Keep the local frontier filled with validated IDs claimed from this shard"""
+        while True:
+            if len(frontier) >= workers * 2:
+                await asyncio.sleep(0.5)
+                continue
+            try:
+                claimed = dict(await asyncio.to_thread(leases.claim, shard_index, lease_owner, CLAIM_BATCH, LEASE_TTL))
+            except Exception as e:
+                print(f"Error claiming candidates from the shared frontier: {e}")
+                claimed = {}
+            if not claimed:
+                await asyncio.sleep(1)
+                continue
+            leased.update(claimed)
+            claimed_ids = [steam_id for steam_id in claimed if steam_id not in processed_ids]
+            for steam_id in claimed:
+                if steam_id in processed_ids:
+                    await record_outcome(steam_id, REJECTED)
+            processed_ids.update(claimed_ids)
+            try:
+                existing = await existence_checker.existing(claimed_ids)
+            except Exception as e:
+                print(f"Error checking {len(claimed_ids)} claimed candidates against the database: {e}")
+                existing = set()
+            profiles = await validate_steam_profiles([steam_id for steam_id in claimed_ids if steam_id not in existing])
+            for steam_id in claimed_ids:
+                if steam_id in profiles:
+                    candidate_profiles[steam_id] = profiles[steam_id]
+                    frontier.push(steam_id, claimed[steam_id])
+                else:
+                    await record_outcome(steam_id, REJECTED)
+            print(f"✓ Claimed {len(claimed)} candidates from shard {shard_index}, {len(profiles)} public")
+    
+    async def renew_leases():
+        while True:
+            await asyncio.sleep(LEASE_TTL / 3)
+            try:
+                await asyncio.to_thread(leases.renew, lease_owner, list(leased), LEASE_TTL)
+            except Exception as e:
+                print(f"Error renewing {len(leased)} leases: {e}")
+    
+    def save_run():
+        # A finished run's counters are cleared, so the next one starts from zero but keeps the frontier
+        state.set_meta("run", None if finished else {"users_added": users_added, "attempts": attempts})
+    
+    def checkpoint():
+        # Users counted as added must be in the database before the state says so
+        writer.flush()
+        if len(writer):
+            print("⚠️  Skipping checkpoint until the buffered users are written")
+            return
+        save_run()
+        state.checkpoint()
+        # Saved after the commit: a visited set lagging behind the state only causes re-checks
+        if visited_file:
+            processed_ids.save(visited_file)
+        negative_cache.save(NEGATIVE_CACHE_FILE)
+    
+    async def checkpoint_periodically():
+        while True:
+            await asyncio.sleep(CHECKPOINT_INTERVAL)
+            checkpoint()
+    
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(1)
+            writer.flush_if_due()
+    
+    def stop():
+        """
+        Stop all workers now. The others are cancelled at their next await, which is
+        always before they store another user, so the target can't be overshot.
+        """
+        done.set()
+        for task in tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+    
+    async def worker():
+        nonlocal users_added, attempts
+        while not done.is_set():
+            steam_id, checked = await next_candidate()
+            if state.stage(steam_id) == EXPAND:
+                # Stored before the last stop; only its friends are left to queue
+                await expand(steam_id)
+                continue
+            if attempts >= max_attempts:
+                stop()
+                break
+            attempts += 1
             
             # Try to fetch and store
-            success = await fetch_and_store_steam_user(steam_id)
+            games = await fetch_and_store_steam_user(
+                steam_id, candidate_profiles.pop(steam_id, None), writer, check_exists=not checked
+            )
+            if not games:
+                await record_outcome(steam_id, REJECTED)
+                continue
+            
+            users_added += 1
+            state.push(steam_id)
+            state.mark_stored(steam_id)
+            if users_added >= target_users:
+                # No friends are needed past the target: close the entry (and its lease) without
+                # fetching them. Stopping first keeps the other workers from storing during the await.
+                stop()
+                await record_outcome(steam_id, ADDED)
+                break
             
-            if success:
-                users_added += 1
-                batch_count += 1
-                
-                # Get this user's friends to add to candidate queue
-                print(f"→ Fetching friends of newly added user...")
-                friends = await get_friend_list(steam_id)
-                new_friends = 0
-                for friend_id in friends:
-                    if friend_id not in processed_ids:
-                        candidate_queue.append(friend_id)
-                        processed_ids.add(friend_id)
-                        new_friends += 1
-                
-                print(f"✓ Added {new_friends} new friends to candidate queue (total: {len(candidate_queue)})")
-                
-                print(f"\n{'*'*60}")
-                print(f"PROGRESS: {users_added}/{target_users} users added ({attempts} attempts)")
-                print(f"Success rate: {(users_added/attempts)*100:.1f}%")
-                print(f"Candidates in queue: {len(candidate_queue)}")
-                print(f"{'*'*60}\n")
+            # Get this user's friends to add to candidate queue
+            appids = [int(appid) for appid in games]
+            weight = referrer_weight(appids, covered_appids)
+            covered_appids.update(appids)
+            await expand(steam_id, weight)
             
-            # Delay between users
-            await asyncio.sleep(DELAY_BETWEEN_USERS)
+            elapsed_hours = max((datetime.now() - start_time).total_seconds(), 1) / 3600
+            print(f"\n{'*'*60}")
+            print(f"PROGRESS: {users_added}/{target_users} users added ({attempts} attempts)")
+            print(f"Success rate: {(users_added/attempts)*100:.1f}%")
+            print(f"Throughput: {users_added/elapsed_hours:.0f} users/hour")
+            print(f"Apps covered: {len(covered_appids)}")
+            print(f"Candidates in queue: {len(frontier)}")
+            print_pacing()
+            print(f"{'*'*60}\n")
+    
+    def print_pacing():
+        pacer = get_steam_client().pacers.get(WEBAPI)
+        if pacer:
+            print(f"Steam request rate: {pacer.rate:.2f}/s of {pacer.max_rate:.2f}/s max "
+                  f"({pacer.state.replace('_', ' ')}, {pacer.decreases} backoffs)")
+    
+    tasks: List[asyncio.Task] = []
+    try:
+        # On the first run, get the friends of existing users as initial candidates
+        seed = await asyncio.to_thread(leases.claim_once, "seeded") if sharded else not state.get_meta("seeded")
+        if existing_steam_ids and seed:
+            seed_ids = existing_steam_ids[:5]  # Start with first 5 users' friends
+            print(f"→ Fetching friend lists from {len(seed_ids)} of {len(existing_steam_ids)} existing users...")
+            friend_lists = await asyncio.gather(*(get_friend_list(seed_id) for seed_id in seed_ids))
+            found = await asyncio.gather(*(enqueue_friends(friends) for friends in friend_lists))
+            state.set_meta("seeded", True)
+            checkpoint()
             
-            # Longer delay after batch
-            if batch_count >= BATCH_SIZE:
-                print(f"\n--- Batch complete ({BATCH_SIZE} users), pausing for {BATCH_DELAY} seconds ---\n")
-                await asyncio.sleep(BATCH_DELAY)
-                batch_count = 0
+            print(f"✓ Found {sum(found)} potential new users from friend lists\n")
+        elif sharded:
+            print("→ Shared frontier already seeded, claiming candidates from it\n")
+        elif not existing_steam_ids:
+            print("⚠️  No existing users in database. Will use random Steam IDs as fallback.\n")
+        
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        background = [asyncio.create_task(checkpoint_periodically()), asyncio.create_task(flush_periodically())]
+        if sharded:
+            background += [asyncio.create_task(claim_candidates()), asyncio.create_task(renew_leases())]
+        # Stop as soon as the target is reached; workers still waiting on Steam are cancelled
+        done_waiter = asyncio.create_task(done.wait())
+        await asyncio.wait(tasks + [done_waiter], return_when=asyncio.FIRST_COMPLETED)
+        done_waiter.cancel()
+        tasks.extend(background)
+        failed = [task for task in tasks if task.done() and not task.cancelled() and task.exception()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if failed:
+            raise failed[0].exception()
+        
+        finished = True
+        writer.flush()
         
         # Final summary
         end_time = datetime.now()
@@ -339,32 +630,57 @@ async def run_continuous_collector(
         print("="*70)
         print(f"Users added: {users_added}/{target_users}")
         print(f"Total attempts: {attempts}")
-        print(f"Success rate: {(users_added/attempts)*100:.1f}%")
+        print(f"Success rate: {(users_added/attempts)*100:.1f}%" if attempts > 0 else "N/A")
         print(f"Duration: {duration/60:.1f} minutes")
         print(f"Average time per user: {duration/users_added:.1f} seconds" if users_added > 0 else "N/A")
-        print(f"Remaining candidates: {len(candidate_queue)}")
+        print(f"Apps covered: {len(covered_appids)}")
+        print(f"Remaining candidates: {len(frontier)}")
+        print(f"Database writes: {writer.written} users in {writer.flushes} batches")
+        print_pacing()
+        if sharded:
+            print(f"Shared frontier (shard {shard_index}): {await asyncio.to_thread(leases.stats, shard_index)}")
         print("="*70 + "\n")
         
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n\n" + "="*70)
         print("STEAM DATA COLLECTOR - STOPPED BY USER")
         print("="*70)
         print(f"Users added: {users_added}")
         print(f"Total attempts: {attempts}")
-        print(f"Remaining candidates: {len(candidate_queue)}")
+        print(f"Remaining candidates: {len(frontier)}")
+        print(f"Progress saved to {state_file}; run again to resume")
         print("="*70 + "\n")
     
     except Exception as e:
         print(f"\n\nFATAL ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+    
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        checkpoint()
+        state.close()
+        if sharded:
+            # Unfinished IDs go back to the queue right away instead of waiting for their leases to expire.
+            # Called directly: nothing else runs any more, and an await here could be cancelled.
+            leases.release(lease_owner)
+            leases.close()
 
 
-async def main():
+async def main(shard_index: int = SHARD_INDEX, shard_count: int = SHARD_COUNT, coordination: str = COORDINATION):
     """Main entry point for the collector"""
+    # The API server uses the rest of the key's quota; sharded collectors split this share
+    share = COLLECTOR_QUOTA_SHARE / shard_count
+    get_steam_client().set_quota_share(share)
+    print(f"→ Using {share:.0%} of the Steam API quota")
     await run_continuous_collector(
         target_users=TARGET_USERS,
-        max_attempts=MAX_ATTEMPTS
+        max_attempts=MAX_ATTEMPTS,
+        shard_index=shard_index,
+        shard_count=shard_count,
+        coordination=coordination
     )
 
 
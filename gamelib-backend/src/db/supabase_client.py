@@ -1,7 +1,10 @@
-from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
 from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Get the directory where this file is located
 current_dir = Path(__file__).resolve().parent
@@ -9,14 +12,33 @@ current_dir = Path(__file__).resolve().parent
 env_path = current_dir.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-if url is None:
-    raise ValueError("SUPABASE_URL environment variable is required")
-if key is None:
-    raise ValueError("SUPABASE_KEY environment variable is required")
-#assert url is not None and key is not None, "SUPABASE_URL and SUPABASE_KEY must be set"
-supabase: Client = create_client(url, key)
+_client: Optional["Client"] = None
+
+def get_supabase() -> "Client":
+    """
+    Create the Supabase client on first use.
+    The API creates it in main.lifespan; importing this module stays cheap.
+    """
+    global _client
+    if _client is None:
+        from supabase import create_client
+
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if url is None:
+            raise ValueError("SUPABASE_URL environment variable is required")
+        if key is None:
+            raise ValueError("SUPABASE_KEY environment variable is required")
+        #assert url is not None and key is not None, "SUPABASE_URL and SUPABASE_KEY must be set"
+        _client = create_client(url, key)
+    return _client
+
+class _LazySupabase:
+    """Forwards to the real client so `from src.db.supabase_client import supabase` keeps working"""
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
+
+supabase = _LazySupabase()
 
 def get_user(user_id: str):
     response = supabase.table('users').select('*').eq('id', user_id).execute()
@@ -0,0 +1,65 @@
+"""
+Streaming full-table scans.
+
+A plain `select()` returns at most PostgREST's max-rows (1000 on Supabase by
+default) and silently drops the rest, and whatever it returns is held in memory
+at once. scan_pages() reads a table in keyset-paginated pages instead: each
+request asks for the next `page_size` rows ordered by the key column and
+starting after the last key seen, so every page costs one index range scan no
+matter how deep into the table it is (unlike offset pagination).
+"""
+
+import asyncio
+import os
+from typing import AsyncIterator, Callable, List, Optional
+
+from src.db.supabase_client import supabase
+
+SCAN_PAGE_SIZE = int(os.getenv("SCAN_PAGE_SIZE", 1000))  # Rows per request
+
+
+async def scan_pages(
+    table: str,
+    columns: str = "*",
+    key: str = "steam_id",
+    page_size: int = SCAN_PAGE_SIZE,
+    where: Optional[Callable] = None
+) -> AsyncIterator[List[dict]]:
+    """
+    Yield all rows of `table` in pages ordered by `key` (which must be unique).
+    columns: select() projection; `key` is added if it's missing
+    where: Adds filters to each page's query, e.g. `lambda query: query.gt('login_count', 0)`
+    A page shorter than page_size doesn't end the scan, because the server may cap
+    page sizes below what was asked for; the scan ends on an empty page.
+    """
+    projection = [column.strip() for column in columns.split(",")]
+    if "*" not in projection and key not in projection:
+        columns = f"{columns}, {key}"
+
+    last_key = None
+    while True:
+        query = supabase.table(table).select(columns).order(key).limit(page_size)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        if where is not None:
+            query = where(query)
+        rows = query.execute().data
+        if not rows:
+            return
+        last_key = rows[-1][key]
+        yield rows
+        # Let other requests run between pages of a long scan
+        await asyncio.sleep(0)
+
+
+async def scan_rows(
+    table: str,
+    columns: str = "*",
+    key: str = "steam_id",
+    page_size: int = SCAN_PAGE_SIZE,
+    where: Optional[Callable] = None
+) -> AsyncIterator[dict]:
+    """Yield all rows of `table` one at a time (see scan_pages)"""
+    async for page in scan_pages(table, columns, key, page_size, where):
+        for row in page:
+            yield row
@@ -0,0 +1,133 @@
+"""
+Batched database access for the Steam data collector.
+
+Existence checks take a whole friend list and use one `in_()` select per
+EXISTS_CHUNK_SIZE ids; ExistenceChecker also merges the lists of concurrent
+workers arriving within EXISTS_BATCH_WINDOW into the same select. Accepted users
+are buffered by UserWriter and written with one multi-row upsert once
+WRITE_BATCH_SIZE rows are waiting or the oldest one has waited
+WRITE_FLUSH_INTERVAL seconds. Together these bring the collector from two round
+trips per candidate down to a fraction of one per collected user.
+"""
+
+import asyncio
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from src.cache.user_cache import invalidate_user
+from src.db.supabase_client import supabase
+
+EXISTS_CHUNK_SIZE = 200  # Ids per in_() select (keeps the request URL short)
+EXISTS_BATCH_WINDOW = 0.5  # Seconds to wait for more friend lists before checking
+WRITE_BATCH_SIZE = 25  # Buffered rows that trigger a flush
+WRITE_FLUSH_INTERVAL = 10.0  # Seconds the oldest buffered row may wait
+
+
+def existing_user_ids(steam_ids: Iterable[int], chunk_size: int = EXISTS_CHUNK_SIZE) -> Set[int]:
+    """Return the subset of steam_ids that already have a users row"""
+    steam_ids = list(dict.fromkeys(steam_ids))
+    existing: Set[int] = set()
+    for start in range(0, len(steam_ids), chunk_size):
+        chunk = steam_ids[start:start + chunk_size]
+        response = supabase.table('users').select('steam_id').in_('steam_id', chunk).execute()
+        existing.update(row['steam_id'] for row in response.data)
+    return existing
+
+
+class ExistenceChecker:
+    def __init__(self, window: float = EXISTS_BATCH_WINDOW, max_ids: int = EXISTS_CHUNK_SIZE):
+        self.window = window
+        self.max_ids = max_ids
+        self._pending: List[Tuple[List[int], asyncio.Future]] = []
+        self._pending_ids = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def existing(self, steam_ids: List[int]) -> Set[int]:
+        """Return the subset of steam_ids that already have a users row, batched with other callers"""
+        if not steam_ids:
+            return set()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((steam_ids, future))
+        self._pending_ids += len(steam_ids)
+
+        if self._pending_ids >= self.max_ids:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_ids = self._pending, [], 0
+        all_ids = [steam_id for steam_ids, _ in pending for steam_id in steam_ids]
+        try:
+            existing = existing_user_ids(all_ids, self.max_ids)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for steam_ids, future in pending:
+            if not future.done():
+                future.set_result(existing.intersection(steam_ids))
+
+
+class UserWriter:
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE, flush_interval: float = WRITE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows: List[dict] = []
+        self._oldest = 0.0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def add(self, row: dict):
+        """Buffer a users row; flushes when the batch is full or has waited long enough"""
+        if not self._rows:
+            self._oldest = time.monotonic()
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if self._rows and time.monotonic() - self._oldest >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write all buffered rows in one upsert. Rows that already exist are left as
+        they are. On failure the rows stay buffered and are retried by the next flush.
+        """
+        if not self._rows:
+            return 0
+        rows = self._rows
+        try:
+            supabase.table('users').upsert(rows, on_conflict='steam_id', ignore_duplicates=True).execute()
+        except Exception as e:
+            self.failures += 1
+            print(f"Error writing {len(rows)} collected users (will retry): {e}")
+            return 0
+        self._rows = []
+        for row in rows:
+            invalidate_user(row['steam_id'])
+        self.written += len(rows)
+        self.flushes += 1
+        print(f"✓ Wrote {len(rows)} collected users to the database")
+        return len(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._rows),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
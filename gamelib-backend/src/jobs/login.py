@@ -0,0 +1,24 @@
+"""
+Queue for the user provisioning done after a Steam login.
+
+The OpenID callback redirects as soon as the assertion is verified and submits
+the login (user_login) here, keyed by steam_id. Endpoints that need the user
+row before it exists can wait on the pending job instead of logging in again.
+"""
+
+import os
+from typing import Optional
+
+from src.jobs.queue import JobQueue
+
+LOGIN_CONCURRENCY = int(os.getenv("LOGIN_CONCURRENCY", 8))
+LOGIN_MAX_RETRIES = 3
+
+_login_queue: Optional[JobQueue] = None
+
+
+def get_login_queue() -> JobQueue:
+    global _login_queue
+    if _login_queue is None:
+        _login_queue = JobQueue("login", concurrency=LOGIN_CONCURRENCY, max_retries=LOGIN_MAX_RETRIES)
+    return _login_queue
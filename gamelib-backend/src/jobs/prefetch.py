@@ -0,0 +1,110 @@
+"""
+Dashboard prefetch, queued when a user logs in through Steam.
+
+Right after login the dashboard asks for clusters, test recommendations and
+collaborative recommendations. This job makes the same lookups first so those
+requests are answered from the clusters, CF and app details caches. It fetches
+clusters and the CF result for the user, then store details for the apps the
+dashboard shows first.
+
+Jobs are deduplicated per user by the queue. Clusters and app details are
+fetched at crawler priority (app details with at most PREFETCH_APP_CONCURRENCY
+requests in flight), so prefetching never uses the rate limit reserved for
+interactive requests.
+"""
+
+import asyncio
+import os
+from typing import List, Optional
+
+from src.jobs.login import get_login_queue
+from src.jobs.queue import JobQueue
+from src.jobs.user_refresh import get_refresh_queue
+from src.recommender.recommender import get_game_clusters, get_collaborative_recommendations, cluster_score
+from src.steam.client import get_steam_client
+from src.steam.negative_cache import get_negative_cache, APP
+from src.steam.ratelimit import CRAWLER
+
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", 2))  # Users prefetched at once
+PREFETCH_APP_CONCURRENCY = int(os.getenv("PREFETCH_APP_CONCURRENCY", 4))  # App details requests per user
+PREFETCH_TOP_APPS = int(os.getenv("PREFETCH_TOP_APPS", 40))
+# Same cluster selection as /recommendations/test: top 5 clusters, first few similar apps of each
+PREFETCH_CLUSTERS = 5
+PREFETCH_APPS_PER_CLUSTER = 3
+
+
+def dashboard_app_ids(clusters_data: Optional[dict], cf_result: Optional[dict], limit: int = PREFETCH_TOP_APPS) -> List[int]:
+    """Appids the dashboard will need details for, most likely first"""
+    app_ids = []
+    clusters = (clusters_data or {}).get('response', {}).get('clusters', [])
+    for cluster in sorted(clusters, key=cluster_score, reverse=True)[:PREFETCH_CLUSTERS]:
+        played_apps = cluster.get('played_appids', [])
+        if played_apps:
+            app_ids.append(played_apps[0])
+        app_ids.extend(cluster.get('similar_items_appids', [])[:PREFETCH_APPS_PER_CLUSTER])
+    app_ids.extend(rec['appid'] for rec in (cf_result or {}).get('recommendations', []))
+    return list(dict.fromkeys(int(app_id) for app_id in app_ids))[:limit]
+
+
+async def _wait_for(future: Optional[asyncio.Future]):
+    if future is None:
+        return
+    try:
+        await future
+    except Exception:
+        pass
+
+
+async def prefetch_dashboard(steam_id: int) -> dict:
+    # The CF result needs the user's row and library, which login may still be writing
+    await _wait_for(get_login_queue().pending(steam_id))
+    await _wait_for(get_refresh_queue().pending(("games", steam_id)))
+
+    clusters_data, cf_result = await asyncio.gather(
+        get_game_clusters(steam_id, priority=CRAWLER),
+        get_collaborative_recommendations(steam_id),
+        return_exceptions=True
+    )
+    if isinstance(clusters_data, Exception):
+        print(f"Prefetch: clusters for {steam_id} failed: {clusters_data}")
+        clusters_data = None
+    if isinstance(cf_result, Exception):
+        print(f"Prefetch: CF for {steam_id} failed: {cf_result}")
+        cf_result = None
+
+    negative_cache = get_negative_cache()
+    app_ids = [app_id for app_id in dashboard_app_ids(clusters_data, cf_result) if not negative_cache.get(APP, app_id)]
+    client = get_steam_client()
+    semaphore = asyncio.Semaphore(PREFETCH_APP_CONCURRENCY)
+
+    async def warm_app(app_id: int):
+        async with semaphore:
+            try:
+                await client.get_app_details(app_id, priority=CRAWLER)
+            except Exception as e:
+                print(f"Prefetch: app details for {app_id} failed: {e}")
+
+    await asyncio.gather(*(warm_app(app_id) for app_id in app_ids))
+    summary = {
+        "steam_id": steam_id,
+        "clusters": clusters_data is not None,
+        "collaborative": bool(cf_result) and not cf_result.get("error"),
+        "apps": len(app_ids),
+    }
+    print(f"Prefetched dashboard for {steam_id}: {summary}")
+    return summary
+
+
+_prefetch_queue: Optional[JobQueue] = None
+
+
+def get_prefetch_queue() -> JobQueue:
+    global _prefetch_queue
+    if _prefetch_queue is None:
+        _prefetch_queue = JobQueue("prefetch", concurrency=PREFETCH_CONCURRENCY, max_retries=0)
+    return _prefetch_queue
+
+
+def queue_prefetch(steam_id: int) -> Optional[asyncio.Future]:
+    """Queue a dashboard prefetch for steam_id (no-op if one is already queued or running)"""
+    return get_prefetch_queue().submit(steam_id, prefetch_dashboard, steam_id)
@@ -0,0 +1,145 @@
+"""
+Small in-process background job queue.
+
+Jobs are keyed: submitting a key that is already queued or running returns the
+existing job's future instead of doing the work twice. A fixed number of worker
+tasks bounds concurrency, and failed jobs are retried with exponential backoff.
+Workers start on first submit and are stopped from main.lifespan.
+"""
+
+import asyncio
+import random
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_MAX_QUEUED = 10000
+RETRY_BASE_DELAY = 1.0  # Seconds
+RETRY_MAX_DELAY = 30.0  # Seconds
+
+
+class JobQueue:
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        retry_base_delay: float = RETRY_BASE_DELAY,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.max_queued = max_queued
+        self.retry_base_delay = retry_base_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        # key -> future of the queued or running job
+        self._jobs: Dict[Hashable, asyncio.Future] = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+        # First use, or the previous event loop is gone (e.g. a script calling asyncio.run twice)
+        self._jobs.clear()
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def submit(self, key: Hashable, func: Callable[..., Awaitable], *args) -> Optional[asyncio.Future]:
+        """
+        Queue `await func(*args)` under `key` and return a future for its result.
+        Returns the pending job's future if `key` is already queued or running,
+        or None if the queue is full.
+        """
+        self._ensure_workers()
+        existing = self._jobs.get(key)
+        if existing is not None and not existing.done():
+            self.deduplicated += 1
+            return existing
+        if len(self._jobs) >= self.max_queued:
+            self.dropped += 1
+            print(f"Job queue '{self.name}' is full, dropping job {key}")
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody has to wait on a job; don't warn about exceptions that are never retrieved
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._jobs[key] = future
+        self._queue.put_nowait((key, func, args, future))
+        self.submitted += 1
+        return future
+
+    def pending(self, key: Hashable) -> Optional[asyncio.Future]:
+        """Future of the queued or running job for `key`, if there is one"""
+        future = self._jobs.get(key)
+        return future if future is not None and not future.done() else None
+
+    async def _worker(self):
+        while True:
+            key, func, args, future = await self._queue.get()
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        result = await func(*args)
+                        self.completed += 1
+                        if not future.done():
+                            future.set_result(result)
+                        break
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        if attempt >= self.max_retries:
+                            self.failed += 1
+                            print(f"Job {key} in '{self.name}' failed after {attempt + 1} attempts: {e}")
+                            if not future.done():
+                                future.set_exception(e)
+                            break
+                        self.retried += 1
+                        delay = min(RETRY_MAX_DELAY, self.retry_base_delay * (2 ** attempt))
+                        await asyncio.sleep(random.uniform(delay / 2, delay))
+                        attempt += 1
+            finally:
+                if self._jobs.get(key) is future:
+                    del self._jobs[key]
+                self._queue.task_done()
+
+    async def join(self):
+        """Wait until every queued job has finished"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self):
+        """Cancel the workers; queued jobs that haven't started are abandoned"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for future in self._jobs.values():
+            if not future.done():
+                future.cancel()
+        self._jobs.clear()
+        self._queue = None
+        self._loop = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._jobs),
+            "workers": len(self._workers),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,185 @@
+"""
+Background refresh of a user's Steam profile (`data`) and library (`games`).
+
+Each field has a freshness window (sql/002_freshness.sql adds the timestamp
+columns). A login only queues refresh jobs for fields older than their window
+and answers from the stored row meanwhile, so login latency doesn't depend on
+Steam's.
+
+Library refreshes diff the new library against the stored one and only write
+when something changed, and then only the changed entries: legacy JSON rows
+(COMPACT_LIBRARIES=0) get them merged in (apply_library_diff), compact rows get
+them added to the envelope's patch (apply_library_patch, sql/004_library_patch.sql).
+Once a compact row's patch would exceed LIBRARY_PATCH_MAX entries the library is
+re-encoded as a whole, which folds the patch back into the arrays.
+"""
+
+import asyncio
+import datetime
+import os
+from typing import Dict, List, Optional, Tuple
+
+from src.api.steam_breakdown import fetch_steam_profile
+from src.db.library_codec import (
+    CompactLibrary, decode_library, encode_for_storage, encode_patch, is_compact, patch_size, day_to_date,
+    COMPACT_LIBRARIES
+)
+from src.cache.user_cache import invalidate_user
+from src.db.supabase_client import supabase
+from src.jobs.queue import JobQueue
+from src.steam.batching import get_summary_batcher
+
+PROFILE_MAX_AGE = float(os.getenv("PROFILE_MAX_AGE", 15 * 60))  # Seconds
+LIBRARY_MAX_AGE = float(os.getenv("LIBRARY_MAX_AGE", 6 * 3600))  # Seconds
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", 4))
+LIBRARY_PATCH_MAX = int(os.getenv("LIBRARY_PATCH_MAX", 64))  # Patch entries before a compact row is repacked
+
+# field -> (timestamp column, max age in seconds)
+FRESHNESS = {
+    "data": ("data_refreshed_at", PROFILE_MAX_AGE),
+    "games": ("games_refreshed_at", LIBRARY_MAX_AGE),
+}
+
+
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def parse_timestamp(value) -> Optional[datetime.datetime]:
+    """Parse a timestamptz as returned by PostgREST (naive values are taken as UTC)"""
+    if not value:
+        return None
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def is_fresh(row: dict, field: str, now: Optional[datetime.datetime] = None) -> bool:
+    """Whether `field` of a users row was refreshed within its freshness window"""
+    column, max_age = FRESHNESS[field]
+    refreshed_at = parse_timestamp(row.get(column))
+    if refreshed_at is None:
+        return False
+    return ((now or utc_now()) - refreshed_at).total_seconds() < max_age
+
+
+def stale_fields(row: dict, now: Optional[datetime.datetime] = None) -> List[str]:
+    now = now or utc_now()
+    return [field for field in FRESHNESS if not is_fresh(row, field, now)]
+
+
+def diff_libraries(old: CompactLibrary, new: CompactLibrary) -> Tuple[dict, List[str]]:
+    """
+    Compare two libraries.
+    Returns ({appid: entry} for added or changed games, [appids no longer in the library]).
+    """
+    old_entries = {appid: (playtime, day) for appid, playtime, day in old.items()}
+    changed = {}
+    for appid, playtime, day in new.items():
+        if old_entries.pop(appid, None) != (playtime, day):
+            changed[str(appid)] = {"playtime_forever": playtime, "rtime_last_played": day_to_date(day)}
+    removed = [str(appid) for appid in old_entries]
+    return changed, removed
+
+
+async def refresh_profile(steam_id: int) -> Optional[dict]:
+    """
+    Fetch the player summary and store it. Returns the updated row (None if Steam has no profile).
+    Raises on Steam errors so the job queue retries.
+    """
+    player_profile = await get_summary_batcher().get(steam_id)
+    if not player_profile:
+        return None
+    response = supabase.table('users').update({
+        'data': player_profile,
+        'data_refreshed_at': utc_now().isoformat()
+    }).eq('steam_id', steam_id).execute()
+    invalidate_user(steam_id)
+    return response.data[0] if response.data else None
+
+
+async def refresh_library(steam_id: int) -> dict:
+    """
+    Fetch the owned games and store whatever changed since the last refresh.
+    Raises on Steam errors so the job queue retries.
+    """
+    _, games = await fetch_steam_profile(steam_id)
+    response = supabase.table('users').select('games').eq('steam_id', steam_id).execute()
+    if not response.data:
+        return {"steam_id": steam_id, "status": "missing"}
+
+    stored_value = response.data[0].get('games')
+    stored = decode_library(stored_value)
+    library = CompactLibrary.from_dict(games)
+    changed, removed = diff_libraries(stored, library)
+    now = utc_now().isoformat()
+
+    if not games and len(stored):
+        # Private or temporarily empty response; keep the library we have
+        status = "kept"
+        supabase.table('users').update({'games_refreshed_at': now}).eq('steam_id', steam_id).execute()
+    elif not changed and not removed:
+        status = "unchanged"
+        supabase.table('users').update({'games_refreshed_at': now}).eq('steam_id', steam_id).execute()
+    elif is_compact(stored_value) and patch_size(stored_value) + len(changed) + len(removed) <= LIBRARY_PATCH_MAX:
+        status = "patched"
+        supabase.rpc('apply_library_patch', {
+            'p_steam_id': steam_id,
+            'p_patch': encode_patch(changed, removed)
+        }).execute()
+    elif COMPACT_LIBRARIES or is_compact(stored_value):
+        # New library, large change or a long patch: repack the whole library
+        status = "rewritten"
+        supabase.table('users').update({
+            'games': encode_for_storage(library.to_dict()),
+            'games_refreshed_at': now
+        }).eq('steam_id', steam_id).execute()
+    else:
+        status = "merged"
+        supabase.rpc('apply_library_diff', {
+            'p_steam_id': steam_id,
+            'p_changed': changed,
+            'p_removed': removed
+        }).execute()
+
+    invalidate_user(steam_id)
+    print(f"Library refresh for {steam_id}: {status} ({len(changed)} changed, {len(removed)} removed)")
+    return {"steam_id": steam_id, "status": status, "changed": len(changed), "removed": len(removed)}
+
+
+REFRESH_JOBS = {"data": refresh_profile, "games": refresh_library}
+
+_refresh_queue: Optional[JobQueue] = None
+
+
+def get_refresh_queue() -> JobQueue:
+    global _refresh_queue
+    if _refresh_queue is None:
+        _refresh_queue = JobQueue("user-refresh", concurrency=REFRESH_CONCURRENCY)
+    return _refresh_queue
+
+
+def queue_refresh(steam_id: int, fields: List[str]) -> Dict[str, Optional[asyncio.Future]]:
+    """Queue refresh jobs for the given fields (a job already queued for the same user and field is reused)"""
+    queue = get_refresh_queue()
+    return {field: queue.submit((field, steam_id), REFRESH_JOBS[field], steam_id) for field in fields}
+
+
+def queue_stale_refreshes(row: dict) -> Dict[str, Optional[asyncio.Future]]:
+    """Queue refreshes for the fields of a users row that are past their freshness window"""
+    return queue_refresh(row['steam_id'], stale_fields(row))
+
+
+async def refresh_now(steam_id: int, field: str):
+    """Refresh a field and wait for it, sharing the job with any refresh already queued"""
+    future = queue_refresh(steam_id, [field])[field]
+    if future is None:
+        return await REFRESH_JOBS[field](steam_id)
+    return await future
@@ -1,13 +1,33 @@
 from dotenv import load_dotenv
 load_dotenv()
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from src.api.responses import COMPRESSION_MIN_SIZE, GZIP_LEVEL
 from src.api import users
 from src.api.auth import router as auth_router
 from src.api.recommendations import router as recommendations_router
 from src.api.c_filtering import router as c_filtering_router
+from src.db.supabase_client import get_supabase
+from src.steam.client import get_steam_client
+from src.jobs.user_refresh import get_refresh_queue
+from src.jobs.login import get_login_queue
+from src.jobs.prefetch import get_prefetch_queue
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy clients are built here instead of at import time so workers start quickly
+    if not get_steam_client().api_key:
+        raise ValueError("STEAM_API_KEY environment variable is required")
+    get_supabase()
+    yield
+    await get_prefetch_queue().stop()
+    await get_login_queue().stop()
+    await get_refresh_queue().stop()
+    await get_steam_client().close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +36,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=GZIP_LEVEL)
 app.include_router(auth_router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(recommendations_router, prefix="/api")
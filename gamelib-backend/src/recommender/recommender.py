@@ -1,28 +1,80 @@
 # Placeholder for game recommendation ML logic
-STEAM_API_KEY="968317D323A2D4C8ED61E3D9F5E2FAB1"
-import pandas as pd
-import json
-import datetime
+import heapq
+import os
 from collections import Counter
 from typing import List, Dict, Set, Tuple
+from src.cache.single_flight import SingleFlight
+from src.cache.ttl_cache import TTLCache
 from src.db.supabase_client import supabase
+from src.cache.library_cache import get_library_cache
+from src.db.table_scan import scan_pages
+from src.steam.client import get_steam_client
+from src.steam.ratelimit import INTERACTIVE
 
+# Results are cached so the dashboard (and the login prefetch that warms it) don't recompute them
+CLUSTERS_CACHE_TTL = float(os.getenv("CLUSTERS_CACHE_TTL", 30 * 60))  # Seconds
+CF_CACHE_TTL = float(os.getenv("CF_CACHE_TTL", 10 * 60))  # Seconds
+RESULT_CACHE_SIZE = 5000
 
-async def get_game_clusters(steam_id: int):
-    import httpx
-    url = f"https://api.steampowered.com/IStoreAppSimilarityService/IdentifyClustersFromPlaytime/v1/?key={STEAM_API_KEY}&steamid={steam_id}&format=json&randomize=false"
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url)
-        if response.status_code == 200:
-            data = response.json()
+clusters_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=CLUSTERS_CACHE_TTL)
+cf_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=CF_CACHE_TTL)
+_in_flight = SingleFlight()
 
-            return data
-        else:
-            raise ValueError(f"Failed to fetch: {response.status_code}")
-    return None
+
+def cluster_score(cluster: dict) -> float:
+    """Relevance of a playtime cluster (recent playtime + total playtime + popularity)"""
+    recent_playtime = cluster.get('playtime_2weeks', 0)
+    total_playtime = cluster.get('playtime_forever', 0)
+    popularity = cluster.get('similar_item_popularity_score', 0)
+    # Weight recent activity higher, but also consider total time and popularity
+    return (recent_playtime * 10) + (total_playtime * 0.1) + (popularity * 1000)
+
+
+async def fetch_game_clusters(steam_id: int, priority: int = INTERACTIVE):
+    response = await get_steam_client().identify_clusters(steam_id, priority=priority)
+    if response.status_code == 200:
+        data = response.json()
+
+        return data
+    else:
+        raise ValueError(f"Failed to fetch: {response.status_code}")
+
+
+async def get_game_clusters(steam_id: int, priority: int = INTERACTIVE):
+    """
+    IdentifyClustersFromPlaytime for a user, cached for CLUSTERS_CACHE_TTL.
+    Concurrent lookups share a request per priority, so an interactive one doesn't wait on a prefetch.
+    """
+    cached = clusters_cache.get(steam_id)
+    if cached is not None:
+        return cached
+    data = await _in_flight.run(("clusters", steam_id, priority), fetch_game_clusters, steam_id, priority)
+    clusters_cache.set(steam_id, data)
+    return data
 
 
 async def get_collaborative_recommendations(
+    steam_id: int,
+    top_n_games: int = 5,
+    min_playtime: int = 60,
+    max_similar_users: int = 10,
+    max_recommendations: int = 20
+) -> Dict:
+    """
+    Cached wrapper around compute_collaborative_recommendations (see there for the arguments).
+    Successful results are kept for CF_CACHE_TTL; errors are not cached.
+    """
+    key = (steam_id, top_n_games, min_playtime, max_similar_users, max_recommendations)
+    cached = cf_cache.get(key)
+    if cached is not None:
+        return cached
+    result = await _in_flight.run(("cf",) + key, compute_collaborative_recommendations, *key)
+    if not result.get("error"):
+        cf_cache.set(key, result)
+    return result
+
+
+async def compute_collaborative_recommendations(
     steam_id: int, 
     top_n_games: int = 5,
     min_playtime: int = 60,
@@ -47,7 +99,7 @@ async def get_collaborative_recommendations(
     """
     try:
         # 1. Get current user's data from database
-        response = supabase.table('users').select('steam_id, games').eq('steam_id', steam_id).execute()
+        response = supabase.table('users').select('steam_id, games, games_refreshed_at').eq('steam_id', steam_id).execute()
         
         if not response.data or len(response.data) == 0:
             return {
@@ -58,9 +110,10 @@ async def get_collaborative_recommendations(
             }
         
         current_user = response.data[0]
-        user_games = current_user.get('games', {})
+        library_cache = get_library_cache()
+        user_games = library_cache.decode(current_user)
         
-        if not user_games:
+        if not len(user_games):
             return {
                 "error": "No games data found for user",
                 "recommendations": [],
@@ -71,13 +124,13 @@ async def get_collaborative_recommendations(
         # 2. Get user's top played games (by playtime)
         # Convert games dict to list and sort by playtime
         user_games_list = [
-            {"appid": int(appid), "playtime": game_data.get("playtime_forever", 0)}
-            for appid, game_data in user_games.items()
-            if game_data.get("playtime_forever", 0) >= min_playtime
+            {"appid": appid, "playtime": playtime}
+            for appid, playtime, _ in user_games.items()
+            if playtime >= min_playtime
         ]
         user_games_list.sort(key=lambda x: x["playtime"], reverse=True)
         user_top_games = [game["appid"] for game in user_games_list[:top_n_games]]
-        user_owned_games = set(int(appid) for appid in user_games.keys())
+        user_owned_games = user_games.appid_set()
         
         if not user_top_games:
             return {
@@ -88,12 +141,54 @@ async def get_collaborative_recommendations(
             }
         
         print(f"User's top {top_n_games} games: {user_top_games}")
+        top_games = set(user_top_games)
         
         # 3. Find similar users who own any of the top games
-        # Get all users from database (excluding current user)
-        all_users_response = supabase.table('users').select('steam_id, games').neq('steam_id', steam_id).execute()
+        # Stream all users from database (excluding current user) page by page,
+        # keeping only the best max_similar_users candidates in memory.
+        # Pages only carry steam_id and games_refreshed_at; libraries come from the
+        # library cache, which fetches and decodes just the ones it doesn't hold yet
+        users_analyzed = 0
+        similar_users = []  # Min-heap of (similarity score, -scan position, user)
+        async for page in scan_pages('users', 'steam_id, games_refreshed_at'):
+            others = [row for row in page if row['steam_id'] != steam_id]
+            libraries = library_cache.load(others)
+            for other_user in others:
+                other_steam_id = other_user['steam_id']
+                users_analyzed += 1
+                other_library = libraries.get(other_steam_id)
+                
+                if other_library is None:
+                    continue
+                
+                # 4. Calculate similarity score for this user
+                # (intersections run over the cached appid array; no set is built per user)
+                other_game_ids = other_library.appids
+                
+                # Calculate overlap with user's top games
+                overlap = len(top_games.intersection(other_game_ids))
+                
+                if overlap > 0:
+                    # Calculate similarity score based on:
+                    # 1. Number of matching top games
+                    # 2. Total games in common
+                    total_overlap = len(user_owned_games.intersection(other_game_ids))
+                    similarity_score = overlap * 10 + total_overlap  # Weight top games higher
+                    
+                    # Keep the top max_similar_users; on equal scores the user seen first wins
+                    entry = (similarity_score, -users_analyzed, {
+                        "steam_id": other_steam_id,
+                        "similarity_score": similarity_score,
+                        "top_games_overlap": overlap,
+                        "total_games_overlap": total_overlap,
+                        "games": other_game_ids
+                    })
+                    if len(similar_users) < max_similar_users:
+                        heapq.heappush(similar_users, entry)
+                    elif max_similar_users > 0 and entry[:2] > similar_users[0][:2]:
+                        heapq.heapreplace(similar_users, entry)
         
-        if not all_users_response.data:
+        if not users_analyzed:
             return {
                 "error": "No other users found in database",
                 "recommendations": [],
@@ -101,39 +196,8 @@ async def get_collaborative_recommendations(
                 "user_top_games": user_top_games
             }
         
-        # 4. Calculate similarity scores for each user
-        similar_users = []
-        for other_user in all_users_response.data:
-            other_steam_id = other_user.get('steam_id')
-            other_games = other_user.get('games', {})
-            
-            if not other_games:
-                continue
-            
-            # Get other user's game appids
-            other_game_ids = set(int(appid) for appid in other_games.keys())
-            
-            # Calculate overlap with user's top games
-            overlap = len(set(user_top_games) & other_game_ids)
-            
-            if overlap > 0:
-                # Calculate similarity score based on:
-                # 1. Number of matching top games
-                # 2. Total games in common
-                total_overlap = len(user_owned_games & other_game_ids)
-                similarity_score = overlap * 10 + total_overlap  # Weight top games higher
-                
-                similar_users.append({
-                    "steam_id": other_steam_id,
-                    "similarity_score": similarity_score,
-                    "top_games_overlap": overlap,
-                    "total_games_overlap": total_overlap,
-                    "games": other_game_ids
-                })
-        
         # Sort by similarity score and take top N
-        similar_users.sort(key=lambda x: x["similarity_score"], reverse=True)
-        top_similar_users = similar_users[:max_similar_users]
+        top_similar_users = [user for _, _, user in sorted(similar_users, key=lambda entry: entry[:2], reverse=True)]
         
         if not top_similar_users:
             return {
@@ -151,7 +215,7 @@ async def get_collaborative_recommendations(
         
         for similar_user in top_similar_users:
             # Get games this similar user has that current user doesn't
-            recommended_games = similar_user["games"] - user_owned_games
+            recommended_games = set(similar_user["games"]) - user_owned_games
             
             # Weight recommendations by similarity score
             weight = similar_user["similarity_score"]
@@ -192,7 +256,7 @@ async def get_collaborative_recommendations(
             "recommendations": recommendations_list,
             "similar_users": similar_users_summary,
             "user_top_games": user_top_games,
-            "total_users_analyzed": len(all_users_response.data),
+            "total_users_analyzed": users_analyzed,
             "similar_users_found": len(top_similar_users)
         }
         
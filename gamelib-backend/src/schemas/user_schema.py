@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class UserCreate(BaseModel):
     steam_id: int
@@ -16,3 +16,26 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class GameEntry(BaseModel):
+    appid: int
+    playtime_forever: int = 0
+    rtime_last_played: Optional[str] = None
+
+class UserGamesPage(BaseModel):
+    steam_id: int
+    total_games: int
+    games: List[GameEntry]
+    next_cursor: Optional[str] = None
+
+class UserBatchRequest(BaseModel):
+    steam_ids: List[int]
+    fields: Optional[str] = None
+    create_missing: bool = True
+
+class UserBatchResponse(BaseModel):
+    users: List[UserResponse]
+    missing: List[int] = []
+
+class UserNamesResponse(BaseModel):
+    names: Dict[int, str]
+    missing: List[int] = []
@@ -0,0 +1,109 @@
+"""
+Request coalescing for GetPlayerSummaries.
+
+GetPlayerSummaries accepts up to 100 comma separated steamids per call.
+PlayerSummaryBatcher collects lookups made within a short window (or until 100
+ids are pending) and resolves them all from one multi-id request.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.steam.client import get_steam_client
+from src.steam.ratelimit import INTERACTIVE
+
+MAX_SUMMARY_IDS = 100  # Steam's limit per GetPlayerSummaries call
+SUMMARY_BATCH_WINDOW = 0.05  # Seconds to wait for more lookups before sending
+
+
+def chunked(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def fetch_player_summaries(steam_ids: Iterable[int], priority: int = INTERACTIVE) -> Dict[int, dict]:
+    """
+    Fetch player summaries for many Steam IDs, 100 per request.
+    Returns {steam_id: player_data}; ids Steam doesn't know about are left out.
+    """
+    unique_ids = list(dict.fromkeys(int(steam_id) for steam_id in steam_ids))
+    players: Dict[int, dict] = {}
+    for chunk in chunked(unique_ids, MAX_SUMMARY_IDS):
+        response = await get_steam_client().get_player_summaries(chunk, priority=priority)
+        response.raise_for_status()
+        for player in response.json().get('response', {}).get('players', []):
+            players[int(player['steamid'])] = player
+    return players
+
+
+class PlayerSummaryBatcher:
+    def __init__(self, window: float = SUMMARY_BATCH_WINDOW, max_ids: int = MAX_SUMMARY_IDS):
+        self.window = window
+        self.max_ids = max_ids
+        # priority -> {steam_id: [futures waiting on it]}
+        self._pending: Dict[int, Dict[int, List[asyncio.Future]]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        # Batches being sent; referenced here so they aren't garbage collected mid-request
+        self._tasks: Set[asyncio.Task] = set()
+        self.requests_sent = 0
+        self.lookups = 0
+
+    async def get(self, steam_id: int, priority: int = INTERACTIVE) -> Optional[dict]:
+        """Queue a lookup and wait for the batch it lands in"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(priority, {})
+        pending.setdefault(int(steam_id), []).append(future)
+        self.lookups += 1
+
+        if len(pending) >= self.max_ids:
+            self._flush(priority)
+        elif priority not in self._timers:
+            self._timers[priority] = loop.call_later(self.window, self._flush, priority)
+        return await future
+
+    def _flush(self, priority: int):
+        timer = self._timers.pop(priority, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(priority, {})
+        if pending:
+            task = asyncio.ensure_future(self._send(pending, priority))
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Player summary batch failed: {task.exception()}")
+
+    async def _send(self, pending: Dict[int, List[asyncio.Future]], priority: int):
+        self.requests_sent += 1
+        try:
+            players = await fetch_player_summaries(list(pending), priority=priority)
+        except asyncio.CancelledError:
+            for futures in pending.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for steam_id, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(players.get(steam_id))
+
+
+_batcher: Optional[PlayerSummaryBatcher] = None
+
+
+def get_summary_batcher() -> PlayerSummaryBatcher:
+    """Process-wide summary batcher (created on first use)"""
+    global _batcher
+    if _batcher is None:
+        _batcher = PlayerSummaryBatcher()
+    return _batcher
@@ -0,0 +1,67 @@
+"""
+Per-endpoint circuit breaker for Steam calls.
+
+After `failure_threshold` consecutive failures the breaker opens and requests fail
+fast for `reset_timeout` seconds. Then a single trial request is let through
+(half-open): success closes the breaker, failure opens it again, and so does a
+trial that ends without an outcome (e.g. cancelled).
+"""
+
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Steam while the breaker is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent right now"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"Circuit breaker '{self.name}' opened after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """
+        A request that allow() let through ended without an outcome (cancelled, or an
+        error other than a transport one). A half-open trial counts as a failure, so the
+        trial slot is released; a closed breaker isn't affected.
+        """
+        if self.state == HALF_OPEN and self._trial_in_flight:
+            self.record_failure()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
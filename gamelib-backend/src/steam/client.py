@@ -0,0 +1,314 @@
+"""
+Single Steam client used by the API routers, the recommender and the collector.
+
+All requests of a process share one httpx connection pool and one token bucket
+per endpoint family. The buckets only cover that process: the API server and
+each collector limit themselves to their own share of the STEAM_API_KEY quota
+(STEAM_QUOTA_SHARE), and the shares of all processes using the key should add
+up to 1. 429 and 5xx responses are retried with jittered exponential backoff, honouring
+Retry-After when Steam sends it.
+
+Crawler requests are additionally paced by an AIMD pacer per family (see
+pacing.py), so the collector finds the highest rate Steam sustains on its own.
+
+Every endpoint has a circuit breaker. While it is open, requests fail fast and
+are answered from the last good response for the same call, if one is cached.
+"""
+
+import asyncio
+import os
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+from src.cache.single_flight import SingleFlight
+from src.cache.ttl_cache import TTLCache
+from src.steam.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.steam.ratelimit import TokenBucket, INTERACTIVE, CRAWLER
+from src.steam.pacing import AIMDPacer
+
+# Endpoint families (each has its own rate limit)
+WEBAPI = "webapi"  # api.steampowered.com
+STORE = "store"  # store.steampowered.com
+
+STEAM_API_BASE_URL = os.getenv("STEAM_API_BASE_URL", "https://api.steampowered.com")
+STEAM_STORE_BASE_URL = os.getenv("STEAM_STORE_BASE_URL", "https://store.steampowered.com")
+
+# Web API keys are limited to 100,000 calls per day; the store allows ~200 requests per 5 minutes
+WEBAPI_RATE = float(os.getenv("STEAM_WEBAPI_RATE", 100000 / 86400))
+WEBAPI_BURST = float(os.getenv("STEAM_WEBAPI_BURST", 20))
+STORE_RATE = float(os.getenv("STEAM_STORE_RATE", 200 / 300))
+STORE_BURST = float(os.getenv("STEAM_STORE_BURST", 40))
+# Share of the rates above this process may use; buckets are per process, so the
+# API server and the collectors each get a part of the key's quota. The default
+# leaves the rest (COLLECTOR_QUOTA_SHARE, 0.7) to the collectors
+STEAM_QUOTA_SHARE = float(os.getenv("STEAM_QUOTA_SHARE", 0.3))
+# Tokens the crawler must leave in each bucket for interactive requests
+CRAWLER_RESERVE = float(os.getenv("STEAM_CRAWLER_RESERVE", 5))
+# Adaptive crawler pacing: ceilings default to the bucket rates, the step to 1/20 of the ceiling per second
+# (both scaled by the quota share)
+CRAWLER_PACING = os.getenv("STEAM_CRAWLER_PACING", "1") != "0"
+CRAWLER_WEBAPI_MAX_RATE = float(os.getenv("STEAM_CRAWLER_WEBAPI_MAX_RATE", WEBAPI_RATE))
+CRAWLER_STORE_MAX_RATE = float(os.getenv("STEAM_CRAWLER_STORE_MAX_RATE", STORE_RATE))
+CRAWLER_MIN_RATE = float(os.getenv("STEAM_CRAWLER_MIN_RATE", 0.05))
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0  # Seconds
+BACKOFF_MAX = 60.0  # Seconds
+REQUEST_TIMEOUT = 10.0  # Seconds
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Circuit breaker settings (per endpoint path)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0  # Seconds
+
+# Last good responses to interactive requests, kept as a fallback while an endpoint's breaker is open
+# (crawler responses are one-off lookups and aren't kept)
+STALE_CACHE_SIZE = 2000
+STALE_CACHE_BYTES = int(os.getenv("STEAM_STALE_CACHE_BYTES", 32 * 2**20))
+STALE_CACHE_TTL = 6 * 3600  # Seconds
+
+# Store app details change rarely; successful responses are kept in memory, parsed
+APP_DETAILS_CACHE_SIZE = 20000
+APP_DETAILS_CACHE_BYTES = int(os.getenv("STEAM_APP_DETAILS_CACHE_BYTES", 64 * 2**20))
+APP_DETAILS_JSON_OVERHEAD = 4  # Parsed JSON takes roughly this many times its encoded size
+APP_DETAILS_CACHE_TTL = float(os.getenv("STEAM_APP_DETAILS_CACHE_TTL", 6 * 3600))  # Seconds
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After may be a number of seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class SteamClient:
+    def __init__(self, api_key: Optional[str] = None, quota_share: float = STEAM_QUOTA_SHARE):
+        self.api_key = api_key or os.getenv("STEAM_API_KEY")
+        self.base_urls = {WEBAPI: STEAM_API_BASE_URL, STORE: STEAM_STORE_BASE_URL}
+        self.set_quota_share(quota_share)
+        self.breakers = {}
+        self.stale_cache = TTLCache(
+            maxsize=STALE_CACHE_SIZE, ttl=STALE_CACHE_TTL,
+            maxbytes=STALE_CACHE_BYTES, sizeof=lambda entry: len(entry[1])
+        )
+        # (parsed body, approximate bytes) per app id
+        self.app_details_cache = TTLCache(
+            maxsize=APP_DETAILS_CACHE_SIZE, ttl=APP_DETAILS_CACHE_TTL,
+            maxbytes=APP_DETAILS_CACHE_BYTES, sizeof=lambda entry: entry[1]
+        )
+        self._app_details_in_flight = SingleFlight()
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def set_quota_share(self, share: float):
+        """
+        Limit this process to `share` of the configured rates (0 < share <= 1).
+        Rebuilds the buckets and pacers, so call it before sending requests.
+        """
+        if not 0 < share <= 1:
+            raise ValueError(f"quota share must be in (0, 1], got {share}")
+        self.quota_share = share
+        self.buckets = {
+            WEBAPI: TokenBucket(WEBAPI_RATE * share, WEBAPI_BURST, reserve=CRAWLER_RESERVE),
+            STORE: TokenBucket(STORE_RATE * share, STORE_BURST, reserve=CRAWLER_RESERVE),
+        }
+        self.pacers = {
+            WEBAPI: AIMDPacer(CRAWLER_WEBAPI_MAX_RATE * share, CRAWLER_MIN_RATE, burst=WEBAPI_BURST),
+            STORE: AIMDPacer(CRAWLER_STORE_MAX_RATE * share, CRAWLER_MIN_RATE, burst=STORE_BURST),
+        } if CRAWLER_PACING else {}
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+        return self._http
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def breaker(self, path: str) -> CircuitBreaker:
+        if path not in self.breakers:
+            self.breakers[path] = CircuitBreaker(path, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        return self.breakers[path]
+
+    def _cached_response(self, cache_key: tuple, method: str, url: str) -> Optional[httpx.Response]:
+        cached = self.stale_cache.get(cache_key, allow_expired=True)
+        if cached is None:
+            return None
+        status_code, content, headers = cached
+        headers = dict(headers, **{"X-Steam-Stale": "1"})
+        return httpx.Response(status_code, content=content, headers=headers, request=httpx.Request(method, url))
+
+    async def request(
+        self,
+        family: str,
+        path: str,
+        params: Optional[dict] = None,
+        method: str = "GET",
+        priority: int = INTERACTIVE,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        Send a rate-limited request to a Steam endpoint family.
+        The API key is added automatically for Web API calls.
+        Returns the final response (which may still be an error status once retries run out).
+        Raises CircuitOpenError if the endpoint's breaker is open and nothing is cached.
+        """
+        params = dict(params or {})
+        cache_key = (family, path, tuple(sorted((name, str(value)) for name, value in params.items())))
+        if family == WEBAPI and self.api_key:
+            params.setdefault("key", self.api_key)
+        url = f"{self.base_urls[family]}{path}"
+        bucket = self.buckets[family]
+        pacer = self.pacers.get(family) if priority == CRAWLER else None
+        breaker = self.breaker(path)
+
+        if not breaker.allow():
+            cached = self._cached_response(cache_key, method, url)
+            if cached is None:
+                raise CircuitOpenError(f"Steam endpoint {path} is unavailable")
+            return cached
+
+        # Every request that got past allow() must report an outcome, or a half-open
+        # breaker would wait for its trial request forever
+        recorded = False
+        try:
+            attempt = 0
+            while True:
+                sent_at = await pacer.acquire() if pacer else None
+                await bucket.acquire(priority)
+                try:
+                    response = await self.http.request(method, url, params=params, timeout=timeout or REQUEST_TIMEOUT)
+                except httpx.TransportError as e:
+                    if pacer and isinstance(e, httpx.TimeoutException):
+                        pacer.record(sent_at, ok=False)
+                    if attempt >= MAX_RETRIES:
+                        breaker.record_failure()
+                        recorded = True
+                        cached = self._cached_response(cache_key, method, url)
+                        if cached is None:
+                            raise
+                        return cached
+                    await asyncio.sleep(backoff_delay(attempt))
+                    attempt += 1
+                    continue
+
+                if response.status_code not in RETRY_STATUS_CODES:
+                    if pacer:
+                        pacer.record(sent_at, ok=True)
+                    breaker.record_success()
+                    recorded = True
+                    if response.status_code == 200 and priority == INTERACTIVE:
+                        headers = {"Content-Type": response.headers.get("Content-Type", "application/json")}
+                        self.stale_cache.set(cache_key, (200, response.content, headers))
+                    return response
+                if attempt >= MAX_RETRIES:
+                    if pacer:
+                        pacer.record(sent_at, ok=False)
+                    breaker.record_failure()
+                    recorded = True
+                    return self._cached_response(cache_key, method, url) or response
+
+                delay = backoff_delay(attempt)
+                if response.status_code == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        delay = retry_after + random.uniform(0, BACKOFF_BASE)
+                    # Everyone sharing this bucket backs off, not just this caller
+                    bucket.pause(delay)
+                if pacer:
+                    pacer.record(sent_at, ok=False, retry_after=delay if response.status_code == 429 else 0.0)
+                print(f"Steam {family} returned {response.status_code} for {path}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            if not recorded:
+                # Cancelled (e.g. while waiting for a token, or the client went away) or an unexpected error
+                breaker.record_abandoned()
+
+    async def get_owned_games(self, steam_id: int, include_appinfo: bool = False, priority: int = INTERACTIVE) -> httpx.Response:
+        params = {"steamid": steam_id, "format": "json"}
+        if include_appinfo:
+            params.update({"include_appinfo": 1, "include_played_free_games": 1})
+        return await self.request(WEBAPI, "/IPlayerService/GetOwnedGames/v0001/", params, priority=priority)
+
+    async def get_player_summaries(self, steam_ids, priority: int = INTERACTIVE) -> httpx.Response:
+        if isinstance(steam_ids, int):
+            steam_ids = [steam_ids]
+        params = {"steamids": ",".join(str(steam_id) for steam_id in steam_ids)}
+        return await self.request(WEBAPI, "/ISteamUser/GetPlayerSummaries/v0002/", params, priority=priority)
+
+    async def get_friend_list(self, steam_id: int, priority: int = INTERACTIVE) -> httpx.Response:
+        params = {"steamid": str(steam_id), "relationship": "friend"}
+        return await self.request(WEBAPI, "/ISteamUser/GetFriendList/v1/", params, priority=priority)
+
+    async def identify_clusters(self, steam_id: int, priority: int = INTERACTIVE) -> httpx.Response:
+        params = {"steamid": steam_id, "format": "json", "randomize": "false"}
+        return await self.request(
+            WEBAPI, "/IStoreAppSimilarityService/IdentifyClustersFromPlaytime/v1/", params,
+            method="POST", priority=priority
+        )
+
+    async def get_app_details(self, app_id: int, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Store appdetails as parsed JSON (None unless Steam answered 200). Fresh answers are cached;
+        concurrent lookups of one app share a request, per priority, so an interactive lookup
+        never waits on a crawler-priority one.
+        """
+        app_id = int(app_id)
+        cached = self.app_details_cache.get(app_id)
+        if cached is not None:
+            return cached[0]
+        return await self._app_details_in_flight.run(
+            (app_id, priority), self._fetch_app_details, app_id, priority, timeout
+        )
+
+    async def _fetch_app_details(self, app_id: int, priority: int, timeout: Optional[float]) -> Optional[dict]:
+        params = {"appids": app_id, "format": "json"}
+        response = await self.request(STORE, "/api/appdetails", params, priority=priority, timeout=timeout)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if not response.headers.get("X-Steam-Stale"):
+            self.app_details_cache.set(app_id, (data, len(response.content) * APP_DETAILS_JSON_OVERHEAD))
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "quota_share": self.quota_share,
+            "rate_limits": {family: bucket.stats() for family, bucket in self.buckets.items()},
+            "pacing": {family: pacer.stats() for family, pacer in self.pacers.items()},
+            "breakers": {path: breaker.stats() for path, breaker in self.breakers.items()},
+            "stale_cache": self.stale_cache.stats(),
+            "app_details_cache": self.app_details_cache.stats(),
+        }
+
+
+_client: Optional[SteamClient] = None
+
+
+def get_steam_client() -> SteamClient:
+    """Process-wide Steam client (created on first use)"""
+    global _client
+    if _client is None:
+        _client = SteamClient()
+    return _client
@@ -0,0 +1,357 @@
+"""
+Local stand-in for the Steam Web API and store API, for offline load testing.
+
+Serves GetOwnedGames, GetPlayerSummaries, GetFriendList, appdetails and
+IdentifyClustersFromPlaytime. Responses come from recorded fixture files when
+present, otherwise they are generated deterministically from the requested id.
+Latency, 5xx errors and 429s can be injected to exercise retry/backoff paths,
+and max_rps answers 429 to requests above a fixed capacity, like a real quota.
+
+Point the backend at it with:
+    STEAM_API_BASE_URL=http://localhost:8081 STEAM_STORE_BASE_URL=http://localhost:8081
+
+Fixture layout (all optional), under the fixtures directory:
+    owned_games/{steamid}.json      GetOwnedGames response body
+    player_summaries/{steamid}.json single player object
+    friends/{steamid}.json          GetFriendList response body
+    appdetails/{appid}.json         appdetails response body
+    clusters/{steamid}.json         IdentifyClustersFromPlaytime response body
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+STEAM_ID_BASE = 76561197960265728
+APP_POOL_SIZE = 5000  # Synthetic appids are 10, 20, ... 50000; low appids are the popular ones
+COMMUNITY_MEMBERS = 2000  # Accounts per community when communities are enabled
+IN_COMMUNITY_FRIENDS = 0.8  # Share of a member's friends from its own community
+
+REAL_BASE_URLS = {
+    "webapi": "https://api.steampowered.com",
+    "store": "https://store.steampowered.com",
+}
+
+
+class FakeSteamConfig:
+    def __init__(
+        self,
+        fixtures_dir: Optional[str] = None,
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        public_rate: float = 0.6,
+        seed: int = 0,
+        record: bool = False,
+        communities: int = 0,
+        max_rps: float = 0.0,
+    ):
+        """
+        Args:
+            fixtures_dir: Directory with recorded responses (see module docstring)
+            latency_ms: Added latency per request
+            latency_jitter_ms: Random extra latency (uniform 0..jitter)
+            error_rate: Fraction of requests answered with 503
+            rate_limit_rate: Fraction of requests answered with 429 + Retry-After
+            retry_after: Retry-After seconds sent with injected 429s
+            public_rate: Fraction of synthetic profiles that are public
+            seed: Seed mixed into synthetic data generation
+            record: Fetch fixtures missing on disk from real Steam and save them
+            communities: Group synthetic accounts into this many friend communities, each
+                         with its own activity level (share of public profiles, library
+                         sizes) and taste in games. 0 keeps accounts independent.
+            max_rps: Requests per second served before answering 429 (over a sliding
+                     one-second window). 0 disables the limit.
+        """
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.public_rate = public_rate
+        self.seed = seed
+        self.record = record
+        self.communities = communities
+        self.max_rps = max_rps
+
+    def to_dict(self) -> dict:
+        values = dict(vars(self))
+        values["fixtures_dir"] = str(self.fixtures_dir) if self.fixtures_dir else None
+        return values
+
+
+def _rng(kind: str, key: int, seed: int) -> random.Random:
+    return random.Random(f"{kind}:{key}:{seed}")
+
+
+def _community(steam_id: int, config: FakeSteamConfig) -> Optional[Tuple[int, float, int]]:
+    """(community, activity in 0..1, app popularity offset) of an account, None without communities"""
+    if config.communities <= 0:
+        return None
+    community = (steam_id - STEAM_ID_BASE) % config.communities
+    rng = _rng("community", community, config.seed)
+    return community, rng.random(), rng.randrange(APP_POOL_SIZE)
+
+
+def synthetic_player(steam_id: int, config: FakeSteamConfig) -> dict:
+    rng = _rng("player", steam_id, config.seed)
+    public_rate = config.public_rate
+    community = _community(steam_id, config)
+    if community is not None:
+        public_rate = min(public_rate * (0.25 + 1.5 * community[1]), 1.0)
+    return {
+        "steamid": str(steam_id),
+        "communityvisibilitystate": 3 if rng.random() < public_rate else 1,
+        "profilestate": 1,
+        "personaname": f"player_{steam_id % 1000000}",
+        "profileurl": f"https://steamcommunity.com/profiles/{steam_id}/",
+        "avatar": "",
+        "avatarmedium": "",
+        "avatarfull": "",
+        "personastate": rng.randint(0, 6),
+        "lastlogoff": 1700000000 - rng.randint(0, 10000000),
+        "commentpermission": 1,
+    }
+
+
+def synthetic_owned_games(steam_id: int, config: FakeSteamConfig) -> dict:
+    rng = _rng("games", steam_id, config.seed)
+    community = _community(steam_id, config)
+    activity, offset = (community[1], community[2]) if community is not None else (0.5, 0)
+    if rng.random() < 0.1 + 0.4 * (0.5 - activity):
+        return {"response": {}}
+    # Library sizes and game popularity both follow a power law; a community's favourite
+    # games are the popular ones shifted by its offset
+    library_size = min(int(rng.paretovariate(1.2) * 16 * activity), APP_POOL_SIZE // 2)
+    appids = set()
+    for _ in range(library_size * 20):
+        if len(appids) >= library_size:
+            break
+        rank = min(int(rng.paretovariate(0.8)) - 1, APP_POOL_SIZE - 1)
+        appids.add((rank + offset) % APP_POOL_SIZE * 10 + 10)
+    games = [
+        {
+            "appid": appid,
+            "playtime_forever": int(rng.expovariate(1 / 600)) if rng.random() < 0.8 else 0,
+            "rtime_last_played": 1600000000 + rng.randint(0, 100000000),
+        }
+        for appid in sorted(appids)
+    ]
+    return {"response": {"game_count": len(games), "games": games}}
+
+
+def synthetic_friends(steam_id: int, config: FakeSteamConfig) -> dict:
+    rng = _rng("friends", steam_id, config.seed)
+    community = _community(steam_id, config)
+    friends = set()
+    for _ in range(int(rng.paretovariate(1.5) * 5)):
+        if community is not None and rng.random() < IN_COMMUNITY_FRIENDS:
+            member = rng.randrange(COMMUNITY_MEMBERS)
+            friends.add(STEAM_ID_BASE + community[0] + member * config.communities)
+        else:
+            friends.add(STEAM_ID_BASE + rng.randint(0, 300000000))
+    friends.discard(steam_id)
+    return {
+        "friendslist": {
+            "friends": [
+                {"steamid": str(friend_id), "relationship": "friend", "friend_since": 1500000000}
+                for friend_id in sorted(friends)
+            ]
+        }
+    }
+
+
+def synthetic_app_details(appid: int, config: FakeSteamConfig) -> dict:
+    rng = _rng("app", appid, config.seed)
+    if appid % 97 == 0:
+        return {str(appid): {"success": False}}
+    genres = rng.sample(["Action", "Adventure", "RPG", "Strategy", "Indie", "Simulation", "Sports"], 2)
+    return {
+        str(appid): {
+            "success": True,
+            "data": {
+                "type": "game",
+                "name": f"Game {appid}",
+                "steam_appid": appid,
+                "required_age": 0,
+                "short_description": f"Synthetic game {appid}.",
+                "header_image": f"https://cdn.example/apps/{appid}/header.jpg",
+                "developers": [f"Studio {appid % 211}"],
+                "publishers": [f"Publisher {appid % 53}"],
+                "price_overview": {"final_formatted": f"${rng.randint(0, 60)}.99"},
+                "genres": [{"id": str(i), "description": genre} for i, genre in enumerate(genres)],
+                "categories": [{"id": 2, "description": "Single-player"}],
+                "release_date": {"coming_soon": False, "date": f"{rng.randint(1, 28)} Jan, {rng.randint(2005, 2024)}"},
+                "content_descriptors": {"ids": [], "notes": None},
+            },
+        }
+    }
+
+
+def synthetic_clusters(steam_id: int, config: FakeSteamConfig) -> dict:
+    rng = _rng("clusters", steam_id, config.seed)
+    owned = [game["appid"] for game in synthetic_owned_games(steam_id, config)["response"].get("games", [])]
+    clusters = []
+    for cluster_id in range(rng.randint(0, 12) if owned else 0):
+        clusters.append({
+            "cluster_id": cluster_id,
+            "playtime_forever": rng.randint(0, 20000),
+            "playtime_2weeks": rng.randint(0, 600),
+            "similar_item_popularity_score": round(rng.random(), 3),
+            "played_appids": rng.sample(owned, min(len(owned), 3)),
+            "similar_items_appids": [(rng.randint(1, APP_POOL_SIZE)) * 10 for _ in range(10)],
+        })
+    return {"response": {"clusters": clusters}}
+
+
+def create_app(config: Optional[FakeSteamConfig] = None) -> FastAPI:
+    config = config or FakeSteamConfig()
+    app = FastAPI(title="Fake Steam API")
+    app.state.config = config
+    app.state.stats = {"requests": 0, "errors_injected": 0, "rate_limited": 0, "fixtures_served": 0, "by_path": {}}
+    served = deque()  # Times of requests served in the last second, for max_rps
+
+    def load_fixture(kind: str, key) -> Optional[dict]:
+        if config.fixtures_dir is None:
+            return None
+        path = config.fixtures_dir / kind / f"{key}.json"
+        if not path.exists():
+            return None
+        app.state.stats["fixtures_served"] += 1
+        with open(path) as f:
+            return json.load(f)
+
+    def save_fixture(kind: str, key, body):
+        path = config.fixtures_dir / kind / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(body, f)
+
+    async def record(family: str, path: str, params: dict, method: str = "GET") -> Optional[dict]:
+        """
+        Fetch a missing fixture from real Steam. Returns the response body; the endpoint
+        saves the part it serves from fixtures (see save_fixture).
+        """
+        if not (config.record and config.fixtures_dir):
+            return None
+        params = dict(params)
+        if family == "webapi":
+            params["key"] = os.getenv("STEAM_API_KEY", "")
+        async with httpx.AsyncClient() as client:
+            response = await client.request(method, f"{REAL_BASE_URLS[family]}{path}", params=params, timeout=10.0)
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        stats = app.state.stats
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+        stats["requests"] += 1
+        stats["by_path"][request.url.path] = stats["by_path"].get(request.url.path, 0) + 1
+
+        delay = config.latency_ms + random.uniform(0, config.latency_jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if config.max_rps > 0:
+            now = time.monotonic()
+            while served and served[0] <= now - 1.0:
+                served.popleft()
+            if len(served) >= config.max_rps:
+                stats["rate_limited"] += 1
+                return Response(status_code=429, headers={"Retry-After": str(config.retry_after)})
+            served.append(now)
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return Response(status_code=429, headers={"Retry-After": str(config.retry_after)})
+        if roll < config.rate_limit_rate + config.error_rate:
+            stats["errors_injected"] += 1
+            return Response(status_code=503)
+        return await call_next(request)
+
+    @app.get("/IPlayerService/GetOwnedGames/v0001/")
+    async def get_owned_games(steamid: int):
+        body = load_fixture("owned_games", steamid)
+        if body is None:
+            body = await record("webapi", "/IPlayerService/GetOwnedGames/v0001/", {"steamid": steamid, "format": "json"})
+            if body is not None:
+                save_fixture("owned_games", steamid, body)
+        return body if body is not None else synthetic_owned_games(steamid, config)
+
+    @app.get("/ISteamUser/GetPlayerSummaries/v0002/")
+    async def get_player_summaries(steamids: str):
+        players = []
+        for raw_id in steamids.split(",")[:100]:
+            steam_id = int(raw_id)
+            player = load_fixture("player_summaries", steam_id)
+            if player is None:
+                recorded = await record("webapi", "/ISteamUser/GetPlayerSummaries/v0002/", {"steamids": steam_id})
+                recorded_players = (recorded or {}).get("response", {}).get("players", [])
+                if recorded_players:
+                    # Fixtures hold the player object itself; unknown ids aren't saved
+                    player = recorded_players[0]
+                    save_fixture("player_summaries", steam_id, player)
+            if player is None:
+                player = synthetic_player(steam_id, config)
+            players.append(player)
+        return {"response": {"players": players}}
+
+    @app.get("/ISteamUser/GetFriendList/v1/")
+    async def get_friend_list(steamid: int):
+        body = load_fixture("friends", steamid)
+        if body is None:
+            body = await record("webapi", "/ISteamUser/GetFriendList/v1/", {"steamid": steamid, "relationship": "friend"})
+            if body is not None:
+                save_fixture("friends", steamid, body)
+        if body is None:
+            if synthetic_player(steamid, config)["communityvisibilitystate"] != 3:
+                return JSONResponse(status_code=401, content={})
+            body = synthetic_friends(steamid, config)
+        return body
+
+    @app.post("/IStoreAppSimilarityService/IdentifyClustersFromPlaytime/v1/")
+    async def identify_clusters(steamid: int):
+        body = load_fixture("clusters", steamid)
+        if body is None:
+            body = await record("webapi", "/IStoreAppSimilarityService/IdentifyClustersFromPlaytime/v1/", {"steamid": steamid, "format": "json"}, method="POST")
+            if body is not None:
+                save_fixture("clusters", steamid, body)
+        return body if body is not None else synthetic_clusters(steamid, config)
+
+    @app.get("/api/appdetails")
+    async def get_app_details(appids: int):
+        body = load_fixture("appdetails", appids)
+        if body is None:
+            body = await record("store", "/api/appdetails", {"appids": appids})
+            if body is not None:
+                save_fixture("appdetails", appids, body)
+        return body if body is not None else synthetic_app_details(appids, config)
+
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        return {"config": config.to_dict(), "stats": app.state.stats, "uptime": time.monotonic() - started}
+
+    @app.post("/_fake/config")
+    async def update_fake_config(request: Request):
+        """Change fault injection settings on a running server (JSON body with config fields)"""
+        for name, value in (await request.json()).items():
+            if hasattr(config, name) and name != "fixtures_dir":
+                setattr(config, name, value)
+        return config.to_dict()
+
+    started = time.monotonic()
+    return app
@@ -0,0 +1,103 @@
+"""
+Negative-result cache for Steam lookups.
+
+Remembers ids that came back private, empty, missing or filtered so they are not
+re-probed until the reason's TTL runs out. Entries use wall-clock expiry so the
+collector can save the cache to disk and pick it up on the next run.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+# Reasons and how long each one is trusted (seconds)
+PRIVATE = "private"  # Profile not public
+NO_GAMES = "no_games"  # Library empty or below collection thresholds
+MISSING_APP = "missing_app"  # appdetails returned success: false
+FILTERED = "filtered"  # App rejected by the content filter
+
+NEGATIVE_TTLS = {
+    PRIVATE: 24 * 3600,
+    NO_GAMES: 12 * 3600,
+    MISSING_APP: 7 * 24 * 3600,
+    FILTERED: 7 * 24 * 3600,
+}
+
+# Key namespaces
+PROFILE = "profile"
+APP = "app"
+
+
+class NegativeCache:
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, maxsize: int = 500000):
+        self.ttls = dict(NEGATIVE_TTLS, **(ttls or {}))
+        self.maxsize = maxsize
+        self._entries: Dict[Tuple[str, Hashable], Tuple[str, float]] = {}
+        self.hits = 0
+
+    def mark(self, namespace: str, key: Hashable, reason: str):
+        if len(self._entries) >= self.maxsize:
+            self.purge_expired()
+            if len(self._entries) >= self.maxsize:
+                # Still full: drop the oldest insertions
+                for old_key in list(self._entries)[:self.maxsize // 10 or 1]:
+                    del self._entries[old_key]
+        self._entries[(namespace, key)] = (reason, time.time() + self.ttls[reason])
+
+    def get(self, namespace: str, key: Hashable) -> Optional[str]:
+        """Return the cached negative reason for a key, or None"""
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        reason, expires_at = entry
+        if expires_at < time.time():
+            del self._entries[(namespace, key)]
+            return None
+        self.hits += 1
+        return reason
+
+    def forget(self, namespace: str, key: Hashable):
+        self._entries.pop((namespace, key), None)
+
+    def purge_expired(self):
+        now = time.time()
+        for key in [key for key, (_, expires_at) in self._entries.items() if expires_at < now]:
+            del self._entries[key]
+
+    def save(self, path: str):
+        self.purge_expired()
+        rows = [[namespace, key, reason, expires_at] for (namespace, key), (reason, expires_at) in self._entries.items()]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> int:
+        """Load entries saved by save(); returns how many are still valid"""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            rows = json.load(f)
+        now = time.time()
+        for namespace, key, reason, expires_at in rows:
+            if expires_at >= now:
+                self._entries[(namespace, key)] = (reason, expires_at)
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        by_reason: Dict[str, int] = {}
+        for reason, _ in self._entries.values():
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+        return {"size": len(self._entries), "hits": self.hits, "by_reason": by_reason}
+
+
+_negative_cache: Optional[NegativeCache] = None
+
+
+def get_negative_cache() -> NegativeCache:
+    """Process-wide negative cache (created on first use)"""
+    global _negative_cache
+    if _negative_cache is None:
+        _negative_cache = NegativeCache()
+    return _negative_cache
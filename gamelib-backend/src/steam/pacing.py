@@ -0,0 +1,110 @@
+"""
+Adaptive (AIMD) pacing for crawler traffic.
+
+The token buckets in ratelimit.py enforce the configured quota, but the rate
+Steam actually sustains is often lower and changes over time. The pacer is a
+second token bucket for crawler requests. Its rate grows additively while
+responses come back fine and is cut multiplicatively on 429, 5xx or a timeout,
+never rising above `max_rate`. Failures of requests sent before, or within `cooldown` seconds
+after, the last cut don't cut again: a burst of concurrent 429s, and the retries
+that hit the same quota window, only halve the rate once.
+
+The additive step is in requests per second gained per second of successful
+traffic: every success adds step / rate.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+# Pacer states
+RAMPING = "ramping"  # Rate growing after successes
+AT_CEILING = "at_ceiling"  # Rate held at max_rate
+BACKING_OFF = "backing_off"  # Rate was just cut; waiting for a success at the new rate
+
+
+class AIMDPacer:
+    def __init__(
+        self,
+        max_rate: float,
+        min_rate: float = 0.05,
+        start_rate: Optional[float] = None,
+        step: Optional[float] = None,
+        decrease_factor: float = 0.5,
+        burst: float = 1.0,
+        cooldown: float = 1.0,
+    ):
+        """
+        Args:
+            max_rate: Ceiling in requests per second
+            min_rate: Floor the rate is never cut below
+            start_rate: Initial rate (default: half the ceiling)
+            step: Additive increase in requests per second per second (default: max_rate / 20)
+            decrease_factor: Rate multiplier on throttling, errors or timeouts
+            burst: Requests that may be sent at once after an idle period
+            cooldown: Seconds after a cut during which failures don't cut again
+        """
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max(self.min_rate, min(max_rate, start_rate if start_rate is not None else max_rate / 2))
+        self.step = step if step is not None else max_rate / 20
+        self.decrease_factor = decrease_factor
+        self.burst = max(burst, 1.0)
+        self.cooldown = cooldown
+        self.tokens = self.burst
+        self.state = AT_CEILING if self.rate >= max_rate else RAMPING
+        self.successes = 0
+        self.failures = 0
+        self.decreases = 0
+        self._updated = time.monotonic()
+        self._last_decrease = float("-inf")
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token at the current rate. Returns the send time to pass to record()."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return time.monotonic()
+            await asyncio.sleep(max((1 - self.tokens) / self.rate, 0.01))
+
+    def record(self, sent_at: float, ok: bool, retry_after: float = 0.0):
+        """
+        Report the outcome of a request sent at `sent_at` (ok=False for 429, 5xx and timeouts).
+        retry_after: Seconds the server asked us to wait; no tokens accumulate meanwhile
+        """
+        if ok:
+            self.successes += 1
+            if sent_at < self._last_decrease:
+                return  # Sent at the old rate; says nothing about the new one
+            self.rate = min(self.max_rate, self.rate + self.step / self.rate)
+            self.state = AT_CEILING if self.rate >= self.max_rate else RAMPING
+            return
+
+        self.failures += 1
+        if sent_at < self._last_decrease + self.cooldown:
+            return  # Already backed off for this burst
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.tokens = 0.0  # No burst right after being throttled
+        self._last_decrease = time.monotonic()
+        self._updated = self._last_decrease + retry_after
+        self.decreases += 1
+        self.state = BACKING_OFF
+        print(f"Crawler pacing backed off to {self.rate:.2f} requests/s")
+
+    def stats(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "state": self.state,
+            "tokens": round(self.tokens, 2),
+            "successes": self.successes,
+            "failures": self.failures,
+            "decreases": self.decreases,
+        }
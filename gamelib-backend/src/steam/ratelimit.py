@@ -0,0 +1,82 @@
+"""
+Token-bucket rate limiting shared by everything that talks to Steam.
+
+Each endpoint family (Web API, store) gets one bucket per process. Callers pass
+a priority: interactive (API request handlers) always goes before crawler
+traffic such as prefetch jobs, and crawler requests may not dip into the last
+`reserve` tokens, so within a process background work can't starve user-facing
+requests.
+
+Buckets are not shared between processes. The API server and the collector
+(run_collector.py) each hold their own, so they are kept apart by splitting the
+key's quota between them (STEAM_QUOTA_SHARE, see client.py).
+"""
+
+import asyncio
+import time
+
+# Request priorities (lower value = served first)
+INTERACTIVE = 0
+CRAWLER = 1
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, reserve: float = 0.0):
+        """
+        Args:
+            rate: Tokens added per second (sustained requests per second)
+            capacity: Maximum tokens held (burst size)
+            reserve: Tokens the crawler must leave for interactive requests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = min(reserve, capacity - 1)
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._waiting = {INTERACTIVE: 0, CRAWLER: 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (e.g. after a 429 with Retry-After)"""
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+        self.paused_until = max(self.paused_until, self._updated + seconds)
+
+    def _higher_priority_waiting(self, priority: int) -> bool:
+        return any(count for level, count in self._waiting.items() if level < priority)
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        """Wait until a token is available for a request of the given priority"""
+        floor = self.reserve if priority > INTERACTIVE else 0.0
+        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill()
+                if not self._higher_priority_waiting(priority) and self.tokens - 1 >= floor:
+                    self.tokens -= 1
+                    return
+
+                wait = max(floor + 1 - self.tokens, 0.0) / self.rate
+                await asyncio.sleep(max(wait, 0.01))
+        finally:
+            self._waiting[priority] -= 1
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "paused_for": round(max(self.paused_until - time.monotonic(), 0.0), 2),
+            "waiting": dict(self._waiting),
+        }
@@ -19,7 +19,8 @@ async def test_collector():
     
     await run_continuous_collector(
         target_users=1,      # Just collect 1 user for testing
-        max_attempts=50      # Try up to 50 random IDs
+        max_attempts=50,     # Try up to 50 random IDs
+        state_file=":memory:"  # Don't touch the real crawl's saved frontier
     )
     
     print("\n✅ Test complete!")
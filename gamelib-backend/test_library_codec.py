@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Round-trip checks for the compact game library encoding (src/db/library_codec.py).
+Runs as a script or under pytest.
+"""
+import sys
+import os
+import time
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db.library_codec import (
+    decode_library, encode_library, library_to_dict, date_to_day, NO_DATE
+)
+from src.api.steam_breakdown import normalize_owned_games
+
+
+def round_trip(games: dict) -> dict:
+    return library_to_dict(encode_library(games))
+
+
+def test_round_trip():
+    games = {
+        "730": {"playtime_forever": 1234, "rtime_last_played": "2024-05-01"},
+        "440": {"playtime_forever": 5, "rtime_last_played": None},
+    }
+    assert round_trip(games) == games
+
+
+def test_pre_1970_date():
+    """Dates before the epoch are stored as 'never played' instead of failing to encode"""
+    assert date_to_day("1969-12-31") == NO_DATE
+    games = {"570": {"playtime_forever": 60, "rtime_last_played": "1969-12-31"}}
+    assert round_trip(games) == {"570": {"playtime_forever": 60, "rtime_last_played": None}}
+    # Legacy rows are decoded through the same path
+    assert decode_library(games).to_dict() == {"570": {"playtime_forever": 60, "rtime_last_played": None}}
+
+
+def test_never_played():
+    """rtime_last_played=0 from GetOwnedGames encodes in any timezone (1969-12-31 west of UTC)"""
+    if not hasattr(time, "tzset"):
+        return  # Windows can't switch timezones at runtime
+    previous = os.environ.get("TZ")
+    try:
+        for tz, expected in (("UTC", "1970-01-01"), ("America/Los_Angeles", None)):
+            os.environ["TZ"] = tz
+            time.tzset()
+            games = normalize_owned_games([
+                {"appid": 10, "playtime_forever": 30, "rtime_last_played": 0},
+                {"appid": 20, "playtime_forever": 90, "rtime_last_played": 1714564800},
+            ])
+            decoded = round_trip(games)
+            assert decoded["10"]["rtime_last_played"] == expected, (tz, decoded)
+            assert decoded["20"] == {"playtime_forever": 90, "rtime_last_played": "2024-05-01"}, (tz, decoded)
+    finally:
+        if previous is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = previous
+        time.tzset()
+
+
+if __name__ == "__main__":
+    for test in (test_round_trip, test_pre_1970_date, test_never_played):
+        test()
+        print(f"✓ {test.__name__}")